@@ -1,10 +1,10 @@
 2# add_missing_items.py
-from database import Database
+from database import get_db
 
 
 def add_missing_hookahs():
     """Добавить отсутствующие кальяны в базу"""
-    db = Database()
+    db = get_db()
     cursor = db.conn.cursor()
 
     # Все кальяны которые должны быть
@@ -40,7 +40,7 @@ def add_missing_hookahs():
 
 def repopulate_all_menu():
     """Полностью перезаполнить таблицу меню"""
-    db = Database()
+    db = get_db()
     cursor = db.conn.cursor()
 
     print("🔄 Полное обновление меню...")
@@ -0,0 +1,366 @@
+"""
+Рассылка сообщений с ограничением скорости.
+
+Telegram принимает от бота около 30 сообщений в секунду на все чаты, при
+превышении отвечает RetryAfter. Все отправки рассылки проходят через общий
+TokenBucket, несколько получателей обслуживаются параллельно, а после
+RetryAfter рассылка ждет указанное время и повторяет то же сообщение.
+Каждому получателю уходит ровно один запрос: текст - send_message,
+медиа любого типа - copy_message.
+
+Рассылки администратора хранятся в базе (broadcast_jobs, broadcast_recipients)
+и отправляются фоновым BroadcastWorker: обработчик только создает задание, а
+после перезапуска бота задание продолжается с неотправленных получателей.
+Получатели выбираются из тех, чьи чаты доступны (users.reachability), итог
+каждой отправки обновляет доступность. Ход рассылки показывается в одном
+сообщении администратору, которое правится не чаще PROGRESS_UPDATE_INTERVAL.
+"""
+import asyncio
+import logging
+import time
+from collections import namedtuple
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+from config import (BROADCAST_BATCH_SIZE, BROADCAST_CONCURRENCY, BROADCAST_MAX_ATTEMPTS, BROADCAST_MAX_JOB_ERRORS,
+                    BROADCAST_RATE)
+from database import get_db
+from progress import ProgressReporter
+
+logger = logging.getLogger(__name__)
+
+TEXT_PREFIX = "📢 Сообщение от администратора:\n\n"
+DEFAULT_CAPTION = "📢 Рассылка от администратора"
+
+# Итог доставки одному получателю
+SENT, FAILED, BLOCKED = 'sent', 'failed', 'blocked'
+
+# Ошибки BadRequest, после которых писать в чат бесполезно
+UNREACHABLE_ERRORS = ('chat not found', 'user not found', 'bot was blocked', 'user is deactivated')
+
+Delivery = namedtuple('Delivery', 'state error attempts')
+
+
+def delivery_state(error):
+    """Итог неудачной отправки: BLOCKED, если писать в этот чат бесполезно, иначе FAILED"""
+    if isinstance(error, Forbidden):
+        return BLOCKED
+    if isinstance(error, BadRequest) and any(text in str(error).lower() for text in UNREACHABLE_ERRORS):
+        return BLOCKED
+    return FAILED
+
+
+class TokenBucket:
+    """Ограничитель скорости: не больше rate отправок в секунду, всплеск до capacity"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Дождаться права на одну отправку"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + max(0.0, now - self._updated) * self.rate)
+                self._updated = max(self._updated, now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate + max(0.0, self._updated - now))
+
+    def pause(self, seconds):
+        """Остановить все отправки на seconds секунд (ответ RetryAfter)"""
+        self._tokens = 0
+        self._updated = max(self._updated, time.monotonic() + seconds)
+
+
+# Общий ограничитель для всех рассылок бота
+rate_limiter = TokenBucket(BROADCAST_RATE)
+
+
+class BroadcastMessage:
+    """Сообщение администратора для рассылки: текст или медиа со ссылкой на оригинал"""
+
+    def __init__(self, from_chat_id, message_id, text=None, has_caption=False):
+        self.from_chat_id = from_chat_id
+        self.message_id = message_id
+        self.text = text
+        self.has_caption = has_caption
+
+    @classmethod
+    def from_message(cls, message):
+        """Рассылка по входящему сообщению администратора"""
+        return cls(message.chat_id, message.message_id, message.text, bool(message.caption))
+
+    async def send(self, bot, chat_id):
+        """Отправить сообщение в chat_id одним запросом"""
+        if self.text is not None:
+            return await bot.send_message(chat_id, TEXT_PREFIX + self.text)
+        # Подпись оригинала сохраняется; медиа без подписи получает стандартную
+        return await bot.copy_message(chat_id, self.from_chat_id, self.message_id,
+                                      caption=None if self.has_caption else DEFAULT_CAPTION)
+
+
+async def deliver(bot, message, chat_id, bucket=None, max_attempts=BROADCAST_MAX_ATTEMPTS):
+    """Доставить message в chat_id.
+
+    RetryAfter не считается попыткой: ограничитель приостанавливается для всех,
+    и сообщение отправляется снова. Сетевые ошибки повторяются с растущей
+    паузой до max_attempts попыток. Возвращает Delivery.
+    """
+    bucket = bucket or rate_limiter
+    attempts = 0
+    while True:
+        await bucket.acquire()
+        attempts += 1
+        try:
+            await message.send(bot, chat_id)
+            return Delivery(SENT, None, attempts)
+        except RetryAfter as e:
+            logger.warning(f"Лимит Telegram при рассылке, пауза {e.retry_after} с")
+            bucket.pause(e.retry_after)
+            attempts -= 1
+        except (Forbidden, BadRequest) as e:
+            return Delivery(delivery_state(e), str(e), attempts)
+        except NetworkError as e:
+            if attempts >= max_attempts:
+                return Delivery(FAILED, str(e), attempts)
+            await asyncio.sleep(2 ** attempts)
+        except Exception as e:
+            logger.error(f"Ошибка рассылки в чат {chat_id}: {e}")
+            return Delivery(FAILED, str(e), attempts)
+
+
+async def broadcast(bot, message, recipients, on_delivery=None, concurrency=BROADCAST_CONCURRENCY, bucket=None,
+                    on_start=None):
+    """Разослать message получателям (объекты с полем telegram_id).
+
+    Одновременно обслуживается не больше concurrency получателей, общая
+    скорость ограничена bucket. on_start(recipient) и on_delivery(recipient, delivery) -
+    корутины, вызываемые до и после отправки каждому получателю. Если одна из
+    них завершилась ошибкой, остальные обработчики отменяются до выхода из
+    функции, чтобы никто не продолжал отправлять мимо учета. Возвращает
+    список (получатель, Delivery) в порядке завершения.
+    """
+    results = []
+    pending = iter(recipients)
+
+    async def worker():
+        # Все обработчики берут получателей из одного итератора
+        for recipient in pending:
+            if on_start:
+                await on_start(recipient)
+            delivery = await deliver(bot, message, recipient.telegram_id, bucket)
+            results.append((recipient, delivery))
+            if on_delivery:
+                await on_delivery(recipient, delivery)
+
+    try:
+        async with asyncio.TaskGroup() as group:
+            for _ in range(concurrency):
+                group.create_task(worker())
+    except ExceptionGroup as e:
+        # Наружу - первая ошибка, как раньше у gather; остальные в __cause__
+        raise e.exceptions[0] from e
+    return results
+
+
+def error_type(error):
+    """Тип ошибки отправки для отчета администратору"""
+    error = (error or '').lower()
+    if "bot was blocked" in error or "bot blocked" in error:
+        return "Пользователь заблокировал бота"
+    elif "user not found" in error:
+        return "Пользователь не найден"
+    elif "chat not found" in error:
+        return "Чат не найден"
+    elif "forbidden" in error:
+        return "Доступ запрещен"
+    elif "перезапуском" in error:
+        return "Прервано перезапуском бота"
+    elif "остановлена" in error:
+        return "Рассылка остановлена из-за ошибок"
+    return "Неизвестная ошибка"
+
+
+def format_broadcast_progress(job, progress, failures=()):
+    """Текст о ходе рассылки job: progress - Database.get_broadcast_progress,
+    failures - Database.get_broadcast_failures"""
+    done = progress['sent'] + progress['failed'] + progress['blocked']
+    title = {'done': "✅ Рассылка завершена",
+             'failed': "❌ Рассылка остановлена из-за повторных ошибок"}.get(job.status, "📨 Рассылка выполняется")
+    message = (
+        f"{title} (#{job.id} от {job.created_at})\n\n"
+        f"👥 Получателей: {progress['total']}\n"
+        f"🎯 Доставлено: {progress['sent']}\n"
+        f"🚫 Заблокировали бота или удалены: {progress['blocked']}\n"
+        f"⚠️ Ошибок отправки: {progress['failed']}\n"
+    )
+    if job.status == 'running':
+        message += f"⏳ Осталось: {progress['total'] - done}\n"
+    if progress['total']:
+        message += f"📈 Доставлено: {progress['sent'] / progress['total'] * 100:.1f}%\n"
+    if failures:
+        message += "\n📋 Недоставленные (первые):\n"
+        for i, failure in enumerate(failures, 1):
+            message += f"{i}. {failure.first_name} {failure.last_name} (ID: {failure.user_id}) - {error_type(failure.error)}\n"
+    return message
+
+
+class BroadcastWorker:
+    """Фоновая отправка рассылок из базы.
+
+    Задания обрабатываются по одному в порядке создания, получатели - порциями
+    по batch_size. Перед отправкой получатель переводится в sending, после -
+    в sent, failed или blocked, так что после перезапуска повторно отправляется
+    только тем, кому отправка еще не начиналась. Администратору, создавшему
+    задание, приходит сообщение о ходе рассылки, которое по завершении
+    заменяется итогом. Задание, которое max_job_errors раз подряд завершилось
+    ошибкой, останавливается со статусом failed.
+    """
+
+    def __init__(self, db=None, batch_size=BROADCAST_BATCH_SIZE, max_job_errors=BROADCAST_MAX_JOB_ERRORS,
+                 retry_delay=5):
+        self.db = db or get_db()
+        self.batch_size = batch_size
+        self.max_job_errors = max_job_errors
+        self.retry_delay = retry_delay
+        self._job_errors = {}  # job_id -> ошибок подряд
+        self._wakeup = None
+        self._task = None
+
+    def start(self, bot):
+        """Запустить фоновую задачу (вызывается из post_init приложения)"""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(bot))
+        self._task.add_done_callback(self._task_done)
+
+    @staticmethod
+    def _task_done(task):
+        if not task.cancelled() and task.exception():
+            logger.error(f"Фоновая рассылка остановилась: {task.exception()}")
+
+    async def stop(self):
+        """Остановить фоновую задачу; прерванные отправки будут учтены при следующем запуске"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self):
+        """Сообщить о новом задании"""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _run(self, bot):
+        reset = False
+        while True:
+            self._wakeup.clear()
+            job = None
+            try:
+                if not reset:
+                    interrupted = await self.db.areset_interrupted_broadcasts()
+                    if interrupted:
+                        logger.warning(f"Рассылка прервана перезапуском для {interrupted} получателей, "
+                                       f"повторно не отправляется")
+                    reset = True
+                for job in await self.db.aget_running_broadcast_jobs():
+                    await self.run_job(bot, job)
+                    self._job_errors.pop(job.id, None)
+            except Exception as e:
+                logger.error(f"Ошибка фоновой рассылки: {e}")
+                if job:
+                    await self._job_failed(bot, job)
+                await asyncio.sleep(self.retry_delay)
+                continue
+            await self._wakeup.wait()
+
+    async def _job_failed(self, bot, job):
+        """Учесть ошибку задания; после max_job_errors ошибок подряд остановить его"""
+        errors = self._job_errors.get(job.id, 0) + 1
+        if errors < self.max_job_errors:
+            self._job_errors[job.id] = errors
+            return
+        self._job_errors.pop(job.id, None)
+        try:
+            await self.db.afail_broadcast_job(job.id)
+            job = await self.db.aget_broadcast_job(job.id)
+            progress = await self.db.aget_broadcast_progress(job.id)
+            logger.error(f"Рассылка #{job.id} остановлена после {errors} ошибок подряд: {progress}")
+            report = format_broadcast_progress(job, progress, await self.db.aget_broadcast_failures(job.id))
+            if job.status_message_id is not None:
+                await bot.edit_message_text(report, job.admin_chat_id, job.status_message_id)
+            else:
+                await bot.send_message(job.admin_chat_id, report)
+        except Exception as e:
+            logger.error(f"Не удалось остановить рассылку #{job.id}: {e}")
+
+    async def run_job(self, bot, job):
+        """Отправить задание job всем оставшимся получателям и сообщить итог"""
+        message = BroadcastMessage(job.from_chat_id, job.message_id, job.text, bool(job.has_caption))
+        progress = await self.db.aget_broadcast_progress(job.id)
+        reporter = await self._start_report(bot, job, progress)
+
+        async def on_start(recipient):
+            await self.db.amark_broadcast_sending(job.id, recipient.user_id)
+
+        async def on_delivery(recipient, delivery):
+            await self.db.arecord_broadcast_delivery(job.id, recipient.user_id, delivery.state,
+                                                     delivery.attempts, delivery.error)
+            progress[delivery.state] += 1
+            if reporter:
+                await reporter.advance(details=(f"🎯 Доставлено: {progress['sent']}, "
+                                                f"🚫 недоступны: {progress['blocked']}, "
+                                                f"⚠️ ошибок: {progress['failed']}"))
+
+        while True:
+            recipients = await self.db.aget_pending_broadcast_recipients(job.id, self.batch_size)
+            if not recipients:
+                break
+            await broadcast(bot, message, recipients, on_delivery, on_start=on_start)
+
+        await self.db.afinish_broadcast_job(job.id)
+        job = await self.db.aget_broadcast_job(job.id)
+        progress = await self.db.aget_broadcast_progress(job.id)
+        logger.info(f"Рассылка #{job.id} завершена: {progress}")
+        report = format_broadcast_progress(job, progress, await self.db.aget_broadcast_failures(job.id))
+        if reporter and await reporter.finish(report):
+            return
+        try:
+            await bot.send_message(job.admin_chat_id, report)
+        except Exception as e:
+            logger.error(f"Не удалось отправить итог рассылки #{job.id}: {e}")
+
+    async def _start_report(self, bot, job, progress):
+        """Сообщение о ходе рассылки в чате администратора; None, если его не удалось отправить.
+
+        Сообщение создается один раз на задание (broadcast_jobs.status_message_id):
+        повторный запуск задания после ошибки или перезапуска бота правит его же.
+        """
+        done = progress['sent'] + progress['failed'] + progress['blocked']
+        message_id = job.status_message_id
+        if message_id is None:
+            try:
+                status = await bot.send_message(job.admin_chat_id,
+                                                f"🔄 Рассылка #{job.id}: {done}/{progress['total']}")
+            except Exception as e:
+                logger.error(f"Не удалось отправить сообщение о ходе рассылки #{job.id}: {e}")
+                return None
+            message_id = status.message_id
+            await self.db.aset_broadcast_status_message(job.id, message_id)
+
+        async def edit(text, **kwargs):
+            await bot.edit_message_text(text, job.admin_chat_id, message_id, **kwargs)
+
+        return ProgressReporter(edit, progress['total'], f"Рассылка #{job.id}", done)
+
+
+# Общий фоновый обработчик рассылок
+broadcast_worker = BroadcastWorker()
@@ -1,10 +1,10 @@
 # check_all_menu_items.py
-from database import Database
+from database import get_db
 
 
 def check_all_menu_items():
     """Проверить все позиции в меню"""
-    db = Database()
+    db = get_db()
     cursor = db.conn.cursor()
 
     print("📋 ВСЕ ПОЗИЦИИ В БАЗЕ ДАННЫХ:")
@@ -30,7 +30,7 @@ def check_all_menu_items():
 
 def find_missing_hookahs():
     """Найти отсутствующие кальяны"""
-    db = Database()
+    db = get_db()
     cursor = db.conn.cursor()
 
     print("\n🔍 ПОИСК ОТСУТСТВУЮЩИХ КАЛЬЯНОВ:")
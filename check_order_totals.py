@@ -0,0 +1,32 @@
+# check_order_totals.py
+import sys
+
+from database import get_db
+
+
+def check_order_totals(fix=False):
+    """Сверить orders.total_amount и item_count с позициями заказов"""
+    db = get_db()
+
+    print("🔍 ПРОВЕРКА СУММ ЗАКАЗОВ:")
+    print("=" * 50)
+
+    mismatches = db.verify_order_totals(fix=fix)
+
+    if not mismatches:
+        print("✅ Суммы и количество позиций всех заказов совпадают")
+        return
+
+    for order_id, total_amount, actual_total, item_count, actual_count in mismatches:
+        print(f"  • Заказ #{order_id}: сумма {total_amount} (должно быть {actual_total}), "
+              f"позиций {item_count} (должно быть {actual_count})")
+
+    print(f"\n📊 ИТОГО: {len(mismatches)} расхождений")
+    if fix:
+        print("✅ Расхождения исправлены")
+    else:
+        print("ℹ️ Для исправления запустите: python check_order_totals.py --fix")
+
+
+if __name__ == '__main__':
+    check_order_totals(fix='--fix' in sys.argv)
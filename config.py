@@ -32,9 +32,36 @@ REFERRAL_BONUS = 25  # Бонус за приглашенного пользов
 
 # Настройки базы данных
 DB_NAME = 'loyalty_bot.db'
+DB_READ_WORKERS = 4  # размер пула читающих соединений (запись всегда идет через одно соединение)
+DB_JOURNAL_MODE = 'WAL'  # читатели не блокируются писателем
+DB_SYNCHRONOUS = 'NORMAL'  # в режиме WAL fsync только при checkpoint, а не на каждый commit
+DB_BUSY_TIMEOUT_MS = 5000  # сколько ждать освобождения блокировки вместо ошибки "database is locked"
+DB_CACHE_SIZE_KB = 16384  # кэш страниц на соединение (16 МБ)
+DB_MMAP_SIZE = 64 * 1024 * 1024  # чтение файла базы через mmap (64 МБ)
+DB_TEMP_STORE = 'MEMORY'  # временные таблицы и индексы сортировки в памяти
+DB_GROUP_COMMIT_MAX = 32  # сколько ожидающих записей фиксируется одним commit
+
+# Размер страниц в списках администратора
+USERS_PAGE_SIZE = 20  # пользователей на странице полного списка
+BOOKINGS_PAGE_SIZE = 10  # бронирований за одно нажатие "Показать еще"
+DASHBOARD_STATS_TTL = 30  # секунд хранится сводка экрана статистики (сбрасывается любой записью)
+USER_SEARCH_LIMIT = 20  # сколько найденных пользователей показывать (лучшие по релевантности)
+KEYBOARD_CACHE_SIZE = 256  # сколько готовых клавиатур хранить в памяти (вытесняются самые старые)
+
+# Настройки рассылки
+BROADCAST_RATE = 25  # сообщений в секунду на всех получателей (лимит Telegram ~30, остаток - обычным ответам бота)
+BROADCAST_CONCURRENCY = 8  # сколько получателей обслуживается одновременно
+BROADCAST_MAX_ATTEMPTS = 3  # попыток при сетевых ошибках (RetryAfter попыткой не считается)
+BROADCAST_BATCH_SIZE = 100  # сколько получателей фоновая рассылка читает из базы за раз
+BROADCAST_MAX_JOB_ERRORS = 5  # после скольких ошибок подряд задание рассылки останавливается
+REACHABILITY_REPROBE_DAYS = 30  # через сколько дней снова пробовать писать заблокировавшим бота
+
+# Настройки отображения хода длительных операций
+PROGRESS_UPDATE_INTERVAL = 3  # секунды между правками сообщения о ходе рассылки или расчета заказов
 
 # Настройки очистки сообщений
 MESSAGE_CLEANUP_DELAY = 10  # секунды для временных сообщений (увеличено)
+MESSAGE_CLEANUP_CONCURRENCY = 4  # в скольких чатах временные сообщения удаляются одновременно
 
 # Настройки логирования
 LOG_FILE = 'bot_errors.log'
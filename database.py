@@ -1,380 +1,358 @@
 import sqlite3
 import logging
-from config import DB_NAME
-from datetime import datetime
+import asyncio
+import contextlib
+import functools
+import itertools
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from config import (
+    DB_NAME, DB_READ_WORKERS, DB_JOURNAL_MODE, DB_SYNCHRONOUS, DB_BUSY_TIMEOUT_MS,
+    DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_TEMP_STORE, DB_GROUP_COMMIT_MAX,
+    USERS_PAGE_SIZE, BOOKINGS_PAGE_SIZE, DASHBOARD_STATS_TTL, USER_SEARCH_LIMIT, REACHABILITY_REPROBE_DAYS
+)
+from datetime import datetime, timedelta
 import pytz
+from migrations import apply_migrations, ORDER_TOTAL_SQL, ORDER_ITEM_COUNT_SQL
+from periods import Period
+import rollups
+from utils.helpers import normalize_phone
+from rows import (
+    UserRow, MenuItemRow, OrderRow, OrderItemRow, ShiftRow, BookingRow, BonusRequestRow,
+    BroadcastJobRow, BroadcastRecipientRow
+)
 
 logger = logging.getLogger(__name__)
 
+# Методы с такими префиксами только читают данные и выполняются в пуле читателей,
+# все остальные считаются записью и выполняются последовательно в потоке записи
+READ_METHOD_PREFIXES = ('get_', 'find_', 'search_', 'count_')
 
-class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect(DB_NAME, check_same_thread=False)
-        self.create_tables()
-        self.fix_menu_categories()
-        self.add_payment_method_column()  # <-- Добавьте эту строку
+# Максимум id в одном условии IN (...) для пакетной загрузки (см. _fetch_by_ids)
+IN_CHUNK_SIZE = 500
 
-    def get_moscow_time(self):
-        """Получить текущее время в московском часовом поясе"""
-        tz = pytz.timezone('Europe/Moscow')
-        return datetime.now(tz).strftime('%Y-%m-%d %H:%M:%S')
-
-    def create_tables(self):
-        """Создание всех таблиц с правильной структурой"""
-        cursor = self.conn.cursor()
-
-        # Сначала создаем все остальные таблицы
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                telegram_id INTEGER UNIQUE,
-                first_name TEXT,
-                last_name TEXT,
-                phone TEXT,
-                bonus_balance INTEGER DEFAULT 0,
-                registration_date TEXT,
-                is_active BOOLEAN DEFAULT TRUE,
-                referred_by INTEGER DEFAULT NULL,
-                FOREIGN KEY (referred_by) REFERENCES users (id)
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                amount INTEGER,
-                type TEXT, -- 'earn' или 'spend'
-                description TEXT,
-                date TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS bookings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                booking_date TEXT,
-                booking_time TEXT,
-                guests INTEGER,
-                status TEXT DEFAULT 'pending',
-                created_at TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS bonus_requests (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                amount INTEGER,
-                status TEXT DEFAULT 'pending',
-                created_at TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS referrals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                referrer_id INTEGER,
-                referred_id INTEGER UNIQUE,
-                bonus_awarded BOOLEAN DEFAULT FALSE,
-                created_at TEXT,
-                FOREIGN KEY (referrer_id) REFERENCES users (id),
-                FOREIGN KEY (referred_id) REFERENCES users (id)
-            )
-        ''')
+# Поля пользователя в списках (выбор пользователя, поиск, рассылка, статистика);
+# остальные поля в строках списков равны None
+USER_LIST_FIELDS = ('id', 'telegram_id', 'first_name', 'last_name', 'phone', 'bonus_balance')
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                table_number INTEGER,
-                admin_id INTEGER,
-                status TEXT DEFAULT 'active', -- 'active' или 'closed'
-                created_at TEXT,
-                closed_at TEXT
-            )
-        ''')
+# Слова поискового запроса для users_fts: буквы и цифры, остальное - разделители
+SEARCH_TOKEN = re.compile(r'\w+')
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS order_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER,
-                item_name TEXT,
-                price INTEGER,
-                quantity INTEGER DEFAULT 1,
-                added_at TEXT,
-                FOREIGN KEY (order_id) REFERENCES orders (id)
-            )
-        ''')
+# Состояние чата пользователя (users.reachability) по итогу отправки;
+# failed - временная ошибка, состояние не меняется
+REACHABILITY_BY_DELIVERY = {'sent': 'reachable', 'blocked': 'blocked'}
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS menu_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE,
-                price INTEGER,
-                category TEXT,
-                is_active BOOLEAN DEFAULT TRUE
-            )
-        ''')
 
-        # Проверяем, существует ли уже таблица shifts с правильным индексом
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='shifts'")
-        shifts_table_exists = cursor.fetchone()
+def _booking_day(date):
+    """Period суток для даты брони 'DD.MM.YYYY' (None, если дата в другом формате)"""
+    try:
+        return Period.day(datetime.strptime(date, '%d.%m.%Y').date())
+    except (TypeError, ValueError):
+        return None
 
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name='idx_shift_month'")
-        index_exists = cursor.fetchone()
 
-        if not shifts_table_exists or not index_exists:
-            # Нужно создать или обновить таблицу shifts
-            print("🔄 Создаем/обновляем таблицу shifts...")
+# Общий экземпляр базы данных для всего процесса (см. get_db)
+_db_instance = None
+_db_instance_lock = threading.Lock()
 
-            # Временно отключаем foreign keys
-            cursor.execute('PRAGMA foreign_keys = OFF')
 
-            # Переименовываем существующие таблицы если они есть
-            if shifts_table_exists:
-                print("🔄 Переименовываем старую таблицу shifts...")
-                cursor.execute('ALTER TABLE shifts RENAME TO shifts_old')
+def get_db():
+    """Получить общий экземпляр базы данных.
 
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='shift_sales'")
-            shift_sales_exists = cursor.fetchone()
+    Экземпляр создается лениво при первом обращении, поэтому проверка версии
+    схемы и миграции выполняются ровно один раз за время жизни процесса.
+    """
+    global _db_instance
+    if _db_instance is None:
+        with _db_instance_lock:
+            if _db_instance is None:
+                _db_instance = Database()
+    return _db_instance
 
-            if shift_sales_exists:
-                print("🔄 Переименовываем старую таблицу shift_sales...")
-                cursor.execute('ALTER TABLE shift_sales RENAME TO shift_sales_old')
 
-            # Создаем новую таблицу смен с составным уникальным ключом
-            cursor.execute('''
-                CREATE TABLE shifts (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    shift_number INTEGER,
-                    month_year TEXT, -- Формат: 'YYYY-MM' для группировки по месяцам
-                    admin_id INTEGER,
-                    opened_at TEXT,
-                    closed_at TEXT,
-                    total_revenue INTEGER DEFAULT 0,
-                    total_orders INTEGER DEFAULT 0,
-                    status TEXT DEFAULT 'open',
-                    FOREIGN KEY (admin_id) REFERENCES users (id)
-                )
-            ''')
-
-            # Создаем составной уникальный индекс если его нет
-            if not index_exists:
-                cursor.execute('CREATE UNIQUE INDEX idx_shift_month ON shifts (shift_number, month_year)')
-                print("✅ Составной уникальный индекс создан")
+class Database:
+    """Доступ к базе данных.
+
+    Все записи идут через одно соединение-писатель, чтения из пула потоков
+    используют собственные соединения только для чтения (в режиме WAL они не
+    блокируются писателем). Соединение писателя используется только потоком
+    записи, остальные потоки получают свои (см. conn). Для обработчиков есть асинхронный фасад: любой
+    метод можно вызвать с префиксом ``a`` (``await db.aget_user(telegram_id)``),
+    тогда запрос выполнится вне event loop. Чтения (см. READ_METHOD_PREFIXES)
+    идут параллельно в пуле читателей, записи выполняются по одной в потоке записи.
+    Параметры соединений задаются в config.py (DB_*).
+
+    Несколько изменений, которые должны примениться вместе, выполняются в
+    ``with db.transaction(): ...``: методы внутри блока не делают commit сами.
+    Записи из потока записи фиксируются группами (см. _writer_loop).
+
+    Результаты тяжелых чтений можно кэшировать через _cached: кэш сбрасывается
+    каждым commit (см. _mark_written).
+    """
+
+    def __init__(self, db_name=DB_NAME):
+        self.db_name = db_name
+        self._local = threading.local()
+        self._writer_conn = self._connect()
+        self._read_executor = ThreadPoolExecutor(max_workers=DB_READ_WORKERS,
+                                                 thread_name_prefix='db-reader',
+                                                 initializer=self._init_reader_thread)
+        self._write_queue = queue.Queue()
+        self._writer_thread = threading.Thread(target=self._writer_loop, name='db-writer', daemon=True)
+        # Соединения пула читателей и прочих потоков (закрываются в close)
+        self._reader_conns = []
+        self._reader_conns_lock = threading.Lock()
+        # Номер последнего commit и кэш чтений: key -> (номер commit, время, значение)
+        self._write_counter = itertools.count(1)
+        self._write_generation = 0
+        self._read_cache = {}
+        # Версия меню: увеличивается после commit изменений menu_items (см. MenuManager)
+        self._menu_counter = itertools.count(1)
+        self.menu_version = 0
+        self._menu_listeners = []
+        # Схема создается и обновляется версионированными миграциями (migrations.py);
+        # для актуальной базы это одна проверка PRAGMA user_version
+        apply_migrations(self._writer_conn)
+        self._writer_thread.start()
+
+    def _connect(self, readonly=False):
+        """Открыть соединение с настройками из config.py"""
+        conn = sqlite3.connect(self.db_name, check_same_thread=False,
+                               timeout=DB_BUSY_TIMEOUT_MS / 1000)
+        conn.execute(f'PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)}')
+        if not readonly:
+            # journal_mode сохраняется в файле базы, достаточно включить его писателем
+            mode = conn.execute(f'PRAGMA journal_mode = {DB_JOURNAL_MODE}').fetchone()[0]
+            if mode.upper() != DB_JOURNAL_MODE.upper():
+                logger.warning(f"Не удалось включить journal_mode={DB_JOURNAL_MODE}, используется {mode}")
+        conn.execute(f'PRAGMA synchronous = {DB_SYNCHRONOUS}')
+        conn.execute(f'PRAGMA cache_size = -{int(DB_CACHE_SIZE_KB)}')
+        conn.execute(f'PRAGMA mmap_size = {int(DB_MMAP_SIZE)}')
+        conn.execute(f'PRAGMA temp_store = {DB_TEMP_STORE}')
+        if readonly:
+            conn.execute('PRAGMA query_only = ON')
+        return conn
+
+    def _init_reader_thread(self):
+        """Каждый поток пула читателей получает собственное соединение"""
+        self._local.conn = self._open_thread_conn(readonly=True)
+
+    def _open_thread_conn(self, readonly):
+        conn = self._connect(readonly=readonly)
+        with self._reader_conns_lock:
+            self._reader_conns.append(conn)
+        return conn
+
+    @property
+    def conn(self):
+        """Соединение для текущего потока.
+
+        Пул читателей и поток записи используют свои соединения. Поток с
+        работающим event loop получает собственное соединение только для чтения:
+        записи оттуда идут через run_write (``await db.aNAME(...)``), прямая
+        запись завершится ошибкой. Скрипты и тесты без event loop получают
+        собственное соединение для записи. Соединение писателя другим потокам
+        не отдается: его незафиксированная группа не должна быть видна снаружи.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            if getattr(self._local, 'own_conn', None) is None:
+                self._local.own_conn = self._open_thread_conn(readonly=False)
+            return self._local.own_conn
+        if getattr(self._local, 'loop_conn', None) is None:
+            self._local.loop_conn = self._open_thread_conn(readonly=True)
+        return self._local.loop_conn
+
+    def __getattr__(self, name):
+        # db.aget_user(...) -> корутина, выполняющая db.get_user(...) в пуле потоков
+        if name.startswith('a') and callable(getattr(type(self), name[1:], None)):
+            method_name = name[1:]
+            if method_name.startswith(READ_METHOD_PREFIXES):
+                return functools.partial(self.run_read, getattr(self, method_name))
+            return functools.partial(self.run_write, getattr(self, method_name))
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    async def run_read(self, func, *args, **kwargs):
+        """Выполнить читающую функцию в пуле потоков, не блокируя event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._read_executor, functools.partial(func, *args, **kwargs))
+
+    async def run_write(self, func, *args, **kwargs):
+        """Выполнить пишущую функцию в потоке записи (записи выполняются строго по очереди).
+
+        Функция целиком выполняется как одна транзакция; результат возвращается
+        после commit, поэтому изменения сразу видны читателям.
+        """
+        future = Future()
+        self._write_queue.put((functools.partial(func, *args, **kwargs), future))
+        return await asyncio.wrap_future(future)
+
+    def _writer_loop(self):
+        """Поток записи с групповым commit.
+
+        Записи, которые уже ждут в очереди, когда поток освобождается (не больше
+        DB_GROUP_COMMIT_MAX), выполняются в одной транзакции - каждая в своем
+        SAVEPOINT, так что ошибка одной записи откатывает только ее изменения.
+        Один commit на группу вместо commit на каждую запись; одиночная запись
+        фиксируется сразу, без ожидания.
+        """
+        self._local.conn = self._writer_conn
+        while True:
+            job = self._write_queue.get()
+            if job is None:
+                return
+            group = [job]
+            while len(group) < DB_GROUP_COMMIT_MAX:
+                try:
+                    job = self._write_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    # Остановка: сначала завершаем текущую группу
+                    self._write_queue.put(None)
+                    break
+                group.append(job)
+            self._run_write_group(group)
+
+    def _run_write_group(self, group):
+        """Выполнить группу записей и зафиксировать их одним commit"""
+        conn = self._writer_conn
+        results = []
+        self._local.group_commit = True
+        try:
+            for func, future in group:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with self.transaction():
+                        results.append((future, func(), None))
+                except Exception as e:
+                    results.append((future, None, e))
+            try:
+                if conn.in_transaction:
+                    conn.commit()
+                    self._mark_written()
+            except sqlite3.Error as e:
+                conn.rollback()
+                results = [(future, None, e) for future, _, _ in results]
+        finally:
+            self._local.group_commit = False
+
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
             else:
-                print("✅ Индекс уже существует")
-
-            # Создаем таблицу статистики продаж
-            cursor.execute('''
-                CREATE TABLE shift_sales (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    shift_id INTEGER,
-                    item_name TEXT,
-                    quantity INTEGER,
-                    total_amount INTEGER,
-                    FOREIGN KEY (shift_id) REFERENCES shifts (id)
-                )
-            ''')
-
-            # Восстанавливаем данные из старой таблицы если она существовала
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='shifts_old'")
-            if cursor.fetchone():
-                print("🔄 Восстанавливаем данные из старой таблицы shifts...")
-                cursor.execute('''
-                    INSERT INTO shifts (id, shift_number, month_year, admin_id, opened_at, closed_at, 
-                                      total_revenue, total_orders, status)
-                    SELECT id, shift_number, 
-                           CASE 
-                               WHEN month_year IS NOT NULL THEN month_year
-                               ELSE substr(opened_at, 1, 7)
-                           END as month_year,
-                           admin_id, opened_at, closed_at, total_revenue, total_orders, status
-                    FROM shifts_old
-                    ORDER BY id
-                ''')
-
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='shift_sales_old'")
-                if cursor.fetchone():
-                    cursor.execute('''
-                        INSERT INTO shift_sales (shift_id, item_name, quantity, total_amount)
-                        SELECT shift_id, item_name, quantity, total_amount
-                        FROM shift_sales_old
-                    ''')
-
-                # Удаляем временные таблицы
-                cursor.execute('DROP TABLE IF EXISTS shifts_old')
-                cursor.execute('DROP TABLE IF EXISTS shift_sales_old')
-
-                print("✅ Данные успешно восстановлены")
-
-            # Включаем foreign keys обратно
-            cursor.execute('PRAGMA foreign_keys = ON')
+                future.set_exception(error)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Единица работы: ``with db.transaction(): ...``.
+
+        Методы Database внутри блока не фиксируют изменения сами: commit выполняется
+        один раз при выходе из внешнего блока, при исключении все изменения блока
+        откатываются. Блоки можно вкладывать, вложенный блок - это SAVEPOINT.
+        В потоке записи commit откладывается до конца группы (см. _writer_loop).
+        """
+        conn = self.conn
+        depth = getattr(self._local, 'tx_depth', 0)
+        owner = depth == 0 and not getattr(self._local, 'group_commit', False)
+        savepoint = f'tx_{depth}'
+        if not conn.in_transaction:
+            conn.execute('BEGIN')
+        conn.execute(f'SAVEPOINT {savepoint}')
+        self._local.tx_depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            if owner:
+                conn.rollback()
+            else:
+                conn.execute(f'ROLLBACK TO {savepoint}')
+                conn.execute(f'RELEASE {savepoint}')
+            raise
         else:
-            print("✅ Таблица shifts уже существует с правильным индексом")
-
-        self.conn.commit()
-
-        # Проверяем и добавляем отсутствующие колонки
-        self._update_schema()
-
-        # После создания таблицы заполнить её данными
-        self.populate_menu_items()
-
-        # Проверяем и исправляем категории меню
-        self.fix_menu_categories()
-
-    def _update_schema(self):
-        """Обновляет схему базы данных, добавляя отсутствующие колонки"""
-        cursor = self.conn.cursor()
-
-        # Проверяем наличие колонки referred_by в таблице users
-        cursor.execute("PRAGMA table_info(users)")
-        columns = [column[1] for column in cursor.fetchall()]
-
-        if 'referred_by' not in columns:
-            print("🔄 Добавляем колонку referred_by в таблицу users...")
-            cursor.execute('ALTER TABLE users ADD COLUMN referred_by INTEGER DEFAULT NULL')
-            self.conn.commit()
-            print("✅ Колонка referred_by добавлена")
-
-        # Проверяем наличие колонки closed_at в таблице orders
-        cursor.execute("PRAGMA table_info(orders)")
-        columns = [column[1] for column in cursor.fetchall()]
-
-        if 'closed_at' not in columns:
-            print("🔄 Добавляем колонку closed_at в таблицу orders...")
-            cursor.execute('ALTER TABLE orders ADD COLUMN closed_at TEXT')
-            self.conn.commit()
-            print("✅ Колонка closed_at добавлена")
-
-        # ========== ДОБАВЛЕНО: Проверка payment_method в orders ==========
-        # Нужно заново получить колонки, так как orders мог измениться
-        cursor.execute("PRAGMA table_info(orders)")
-        columns = [column[1] for column in cursor.fetchall()]
-
-        if 'payment_method' not in columns:
-            print("🔄 Добавляем колонку payment_method в таблицу orders...")
-            cursor.execute('ALTER TABLE orders ADD COLUMN payment_method TEXT DEFAULT NULL')
-            self.conn.commit()
-            print("✅ Колонка payment_method добавлена")
-        # ========== КОНЕЦ ДОБАВЛЕНИЯ ==========
-
-        # Проверяем наличие колонку month_year в таблице shifts
-        cursor.execute("PRAGMA table_info(shifts)")
-        columns = [column[1] for column in cursor.fetchall()]
-
-        if 'month_year' not in columns:
-            print("🔄 Добавляем колонку month_year в таблицу shifts...")
-            cursor.execute('ALTER TABLE shifts ADD COLUMN month_year TEXT')
-
-            # Обновляем существующие записи
-            cursor.execute('SELECT id, opened_at FROM shifts')
-            shifts = cursor.fetchall()
-            for shift_id, opened_at in shifts:
-                if opened_at:
-                    month_year = opened_at[:7]  # Берем YYYY-MM
-                    cursor.execute('UPDATE shifts SET month_year = ? WHERE id = ?', (month_year, shift_id))
-
-            self.conn.commit()
-            print("✅ Колонка month_year добавлена")
-
-        # Проверяем наличие колонки is_active в таблице menu_items
-        cursor.execute("PRAGMA table_info(menu_items)")
-        columns = [column[1] for column in cursor.fetchall()]
-
-        if 'is_active' not in columns:
-            print("🔄 Добавляем колонку is_active в таблицу menu_items...")
-            cursor.execute('ALTER TABLE menu_items ADD COLUMN is_active BOOLEAN DEFAULT TRUE')
+            conn.execute(f'RELEASE {savepoint}')
+            if owner:
+                conn.commit()
+                self._mark_written()
+        finally:
+            self._local.tx_depth = depth
+
+    def _cursor(self, row_class, fields=None):
+        """Курсор, возвращающий строки row_class (rows.py); fields - выбранные поля"""
+        cursor = self.conn.cursor()
+        cursor.row_factory = row_class.factory(fields)
+        return cursor
+
+    def _commit(self):
+        """Зафиксировать изменения метода, если он вызван не внутри transaction()"""
+        if not getattr(self._local, 'tx_depth', 0):
             self.conn.commit()
-            print("✅ Колонка is_active добавлена")
-
-    def fix_menu_categories(self):
-        """Исправить категории в меню если необходимо"""
-        cursor = self.conn.cursor()
-
-        # Список кальянов для проверки
-        hookah_items = ["Пенсионный", "Стандарт", "Премиум", "Фруктовая чаша", "Сигарный", "Парфюм"]
-
-        for item_name in hookah_items:
-            cursor.execute('SELECT category FROM menu_items WHERE name = ?', (item_name,))
-            result = cursor.fetchone()
-
-            if result and result[0] != 'Кальяны':
-                print(f"🔄 Исправляем категорию для {item_name}: было '{result[0]}', станет 'Кальяны'")
-                cursor.execute('UPDATE menu_items SET category = ? WHERE name = ?', ('Кальяны', item_name))
-            elif not result:
-                print(f"⚠️ Позиция {item_name} не найдена в базе данных")
-
-        self.conn.commit()
-        print("✅ Категории меню проверены и исправлены при необходимости")
-
-    def populate_menu_items(self):
-        """Заполнить таблицу menu_items базовыми данными"""
-        cursor = self.conn.cursor()
-
-        # Проверяем, есть ли уже данные в таблице
-        cursor.execute('SELECT COUNT(*) FROM menu_items')
-        count = cursor.fetchone()[0]
-
-        if count == 0:
-            menu_items = [
-                # Кальяны
-                ("Пенсионный", 800, "Кальяны"),
-                ("Стандарт", 1000, "Кальяны"),
-                ("Премиум", 1200, "Кальяны"),
-                ("Фруктовая чаша", 1500, "Кальяны"),
-                ("Сигарный", 1500, "Кальяны"),
-                ("Парфюм", 2000, "Кальяны"),
-
-                # Напитки
-                ("Вода", 100, "Напитки"),
-                ("Кола 0,5л", 100, "Напитки"),
-                ("Кола/Фанта/Спрайт 1л", 200, "Напитки"),
-                ("Пиво/Энергетик", 200, "Напитки"),
-
-                # Коктейли
-                ("В/кола", 400, "Коктейли"),
-                ("Санрайз", 400, "Коктейли"),
-                ("Лагуна", 400, "Коктейли"),
-                ("Фиеро", 400, "Коктейли"),
-                ("Пробирки", 600, "Коктейли"),
-
-                # Чай
-                ("Да Хун Пао", 400, "Чай"),
-                ("Те Гуань Инь", 400, "Чай"),
-                ("Шу пуэр", 400, "Чай"),
-                ("Сяо Чжун", 400, "Чай"),
-                ("Юэ Гуан Бай", 400, "Чай"),
-                ("Габа", 400, "Чай"),
-                ("Гречишный", 400, "Чай"),
-                ("Медовая дыня", 400, "Чай"),
-                ("Малина/Мята", 400, "Чай"),
-                ("Наглый фрукт", 400, "Чай"),
-                ("Вишневый пуэр", 500, "Чай"),
-                ("Марроканский", 500, "Чай"),
-                ("Голубика", 500, "Чай"),
-                ("Смородиновый", 500, "Чай"),
-                ("Клубничный", 500, "Чай"),
-                ("Облепиховый", 500, "Чай")
-            ]
-
-            for name, price, category in menu_items:
+            self._mark_written()
+
+    def _mark_written(self):
+        """Отметить commit: закэшированные до него результаты чтений устарели"""
+        self._write_generation = next(self._write_counter)
+        if getattr(self._local, 'menu_changed', False):
+            self._local.menu_changed = False
+            self.menu_version = next(self._menu_counter)
+            for listener in self._menu_listeners:
                 try:
-                    cursor.execute(
-                        'INSERT INTO menu_items (name, price, category, is_active) VALUES (?, ?, ?, ?)',
-                        (name, price, category, True)
-                    )
-                except sqlite3.IntegrityError:
-                    # Если позиция уже существует, пропускаем
-                    continue
+                    listener()
+                except Exception as e:
+                    logger.error(f"Ошибка обновления меню после изменения: {e}")
+
+    def add_menu_listener(self, listener):
+        """Вызывать listener() после каждого commit, изменившего menu_items.
+
+        Вызов происходит в потоке, выполнившем commit (обычно в потоке записи,
+        до того как ожидающий обработчик получит результат), поэтому listener
+        может читать базу синхронно, не блокируя event loop.
+        """
+        self._menu_listeners.append(listener)
+
+    def _menu_changed(self):
+        """Отметить изменение menu_items: menu_version увеличится после commit"""
+        self._local.menu_changed = True
+
+    def _cached(self, key, ttl, compute):
+        """Результат compute() из кэша чтений.
+
+        Значение действительно ttl секунд и только до следующего commit: номер
+        commit запоминается до выполнения запроса, поэтому запись, зафиксированная
+        во время вычисления, тоже сбрасывает результат.
+        """
+        generation = self._write_generation
+        now = time.monotonic()
+        entry = self._read_cache.get(key)
+        if entry and entry[0] == generation and now - entry[1] < ttl:
+            return entry[2]
+        value = compute()
+        self._read_cache[key] = (generation, now, value)
+        return value
+
+    def close(self):
+        """Остановить рабочие потоки и закрыть соединения"""
+        self._read_executor.shutdown(wait=True)
+        self._write_queue.put(None)
+        self._writer_thread.join()
+        with self._reader_conns_lock:
+            for conn in self._reader_conns:
+                conn.close()
+            self._reader_conns.clear()
+        self._writer_conn.close()
 
-            self.conn.commit()
-            print("✅ Таблица menu_items заполнена данными")
+    def get_moscow_time(self):
+        """Получить текущее время в московском часовом поясе"""
+        tz = pytz.timezone('Europe/Moscow')
+        return datetime.now(tz).strftime('%Y-%m-%d %H:%M:%S')
 
     # НОВЫЕ МЕТОДЫ ДЛЯ УПРАВЛЕНИЯ МЕНЮ
     def get_all_menu_categories(self):
@@ -386,9 +364,9 @@ class Database:
 
     def get_menu_items_by_category(self, category):
         """Получить все позиции меню по категории"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT id, name, price, category, is_active 
+        cursor = self._cursor(MenuItemRow)
+        cursor.execute(f'''
+            SELECT {MenuItemRow.columns()}
             FROM menu_items 
             WHERE category = ? AND is_active = TRUE 
             ORDER BY name
@@ -397,9 +375,9 @@ class Database:
 
     def get_all_menu_items(self):
         """Получить все позиции меню"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT id, name, price, category, is_active 
+        cursor = self._cursor(MenuItemRow)
+        cursor.execute(f'''
+            SELECT {MenuItemRow.columns()}
             FROM menu_items 
             ORDER BY category, name
         ''')
@@ -407,14 +385,14 @@ class Database:
 
     def get_menu_item_by_id(self, item_id):
         """Получить позицию меню по ID"""
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT id, name, price, category, is_active FROM menu_items WHERE id = ?', (item_id,))
+        cursor = self._cursor(MenuItemRow)
+        cursor.execute(f'SELECT {MenuItemRow.columns()} FROM menu_items WHERE id = ?', (item_id,))
         return cursor.fetchone()
 
     def get_menu_item_by_name(self, name):
         """Получить позицию меню по названию"""
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT id, name, price, category, is_active FROM menu_items WHERE name = ?', (name,))
+        cursor = self._cursor(MenuItemRow)
+        cursor.execute(f'SELECT {MenuItemRow.columns()} FROM menu_items WHERE name = ?', (name,))
         return cursor.fetchone()
 
     def add_menu_item(self, name, price, category):
@@ -425,7 +403,8 @@ class Database:
                 'INSERT INTO menu_items (name, price, category, is_active) VALUES (?, ?, ?, ?)',
                 (name, price, category, True)
             )
-            self.conn.commit()
+            self._menu_changed()
+            self._commit()
             return True, "✅ Позиция успешно добавлена"
         except sqlite3.IntegrityError:
             return False, "❌ Позиция с таким названием уже существует"
@@ -445,7 +424,8 @@ class Database:
                 'UPDATE menu_items SET name = ?, price = ?, category = ? WHERE id = ?',
                 (name, price, category, item_id)
             )
-            self.conn.commit()
+            self._menu_changed()
+            self._commit()
             return True, "✅ Позиция успешно обновлена"
         except Exception as e:
             return False, f"❌ Ошибка при обновлении: {str(e)}"
@@ -455,7 +435,8 @@ class Database:
         cursor = self.conn.cursor()
         try:
             cursor.execute('UPDATE menu_items SET is_active = FALSE WHERE id = ?', (item_id,))
-            self.conn.commit()
+            self._menu_changed()
+            self._commit()
             return True, "✅ Позиция успешно удалена"
         except Exception as e:
             return False, f"❌ Ошибка при удалении: {str(e)}"
@@ -465,16 +446,17 @@ class Database:
         cursor = self.conn.cursor()
         try:
             cursor.execute('UPDATE menu_items SET is_active = TRUE WHERE id = ?', (item_id,))
-            self.conn.commit()
+            self._menu_changed()
+            self._commit()
             return True, "✅ Позиция успешно восстановлена"
         except Exception as e:
             return False, f"❌ Ошибка при восстановлении: {str(e)}"
 
     def get_inactive_menu_items(self):
         """Получить неактивные позиции меню"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT id, name, price, category, is_active 
+        cursor = self._cursor(MenuItemRow)
+        cursor.execute(f'''
+            SELECT {MenuItemRow.columns()}
             FROM menu_items 
             WHERE is_active = FALSE 
             ORDER BY category, name
@@ -482,50 +464,97 @@ class Database:
         return cursor.fetchall()
 
     def add_user(self, telegram_id, first_name, last_name, phone, referred_by=None):
+        """Зарегистрировать пользователя; None, если telegram_id уже занят.
+
+        Номер телефона сохраняется как введен (phone) и в формате E.164 (phone_e164).
+        Если номер принадлежит временному профилю гостя (telegram_id < 0), этот
+        профиль становится пользователем: брони гостя остаются за ним. Если номер
+        принадлежит другому зарегистрированному пользователю, поиск по номеру
+        дальше находит нового пользователя.
+        """
         try:
             cursor = self.conn.cursor()
             registration_date = self.get_moscow_time()
+            phone_e164 = normalize_phone(phone)
+
+            with self.transaction():
+                owner = None
+                if phone_e164:
+                    cursor.execute('SELECT id, telegram_id FROM users WHERE phone_e164 = ?', (phone_e164,))
+                    owner = cursor.fetchone()
+                if owner and owner[1] < 0:
+                    user_id = owner[0]
+                    cursor.execute('''
+                        UPDATE users
+                        SET telegram_id = ?, first_name = ?, last_name = ?, phone = ?, referred_by = ?,
+                            registration_date = ?, bonus_balance = bonus_balance + ?, is_active = TRUE,
+                            reachability = 'unknown', reachability_checked_at = NULL
+                        WHERE id = ?
+                    ''', (telegram_id, first_name, last_name, phone, referred_by, registration_date, 100, user_id))
+                else:
+                    if owner:
+                        cursor.execute('UPDATE users SET phone_e164 = NULL WHERE id = ?', (owner[0],))
+                    cursor.execute('''
+                        INSERT INTO users (telegram_id, first_name, last_name, phone, phone_e164, bonus_balance,
+                                           referred_by, registration_date)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (telegram_id, first_name, last_name, phone, phone_e164, 100, referred_by,
+                          registration_date))
+                    user_id = cursor.lastrowid
+
+                # Если пользователь зарегистрирован по реферальной ссылке, создаем запись
+                if referred_by:
+                    cursor.execute('''
+                        INSERT INTO referrals (referrer_id, referred_id, created_at)
+                        VALUES (?, ?, ?)
+                    ''', (referred_by, user_id, self.get_moscow_time()))
 
-            cursor.execute('''
-                INSERT INTO users (telegram_id, first_name, last_name, phone, bonus_balance, referred_by, registration_date)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (telegram_id, first_name, last_name, phone, 100, referred_by, registration_date))
-            user_id = cursor.lastrowid
-
-            # Если пользователь зарегистрирован по реферальной ссылке, создаем запись
-            if referred_by:
-                cursor.execute('''
-                    INSERT INTO referrals (referrer_id, referred_id, created_at)
-                    VALUES (?, ?, ?)
-                ''', (referred_by, user_id, self.get_moscow_time()))
-
-            self.conn.commit()
             return user_id
         except sqlite3.IntegrityError:
             return None
 
     def get_user(self, telegram_id):
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE telegram_id = ?', (telegram_id,))
+        cursor = self._cursor(UserRow)
+        cursor.execute(f'SELECT {UserRow.columns()} FROM users WHERE telegram_id = ?', (telegram_id,))
         return cursor.fetchone()
 
     def get_user_by_id(self, user_id):
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
+        cursor = self._cursor(UserRow)
+        cursor.execute(f'SELECT {UserRow.columns()} FROM users WHERE id = ?', (user_id,))
         return cursor.fetchone()
 
     def update_user_balance(self, user_id, amount):
         cursor = self.conn.cursor()
         cursor.execute('UPDATE users SET bonus_balance = bonus_balance + ? WHERE id = ?', (amount, user_id))
-        self.conn.commit()
+        self._commit()
+
+    def change_bonus_balance(self, user_id, amount, transaction_type, description):
+        """Изменить баланс и записать транзакцию одной единицей работы.
+
+        Списание (amount < 0) не уводит баланс в минус: если баллов недостаточно,
+        ничего не меняется и возвращается False.
+        """
+        cursor = self.conn.cursor()
+        with self.transaction():
+            cursor.execute('''
+                UPDATE users SET bonus_balance = bonus_balance + ?
+                WHERE id = ? AND bonus_balance + ? >= 0
+            ''', (amount, user_id, min(amount, 0)))
+            if not cursor.rowcount:
+                return False
+            self.add_transaction(user_id, amount, transaction_type, description)
+        return True
 
     def add_transaction(self, user_id, amount, transaction_type, description):
         cursor = self.conn.cursor()
+        now = self.get_moscow_time()
         cursor.execute('''
             INSERT INTO transactions (user_id, amount, type, description, date)
             VALUES (?, ?, ?, ?, ?)
-        ''', (user_id, amount, transaction_type, description, self.get_moscow_time()))
-        self.conn.commit()
+        ''', (user_id, amount, transaction_type, description, now))
+        if transaction_type == 'spend':
+            rollups.add_spent_bonuses(self.conn, now, amount)
+        self._commit()
 
     def create_booking(self, user_id, date, time, guests):
         cursor = self.conn.cursor()
@@ -533,7 +562,7 @@ class Database:
             INSERT INTO bookings (user_id, booking_date, booking_time, guests, created_at)
             VALUES (?, ?, ?, ?, ?)
         ''', (user_id, date, time, guests, self.get_moscow_time()))
-        self.conn.commit()
+        self._commit()
         return cursor.lastrowid
 
     def create_bonus_request(self, user_id, amount):
@@ -542,18 +571,134 @@ class Database:
             INSERT INTO bonus_requests (user_id, amount, created_at)
             VALUES (?, ?, ?)
         ''', (user_id, amount, self.get_moscow_time()))
-        self.conn.commit()
+        self._commit()
         return cursor.lastrowid
 
     def get_all_users(self):
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE is_active = TRUE ORDER BY id DESC')
+        cursor = self._cursor(UserRow, USER_LIST_FIELDS)
+        cursor.execute(f'SELECT {UserRow.columns(fields=USER_LIST_FIELDS)} FROM users '
+                       'WHERE is_active = TRUE ORDER BY id DESC')
         return cursor.fetchall()
 
-    def get_pending_requests(self):
+    def get_users_page(self, after_id=None, before_id=None, limit=USERS_PAGE_SIZE):
+        """Страница активных пользователей в порядке get_all_users (по убыванию id).
+
+        Страницы выбираются по ключу, а не через OFFSET: after_id - id последнего
+        пользователя предыдущей страницы (следующая страница), before_id - id первого
+        пользователя текущей страницы (предыдущая страница). Запрос читает только
+        limit строк индекса независимо от номера страницы.
+        """
+        cursor = self._cursor(UserRow, USER_LIST_FIELDS)
+        columns = UserRow.columns(fields=USER_LIST_FIELDS)
+        if before_id is not None:
+            cursor.execute(f'''
+                SELECT {columns} FROM users
+                WHERE is_active = TRUE AND id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (before_id, limit))
+            return cursor.fetchall()[::-1]
+        if after_id is not None:
+            cursor.execute(f'''
+                SELECT {columns} FROM users
+                WHERE is_active = TRUE AND id < ?
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (after_id, limit))
+        else:
+            cursor.execute(f'''
+                SELECT {columns} FROM users
+                WHERE is_active = TRUE
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (limit,))
+        return cursor.fetchall()
+
+    def count_active_users(self):
+        """Количество активных пользователей (считается по индексу idx_users_active)"""
         cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT br.*, u.first_name, u.last_name 
+        cursor.execute('SELECT COUNT(*) FROM users WHERE is_active = TRUE')
+        return cursor.fetchone()[0]
+
+    def search_users(self, query, limit=USER_SEARCH_LIMIT):
+        """Найти активных пользователей по ID, имени, фамилии, телефону или Telegram ID.
+
+        Поиск идет по полнотекстовому индексу users_fts (migrations.py): каждое слово
+        запроса ищется как начало слова ("Ив Пет" найдет "Иван Петров"), регистр и
+        ё/е не различаются, телефон находится по началу номера с кодом страны или
+        без него и по последним 4 цифрам. Результаты упорядочены по релевантности
+        (bm25), не больше limit. Если запрос - число, первым идет пользователь с
+        таким ID.
+        """
+        tokens = SEARCH_TOKEN.findall(query.replace('ё', 'е').replace('Ё', 'Е'))
+        if not tokens:
+            return []
+
+        cursor = self._cursor(UserRow, USER_LIST_FIELDS)
+        users = []
+        if query.strip().isdigit():
+            cursor.execute(f'SELECT {UserRow.columns(fields=USER_LIST_FIELDS)} FROM users '
+                           'WHERE id = ? AND is_active = TRUE', (int(query),))
+            users = cursor.fetchall()
+
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        cursor.execute(f'''
+            SELECT {UserRow.columns('u', USER_LIST_FIELDS)}
+            FROM users_fts f
+            JOIN users u ON u.id = f.rowid
+            WHERE users_fts MATCH ? AND u.is_active = TRUE
+            ORDER BY f.rank
+            LIMIT ?
+        ''', (match, limit))
+        found_ids = {user.id for user in users}
+        users += [user for user in cursor.fetchall() if user.id not in found_ids]
+        return users[:limit]
+
+    def find_user_by_phone(self, phone):
+        """Найти пользователя по номеру телефона в любом формате (89991234567, +7 999 123-45-67, ...).
+
+        Номер приводится к E.164 и ищется по уникальному индексу users.phone_e164.
+        Возвращает UserRow с id, first_name, last_name, phone или None.
+        """
+        phone_e164 = normalize_phone(phone)
+        if not phone_e164:
+            return None
+        fields = ('id', 'first_name', 'last_name', 'phone')
+        cursor = self._cursor(UserRow, fields)
+        cursor.execute(f'SELECT {UserRow.columns(fields=fields)} FROM users WHERE phone_e164 = ?', (phone_e164,))
+        return cursor.fetchone()
+
+    def create_guest_user(self, first_name, phone):
+        """Создать гостя без Telegram (бронь через администратора).
+
+        Гостю выдается временный отрицательный telegram_id (-1, -2, ...).
+        Если пользователь с таким номером уже есть, новый не создается.
+        Возвращает (user_id, telegram_id).
+        """
+        phone_e164 = normalize_phone(phone)
+        cursor = self.conn.cursor()
+        with self.transaction():
+            if phone_e164:
+                cursor.execute('SELECT id, telegram_id FROM users WHERE phone_e164 = ?', (phone_e164,))
+                existing = cursor.fetchone()
+                if existing:
+                    return existing
+
+            cursor.execute('SELECT MIN(telegram_id) FROM users WHERE telegram_id < 0')
+            min_temp_id = cursor.fetchone()[0]
+            temp_telegram_id = (min_temp_id or 0) - 1
+
+            cursor.execute('''
+                INSERT INTO users (telegram_id, first_name, last_name, phone, phone_e164, bonus_balance,
+                                   registration_date)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (temp_telegram_id, first_name, "", phone, phone_e164, 0, self.get_moscow_time()))
+        return cursor.lastrowid, temp_telegram_id
+
+    def get_pending_requests(self):
+        cursor = self._cursor(BonusRequestRow)
+        cursor.execute(f'''
+            SELECT {BonusRequestRow.columns('br')}, u.first_name, u.last_name
             FROM bonus_requests br 
             JOIN users u ON br.user_id = u.id 
             WHERE br.status = 'pending'
@@ -564,13 +709,72 @@ class Database:
     def update_bonus_request(self, request_id, status):
         cursor = self.conn.cursor()
         cursor.execute('UPDATE bonus_requests SET status = ? WHERE id = ?', (status, request_id))
-        self.conn.commit()
+        self._commit()
 
-    def get_user_bookings(self, user_id):
+    def approve_bonus_request(self, request_id):
+        """Одобрить запрос на списание: баланс, статус запроса и транзакция меняются вместе.
+
+        Возвращает False, если запрос уже обработан или баллов недостаточно.
+        """
         cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM bookings WHERE user_id = ? ORDER BY created_at DESC', (user_id,))
+        with self.transaction():
+            cursor.execute("SELECT user_id, amount FROM bonus_requests WHERE id = ? AND status = 'pending'",
+                           (request_id,))
+            request = cursor.fetchone()
+            if not request:
+                return False
+
+            user_id, amount = request
+            if not self.change_bonus_balance(user_id, -amount, 'spend', 'Списание по запросу'):
+                return False
+            self.update_bonus_request(request_id, 'approved')
+        return True
+
+    def get_user_bookings(self, user_id):
+        cursor = self._cursor(BookingRow)
+        cursor.execute(f'SELECT {BookingRow.columns()} FROM bookings WHERE user_id = ? ORDER BY created_at DESC',
+                       (user_id,))
+        return cursor.fetchall()
+
+    def get_user_bookings_by_date(self, user_id, date):
+        """Получить бронирования пользователя на дату 'DD.MM.YYYY'"""
+        day = _booking_day(date)
+        if day is None:
+            return []
+        condition, params = self._booking_filter(day, user_id)
+        cursor = self._cursor(BookingRow)
+        cursor.execute(f'''
+            SELECT {BookingRow.columns()} FROM bookings
+            WHERE {condition}
+            ORDER BY booking_at
+        ''', params)
         return cursor.fetchall()
 
+    def get_booking_with_user(self, booking_id, user_id=None):
+        """Получить бронирование с данными пользователя (first_name, last_name, phone, telegram_id)"""
+        cursor = self._cursor(BookingRow)
+        if user_id is not None:
+            cursor.execute(f'''
+                SELECT {BookingRow.columns('b')}, u.first_name, u.last_name, u.phone, u.telegram_id
+                FROM bookings b
+                JOIN users u ON b.user_id = u.id
+                WHERE b.id = ? AND u.id = ?
+            ''', (booking_id, user_id))
+        else:
+            cursor.execute(f'''
+                SELECT {BookingRow.columns('b')}, u.first_name, u.last_name, u.phone, u.telegram_id
+                FROM bookings b
+                JOIN users u ON b.user_id = u.id
+                WHERE b.id = ?
+            ''', (booking_id,))
+        return cursor.fetchone()
+
+    def update_booking_status(self, booking_id, status):
+        """Изменить статус бронирования"""
+        cursor = self.conn.cursor()
+        cursor.execute('UPDATE bookings SET status = ? WHERE id = ?', (status, booking_id))
+        self._commit()
+
     def get_referrer_stats(self, user_id):
         """Получить статистику по рефералам"""
         cursor = self.conn.cursor()
@@ -594,67 +798,146 @@ class Database:
         if result and result[0]:
             referrer_id = result[0]
 
-            # Проверяем, не был ли уже начислен бонус
-            cursor.execute('''
-                SELECT bonus_awarded FROM referrals 
-                WHERE referred_id = ? AND referrer_id = ?
-            ''', (referred_user_id, referrer_id))
-
-            referral = cursor.fetchone()
-
-            if referral and not referral[0]:
-                # Начисляем бонус рефереру
-                from config import REFERRAL_BONUS
-                self.update_user_balance(referrer_id, REFERRAL_BONUS)
-                self.add_transaction(referrer_id, REFERRAL_BONUS, 'earn',
-                                     f'Реферальный бонус за приглашенного пользователя')
-
-                # Отмечаем бонус как начисленный
+            # Баланс, транзакция и отметка о начислении применяются вместе;
+            # отметка ставится только если бонус еще не начислен
+            with self.transaction():
                 cursor.execute('''
                     UPDATE referrals SET bonus_awarded = 1 
-                    WHERE referred_id = ? AND referrer_id = ?
+                    WHERE referred_id = ? AND referrer_id = ? AND NOT bonus_awarded
                 ''', (referred_user_id, referrer_id))
 
-                self.conn.commit()
-                return referrer_id, REFERRAL_BONUS
+                if cursor.rowcount:
+                    # Начисляем бонус рефереру
+                    from config import REFERRAL_BONUS
+                    self.change_bonus_balance(referrer_id, REFERRAL_BONUS, 'earn',
+                                              f'Реферальный бонус за приглашенного пользователя')
+                    return referrer_id, REFERRAL_BONUS
 
         return None, 0
 
     def get_bookings_by_status(self, status):
         """Получить бронирования по статусу"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT b.*, u.first_name, u.last_name, u.phone, u.telegram_id
+        cursor = self._cursor(BookingRow)
+        cursor.execute(f'''
+            SELECT {BookingRow.columns('b')}, u.first_name, u.last_name, u.phone, u.telegram_id
             FROM bookings b 
             JOIN users u ON b.user_id = u.id 
             WHERE b.status = ?
-            ORDER BY b.booking_date, b.booking_time
+            ORDER BY b.booking_at
         ''', (status,))
         return cursor.fetchall()
 
     def get_bookings_by_date(self, date):
-        """Получить бронирования по дате"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT b.*, u.first_name, u.last_name, u.phone, u.telegram_id
+        """Получить бронирования на дату 'DD.MM.YYYY'"""
+        day = _booking_day(date)
+        if day is None:
+            return []
+        condition, params = self._booking_filter(day, alias='b.')
+        cursor = self._cursor(BookingRow)
+        cursor.execute(f'''
+            SELECT {BookingRow.columns('b')}, u.first_name, u.last_name, u.phone, u.telegram_id
             FROM bookings b 
             JOIN users u ON b.user_id = u.id 
-            WHERE b.booking_date = ?
-            ORDER BY b.booking_time
-        ''', (date,))
+            WHERE {condition}
+            ORDER BY b.booking_at
+        ''', params)
         return cursor.fetchall()
 
     def get_all_bookings_sorted(self):
         """Получить все бронирования с сортировкой по дате и времени"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT b.*, u.first_name, u.last_name, u.phone, u.telegram_id
+        cursor = self._cursor(BookingRow)
+        cursor.execute(f'''
+            SELECT {BookingRow.columns('b')}, u.first_name, u.last_name, u.phone, u.telegram_id
             FROM bookings b 
             JOIN users u ON b.user_id = u.id 
-            ORDER BY b.booking_date, b.booking_time
+            ORDER BY b.booking_at
         ''')
         return cursor.fetchall()
 
+    def get_bookings_page(self, status=None, after_id=None, limit=BOOKINGS_PAGE_SIZE):
+        """Страница бронирований (с данными пользователя) в порядке даты и времени.
+
+        status - фильтр по статусу (None - все бронирования). after_id - последнее
+        бронирование предыдущей страницы: следующая страница начинается сразу после
+        него в порядке (booking_at, id). Поиск позиции идет по индексу
+        idx_bookings_status_at / idx_bookings_at, без OFFSET.
+
+        Брони, дату которых не удалось разобрать (booking_at IS NULL), идут
+        первыми и тоже листаются по id.
+        """
+        conditions = []
+        params = []
+        if status is not None:
+            conditions.append('b.status = ?')
+            params.append(status)
+        if after_id is not None:
+            cursor = self.conn.cursor()
+            cursor.execute('SELECT booking_at FROM bookings WHERE id = ?', (after_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return []
+            if row[0] is None:
+                # Сравнение с NULL ничего не вернет: дальше - остальные брони без даты и все с датой
+                conditions.append('(b.booking_at IS NOT NULL OR b.id > ?)')
+                params.append(after_id)
+            else:
+                conditions.append('(b.booking_at, b.id) > (?, ?)')
+                params.extend((row[0], after_id))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        cursor = self._cursor(BookingRow)
+        cursor.execute(f'''
+            SELECT {BookingRow.columns('b')}, u.first_name, u.last_name, u.phone, u.telegram_id
+            FROM bookings b
+            JOIN users u ON b.user_id = u.id
+            {where}
+            ORDER BY b.booking_at, b.id
+            LIMIT ?
+        ''', params + [limit])
+        return cursor.fetchall()
+
+    def count_bookings(self, status=None):
+        """Количество бронирований со статусом status (None - всех), по индексу"""
+        cursor = self.conn.cursor()
+        if status is None:
+            cursor.execute('SELECT COUNT(*) FROM bookings')
+        else:
+            cursor.execute('SELECT COUNT(*) FROM bookings WHERE status = ?', (status,))
+        return cursor.fetchone()[0]
+
+    def get_dashboard_stats(self):
+        """Сводка для экрана статистики администратора.
+
+        Возвращает словарь: users (активные пользователи), total_balance,
+        average_balance, bookings (pending, confirmed, cancelled, total) и
+        pending_requests. Все считается агрегатами в одном запросе; результат
+        кэшируется на DASHBOARD_STATS_TTL секунд и сбрасывается любой записью.
+        """
+        return self._cached('dashboard_stats', DASHBOARD_STATS_TTL, self._query_dashboard_stats)
+
+    def _query_dashboard_stats(self):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT u.users_count, u.total_balance,
+                   b.pending, b.confirmed, b.cancelled, b.total,
+                   (SELECT COUNT(*) FROM bonus_requests WHERE status = 'pending')
+            FROM (SELECT COUNT(*) AS users_count, COALESCE(SUM(bonus_balance), 0) AS total_balance
+                  FROM users WHERE is_active = TRUE) u,
+                 (SELECT COUNT(*) FILTER (WHERE status = 'pending') AS pending,
+                         COUNT(*) FILTER (WHERE status = 'confirmed') AS confirmed,
+                         COUNT(*) FILTER (WHERE status = 'cancelled') AS cancelled,
+                         COUNT(*) AS total
+                  FROM bookings) b
+        ''')
+        users_count, total_balance, pending, confirmed, cancelled, total, pending_requests = cursor.fetchone()
+        return {
+            'users': users_count,
+            'total_balance': total_balance,
+            'average_balance': total_balance // users_count if users_count > 0 else 0,
+            'bookings': {'pending': pending, 'confirmed': confirmed, 'cancelled': cancelled, 'total': total},
+            'pending_requests': pending_requests,
+        }
+
     def get_booking_stats(self):
         """Получить статистику по бронированиям"""
         cursor = self.conn.cursor()
@@ -677,28 +960,192 @@ class Database:
         stats_dict['total'] = total
         return stats_dict
 
-    def get_booking_dates(self):
-        """Получить список уникальных дат, на которые есть бронирования"""
+    def get_booking_years(self, user_id=None):
+        """Годы ('YYYY'), в которых есть бронирования (всех или одного пользователя), новые первыми"""
+        condition, params = self._booking_filter(Period.all(), user_id)
         cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT DISTINCT booking_date 
-            FROM bookings 
-            ORDER BY booking_date
-        ''')
-        dates = cursor.fetchall()
-        return [date[0] for date in dates] if dates else []
+        cursor.execute(f'''
+            SELECT substr(booking_at, 1, 4) AS year
+            FROM bookings
+            WHERE {condition}
+            GROUP BY year
+            ORDER BY year DESC
+        ''', params)
+        return [row[0] for row in cursor.fetchall()]
+
+    def get_booking_months(self, year, user_id=None):
+        """Месяцы ('MM') года year, в которых есть бронирования, последние первыми"""
+        condition, params = self._booking_filter(Period.year(year), user_id)
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT substr(booking_at, 6, 2) AS month
+            FROM bookings
+            WHERE {condition}
+            GROUP BY month
+            ORDER BY month DESC
+        ''', params)
+        return [row[0] for row in cursor.fetchall()]
+
+    def get_booking_days(self, year, month, user_id=None):
+        """Даты ('DD.MM.YYYY') месяца, на которые есть бронирования, последние первыми"""
+        condition, params = self._booking_filter(Period.month(year, month), user_id)
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT substr(booking_at, 1, 10) AS day
+            FROM bookings
+            WHERE {condition}
+            GROUP BY day
+            ORDER BY day DESC
+        ''', params)
+        return [f'{day[8:10]}.{day[5:7]}.{day[:4]}' for day, in cursor.fetchall()]
+
+    @staticmethod
+    def _booking_filter(period, user_id=None, alias=''):
+        """Условие по booking_at за период (и по пользователю) для индексов
+        idx_bookings_at / idx_bookings_user_at"""
+        condition, params = period.where(f'{alias}booking_at')
+        condition = f'{alias}booking_at IS NOT NULL AND {condition}'
+        if user_id is not None:
+            condition = f'{alias}user_id = ? AND {condition}'
+            params = (user_id,) + params
+        return condition, params
 
     def get_order_by_id(self, order_id):
         """Получить заказ по ID"""
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM orders WHERE id = ?', (order_id,))
+        cursor = self._cursor(OrderRow)
+        cursor.execute(f'SELECT {OrderRow.columns()} FROM orders WHERE id = ?', (order_id,))
         return cursor.fetchone()
 
-    def get_active_orders(self):
-        """Получить все активные заказы с информацией об администраторе"""
+    def create_order(self, table_number, admin_id):
+        """Создать новый заказ"""
         cursor = self.conn.cursor()
         cursor.execute('''
-            SELECT o.*, u.first_name, u.last_name 
+            INSERT INTO orders (table_number, admin_id, status, created_at)
+            VALUES (?, ?, ?, ?)
+        ''', (table_number, admin_id, 'active', self.get_moscow_time()))
+        self._commit()
+        return cursor.lastrowid
+
+    def add_order_item(self, order_id, item_name, price, quantity=1):
+        """Добавить позицию в заказ (сумма и количество в orders обновляются в той же транзакции)"""
+        cursor = self.conn.cursor()
+        with self.transaction():
+            cursor.execute('''
+                INSERT INTO order_items (order_id, item_name, price, quantity, added_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (order_id, item_name, price, quantity, self.get_moscow_time()))
+            cursor.execute('''
+                UPDATE orders SET total_amount = total_amount + ?, item_count = item_count + ?
+                WHERE id = ?
+            ''', (price * quantity, quantity, order_id))
+        return True
+
+    def get_order_items(self, order_id):
+        """Получить все позиции заказа"""
+        cursor = self._cursor(OrderItemRow)
+        cursor.execute(f'SELECT {OrderItemRow.columns()} FROM order_items WHERE order_id = ?', (order_id,))
+        return cursor.fetchall()
+
+    def get_order_total(self, order_id):
+        """Получить общую сумму заказа"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT total_amount FROM orders WHERE id = ?', (order_id,))
+        result = cursor.fetchone()
+        return (result[0] or 0) if result else 0
+
+    def _fetch_by_ids(self, sql, ids, row_class=None, fields=None):
+        """Выполнить запрос с условием IN ({ids}) для списка id.
+
+        Список разбивается на части по IN_CHUNK_SIZE, чтобы не превысить
+        ограничение SQLite на число параметров запроса. С row_class строки
+        возвращаются как row_class (см. _cursor).
+        """
+        ids = list(dict.fromkeys(i for i in ids if i is not None))
+        rows = []
+        cursor = self._cursor(row_class, fields) if row_class else self.conn.cursor()
+        for start in range(0, len(ids), IN_CHUNK_SIZE):
+            chunk = ids[start:start + IN_CHUNK_SIZE]
+            cursor.execute(sql.format(ids=', '.join('?' * len(chunk))), chunk)
+            rows.extend(cursor.fetchall())
+        return rows
+
+    def get_order_items_for_orders(self, order_ids):
+        """Получить позиции сразу нескольких заказов: {order_id: [позиции]}.
+
+        Позиции в том же формате, что и get_order_items; у заказов без позиций пустой список.
+        """
+        items_by_order = {order_id: [] for order_id in order_ids}
+        rows = self._fetch_by_ids(f'SELECT {OrderItemRow.columns()} FROM order_items '
+                                  'WHERE order_id IN ({ids}) ORDER BY id', order_ids, OrderItemRow)
+        for row in rows:
+            items_by_order.setdefault(row.order_id, []).append(row)
+        return items_by_order
+
+    def get_order_totals(self, order_ids):
+        """Получить суммы сразу нескольких заказов: {order_id: сумма}"""
+        totals = {order_id: 0 for order_id in order_ids}
+        rows = self._fetch_by_ids('SELECT id, total_amount FROM orders WHERE id IN ({ids})', order_ids)
+        for order_id, total in rows:
+            totals[order_id] = total or 0
+        return totals
+
+    def get_users_by_ids(self, user_ids):
+        """Получить сразу несколько пользователей по ID: {id: пользователь}"""
+        rows = self._fetch_by_ids(f'SELECT {UserRow.columns()} FROM users WHERE id IN ({{ids}})',
+                                  user_ids, UserRow)
+        return {row.id: row for row in rows}
+
+    def close_order(self, order_id):
+        """Закрыть заказ. Сумма и количество позиций при этом сверяются с order_items"""
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            UPDATE orders
+            SET status = 'closed', closed_at = ?,
+                total_amount = {ORDER_TOTAL_SQL}, item_count = {ORDER_ITEM_COUNT_SQL}
+            WHERE id = ?
+        ''', (self.get_moscow_time(), order_id))
+        self._refresh_order_payments(order_id)
+        self._commit()
+
+    def _refresh_order_payments(self, order_id):
+        """Пересчитать сводку оплат за день и месяц заказа (без commit)"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT created_at FROM orders WHERE id = ?', (order_id,))
+        row = cursor.fetchone()
+        if row and row[0]:
+            rollups.refresh_payments(self.conn, row[0])
+
+    def verify_order_totals(self, fix=False):
+        """Проверить, что orders.total_amount и item_count совпадают с order_items.
+
+        Возвращает список расхождений (order_id, total_amount, фактическая сумма,
+        item_count, фактическое количество). С fix=True расхождения исправляются.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT id, total_amount, {ORDER_TOTAL_SQL} AS actual_total,
+                   item_count, {ORDER_ITEM_COUNT_SQL} AS actual_count
+            FROM orders
+            WHERE total_amount IS NOT actual_total OR item_count IS NOT actual_count
+            ORDER BY id
+        ''')
+        mismatches = cursor.fetchall()
+
+        if fix and mismatches:
+            cursor.executemany(
+                'UPDATE orders SET total_amount = ?, item_count = ? WHERE id = ?',
+                [(actual_total, actual_count, order_id)
+                 for order_id, _, actual_total, _, actual_count in mismatches]
+            )
+            self._commit()
+
+        return mismatches
+
+    def get_active_orders(self):
+        """Получить все активные заказы с информацией об администраторе"""
+        cursor = self._cursor(OrderRow)
+        cursor.execute(f'''
+            SELECT {OrderRow.columns('o')}, u.first_name, u.last_name
             FROM orders o 
             LEFT JOIN users u ON o.admin_id = u.id 
             WHERE o.status = 'active'
@@ -708,40 +1155,35 @@ class Database:
 
     def get_active_order_by_table(self, table_number):
         """Получить активный заказ по номеру стола"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT * FROM orders 
+        cursor = self._cursor(OrderRow)
+        cursor.execute(f'''
+            SELECT {OrderRow.columns()} FROM orders 
             WHERE table_number = ? AND status = 'active'
             ORDER BY created_at DESC LIMIT 1
         ''', (table_number,))
         return cursor.fetchone()
 
-    def get_orders_by_date(self, date, status=None):
-        """Получить заказы по дате с полной информацией"""
-        cursor = self.conn.cursor()
+    def get_orders(self, period, status=None):
+        """Получить заказы за период (periods.Period) с информацией об администраторе"""
+        cursor = self._cursor(OrderRow)
+        condition, params = period.where('o.created_at')
         if status:
-            cursor.execute('''
-                SELECT o.*, u.first_name, u.last_name 
-                FROM orders o 
-                LEFT JOIN users u ON o.admin_id = u.id 
-                WHERE DATE(o.created_at) = ? AND o.status = ?
-                ORDER BY o.created_at DESC
-            ''', (date, status))
-        else:
-            cursor.execute('''
-                SELECT o.*, u.first_name, u.last_name 
-                FROM orders o 
-                LEFT JOIN users u ON o.admin_id = u.id 
-                WHERE DATE(o.created_at) = ?
-                ORDER BY o.created_at DESC
-            ''', (date,))
+            condition += ' AND o.status = ?'
+            params += (status,)
+        cursor.execute(f'''
+            SELECT {OrderRow.columns('o')}, u.first_name, u.last_name
+            FROM orders o
+            LEFT JOIN users u ON o.admin_id = u.id
+            WHERE {condition}
+            ORDER BY o.created_at DESC
+        ''', params)
         return cursor.fetchall()
 
     def get_all_closed_orders(self):
         """Получить все закрытые заказы с информацией об администраторе"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT o.*, u.first_name, u.last_name 
+        cursor = self._cursor(OrderRow)
+        cursor.execute(f'''
+            SELECT {OrderRow.columns('o')}, u.first_name, u.last_name
             FROM orders o 
             LEFT JOIN users u ON o.admin_id = u.id 
             WHERE o.status = 'closed'
@@ -779,6 +1221,14 @@ class Database:
 
         item_id, current_quantity = item
 
+        # Из заказа убирается одна единица позиции
+        cursor.execute('''
+            UPDATE orders
+            SET total_amount = total_amount - (SELECT price FROM order_items WHERE id = ?),
+                item_count = item_count - 1
+            WHERE id = ?
+        ''', (item_id, order_id))
+
         if current_quantity > 1:
             # Уменьшаем количество
             cursor.execute('''
@@ -795,7 +1245,7 @@ class Database:
             ''', (item_id,))
             message = "Позиция удалена"
 
-        self.conn.commit()
+        self._commit()
         return True, message
 
     # НОВЫЙ МЕТОД ДЛЯ ПОЛУЧЕНИЯ ЗАКАЗОВ ЗА СМЕНУ
@@ -810,23 +1260,14 @@ class Database:
         if not shift_info:
             return []
 
-        opened_at, closed_at = shift_info
-
-        # Если смена закрыта, ищем заказы между opened_at и closed_at
-        if closed_at:
-            cursor.execute('''
-                SELECT * FROM orders 
-                WHERE created_at >= ? AND created_at <= ?
-                ORDER BY created_at DESC
-            ''', (opened_at, closed_at))
-        else:
-            # Если смена еще открыта, ищем заказы начиная с opened_at
-            cursor.execute('''
-                SELECT * FROM orders 
-                WHERE created_at >= ?
-                ORDER BY created_at DESC
-            ''', (opened_at,))
-
+        # Заказы между открытием и закрытием смены (у открытой смены - начиная с открытия)
+        condition, params = Period.shift(*shift_info).where('created_at')
+        cursor = self._cursor(OrderRow)
+        cursor.execute(f'''
+            SELECT {OrderRow.columns()} FROM orders
+            WHERE {condition}
+            ORDER BY created_at DESC
+        ''', params)
         return cursor.fetchall()
 
     # МЕТОДЫ ДЛЯ УПРАВЛЕНИЯ СМЕНАМИ - ИСПРАВЛЕННЫЕ
@@ -859,7 +1300,7 @@ class Database:
                 INSERT INTO shifts (shift_number, month_year, admin_id, opened_at, status)
                 VALUES (?, ?, ?, ?, ?)
             ''', (shift_number, month_year, admin_id, self.get_moscow_time(), 'open'))
-            self.conn.commit()
+            self._commit()
             return shift_number
         except sqlite3.IntegrityError as e:
             # Если возникает ошибка уникальности, пробуем снова с увеличенным номером
@@ -884,7 +1325,7 @@ class Database:
                     INSERT INTO shifts (shift_number, month_year, admin_id, opened_at, status)
                     VALUES (?, ?, ?, ?, ?)
                 ''', (shift_number, month_year, admin_id, self.get_moscow_time(), 'open'))
-                self.conn.commit()
+                self._commit()
                 return shift_number
             except sqlite3.IntegrityError as e2:
                 print(f"❌ Вторая ошибка уникальности: {e2}")
@@ -907,14 +1348,14 @@ class Database:
                     INSERT INTO shifts (shift_number, month_year, admin_id, opened_at, status)
                     VALUES (?, ?, ?, ?, ?)
                 ''', (shift_number, month_year, admin_id, self.get_moscow_time(), 'open'))
-                self.conn.commit()
+                self._commit()
                 return shift_number
 
     def get_active_shift(self):
         """Получить активную смену"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT * FROM shifts 
+        cursor = self._cursor(ShiftRow)
+        cursor.execute(f'''
+            SELECT {ShiftRow.columns()} FROM shifts 
             WHERE status = 'open' 
             ORDER BY opened_at DESC 
             LIMIT 1
@@ -923,24 +1364,24 @@ class Database:
 
     def get_shift_by_number_and_month(self, shift_number, month_year):
         """Получить смену по номеру и месяцу"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT * FROM shifts 
+        cursor = self._cursor(ShiftRow)
+        cursor.execute(f'''
+            SELECT {ShiftRow.columns()} FROM shifts 
             WHERE shift_number = ? AND month_year = ?
         ''', (shift_number, month_year))
         return cursor.fetchone()
 
     def get_shift_by_number(self, shift_number, month_year=None):
         """Получить информацию о смене по номеру"""
-        cursor = self.conn.cursor()
+        cursor = self._cursor(ShiftRow)
 
         if month_year:
-            cursor.execute('SELECT * FROM shifts WHERE shift_number = ? AND month_year = ?',
+            cursor.execute(f'SELECT {ShiftRow.columns()} FROM shifts WHERE shift_number = ? AND month_year = ?',
                            (shift_number, month_year))
         else:
             # Если месяц не указан, ищем последнюю смену с таким номером
-            cursor.execute('''
-                SELECT * FROM shifts 
+            cursor.execute(f'''
+                SELECT {ShiftRow.columns()} FROM shifts 
                 WHERE shift_number = ? 
                 ORDER BY month_year DESC, opened_at DESC 
                 LIMIT 1
@@ -948,42 +1389,64 @@ class Database:
 
         return cursor.fetchone()
 
-    def close_shift(self, shift_number, month_year, total_revenue, total_orders):
-        """Закрыть смену в базе данных - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            UPDATE shifts 
-            SET closed_at = ?, status = 'closed', total_revenue = ?, total_orders = ?
-            WHERE shift_number = ? AND month_year = ?
-        ''', (self.get_moscow_time(), total_revenue, total_orders, shift_number, month_year))
-        self.conn.commit()
+    def close_shift(self, shift_number, month_year):
+        """Закрыть смену: посчитать продажи по позициям и сохранить их одной транзакцией.
 
-    def save_shift_sales(self, shift_number, month_year, sales_data):
-        """Сохранить статистику продаж по смене - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
+        Продажи считаются одним GROUP BY по заказам смены и записываются в shift_sales
+        через INSERT ... SELECT; статус, итоги и продажи фиксируются вместе, поэтому
+        наполовину закрытой смены не бывает. Возвращает словарь с closed_at,
+        total_revenue, total_orders и sales (список (позиция, количество, сумма)
+        по убыванию суммы) или None, если смена не найдена.
+        """
         cursor = self.conn.cursor()
-
-        # Находим ID смены
-        cursor.execute('SELECT id FROM shifts WHERE shift_number = ? AND month_year = ?',
+        cursor.execute('SELECT id, opened_at FROM shifts WHERE shift_number = ? AND month_year = ?',
                        (shift_number, month_year))
         shift = cursor.fetchone()
 
         if not shift:
             print(f"⚠️ Смена #{shift_number} ({month_year}) не найдена")
-            return
+            return None
 
-        shift_id = shift[0]
+        shift_id, opened_at = shift
+        closed_at = self.get_moscow_time()
+        condition, params = Period.shift(opened_at, closed_at).where('o.created_at')
 
-        # Удаляем старые данные если есть
-        cursor.execute('DELETE FROM shift_sales WHERE shift_id = ?', (shift_id,))
+        with self.transaction():
+            # Заказы смены - те же, что возвращает get_orders_by_shift_id для закрытой смены
+            cursor.execute('DELETE FROM shift_sales WHERE shift_id = ?', (shift_id,))
+            cursor.execute(f'''
+                INSERT INTO shift_sales (shift_id, item_name, quantity, total_amount)
+                SELECT ?, oi.item_name, SUM(oi.quantity), SUM(oi.price * oi.quantity)
+                FROM orders o
+                JOIN order_items oi ON oi.order_id = o.id
+                WHERE {condition}
+                GROUP BY oi.item_name
+            ''', (shift_id, *params))
+
+            cursor.execute(f'SELECT COUNT(*) FROM orders o WHERE {condition}', params)
+            total_orders = cursor.fetchone()[0]
 
-        # Сохраняем новые данные
-        for item_name, data in sales_data.items():
             cursor.execute('''
-                INSERT INTO shift_sales (shift_id, item_name, quantity, total_amount)
-                VALUES (?, ?, ?, ?)
-            ''', (shift_id, item_name, data['quantity'], data['total_amount']))
+                SELECT item_name, quantity, total_amount FROM shift_sales
+                WHERE shift_id = ?
+                ORDER BY total_amount DESC
+            ''', (shift_id,))
+            sales = cursor.fetchall()
+            total_revenue = sum(row[2] for row in sales)
+
+            cursor.execute('''
+                UPDATE shifts 
+                SET closed_at = ?, status = 'closed', total_revenue = ?, total_orders = ?
+                WHERE id = ?
+            ''', (closed_at, total_revenue, total_orders, shift_id))
+            rollups.refresh_shift_totals(self.conn, opened_at, month_year)
 
-        self.conn.commit()
+        return {
+            'closed_at': closed_at,
+            'total_revenue': total_revenue,
+            'total_orders': total_orders,
+            'sales': sales,
+        }
 
     def get_shift_sales(self, shift_number, month_year):
         """Получить статистику продаж по смене - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
@@ -994,7 +1457,7 @@ class Database:
         if not shift:
             return []
 
-        shift_id = shift[0]
+        shift_id = shift.id
 
         cursor.execute('''
             SELECT item_name, SUM(quantity) as total_quantity, SUM(total_amount) as total_amount
@@ -1020,185 +1483,71 @@ class Database:
     def get_shift_months(self, year):
         """Получить список месяцев для указанного года - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
         cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT DISTINCT substr(month_year, 6, 2) as month 
-            FROM shifts 
-            WHERE substr(month_year, 1, 4) = ? AND status = 'closed'
+        condition, params = Period.year(year).where_month('month_year')
+        cursor.execute(f'''
+            SELECT DISTINCT substr(month_year, 6, 2) as month
+            FROM shifts
+            WHERE status = 'closed' AND {condition}
             ORDER BY month DESC
-        ''', (year,))
+        ''', params)
         months = cursor.fetchall()
         return [month[0] for month in months] if months else []
 
-    def get_shifts_by_year_month(self, year, month):
-        """Получить список смен для указанного года и месяца - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
-        cursor = self.conn.cursor()
-        month_year = f"{year}-{month:02d}" if isinstance(month, int) else f"{year}-{month}"
-
-        cursor.execute('''
-            SELECT * FROM shifts 
-            WHERE month_year = ? AND status = 'closed'
-            ORDER BY shift_number DESC
-        ''', (month_year,))
-        return cursor.fetchall()
-
-    def get_all_shifts_sorted(self):
-        """Получить все смены с сортировкой по дате"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT * FROM shifts 
-            WHERE status = 'closed'
+    # СТАТИСТИКА ЗА ПЕРИОД.
+    # Период задается через periods.Period (Period.month(2025, 11), Period.year(2025),
+    # Period.current('month'), Period.shift(opened_at, closed_at), ...).
+    # Смены отбираются по month_year - месяцу, к которому смена отнесена при открытии.
+    def get_shifts(self, period):
+        """Получить закрытые смены за период"""
+        cursor = self._cursor(ShiftRow)
+        condition, params = period.where_month('month_year')
+        cursor.execute(f'''
+            SELECT {ShiftRow.columns()} FROM shifts
+            WHERE status = 'closed' AND {condition}
             ORDER BY month_year DESC, shift_number DESC
-        ''')
-        return cursor.fetchall()
-
-    def get_shifts_by_period(self, period='all'):
-        """Получить смены за период"""
-        cursor = self.conn.cursor()
-
-        if period == 'month':
-            start_date = datetime.now().replace(day=1).strftime('%Y-%m-%d')
-            cursor.execute('''
-                SELECT * FROM shifts 
-                WHERE DATE(opened_at) >= ? AND status = 'closed'
-                ORDER BY month_year DESC, shift_number DESC
-            ''', (start_date,))
-        elif period == 'year':
-            start_date = datetime.now().replace(month=1, day=1).strftime('%Y-%m-%d')
-            cursor.execute('''
-                SELECT * FROM shifts 
-                WHERE DATE(opened_at) >= ? AND status = 'closed'
-                ORDER BY month_year DESC, shift_number DESC
-            ''', (start_date,))
-        else:
-            cursor.execute('''
-                SELECT * FROM shifts 
-                WHERE status = 'closed'
-                ORDER BY month_year DESC, shift_number DESC
-            ''')
-        return cursor.fetchall()
-
-    def get_sales_statistics_by_period(self, period):
-        """Получить статистику продаж за период"""
-        cursor = self.conn.cursor()
-
-        if period == 'month':
-            start_date = datetime.now().replace(day=1).strftime('%Y-%m-%d')
-            cursor.execute('''
-                SELECT ss.item_name, SUM(ss.quantity) as total_quantity, SUM(ss.total_amount) as total_amount
-                FROM shift_sales ss
-                JOIN shifts s ON ss.shift_id = s.id
-                WHERE DATE(s.opened_at) >= ? AND s.status = 'closed'
-                GROUP BY ss.item_name
-                ORDER BY total_amount DESC
-            ''', (start_date,))
-        elif period == 'year':
-            start_date = datetime.now().replace(month=1, day=1).strftime('%Y-%m-%d')
-            cursor.execute('''
-                SELECT ss.item_name, SUM(ss.quantity) as total_quantity, SUM(ss.total_amount) as total_amount
-                FROM shift_sales ss
-                JOIN shifts s ON ss.shift_id = s.id
-                WHERE DATE(s.opened_at) >= ? AND s.status = 'closed'
-                GROUP BY ss.item_name
-                ORDER BY total_amount DESC
-            ''', (start_date,))
-        else:
-            cursor.execute('''
-                SELECT ss.item_name, SUM(ss.quantity) as total_quantity, SUM(ss.total_amount) as total_amount
-                FROM shift_sales ss
-                JOIN shifts s ON ss.shift_id = s.id
-                WHERE s.status = 'closed'
-                GROUP BY ss.item_name
-                ORDER BY total_amount DESC
-            ''')
+        ''', params)
         return cursor.fetchall()
 
-    def get_total_revenue_by_period(self, period):
-        """Получить общую выручку за период"""
+    # Итоги смен берутся из месячной сводки (rollups): условие по month_year
+    # совпадает с условием по колонке period, поэтому год - это 12 строк.
+    def get_sales_statistics(self, period):
+        """Получить статистику продаж по позициям за период"""
         cursor = self.conn.cursor()
-
-        if period == 'month':
-            start_date = datetime.now().replace(day=1).strftime('%Y-%m-%d')
-            cursor.execute('''
-                SELECT SUM(total_revenue) FROM shifts 
-                WHERE DATE(opened_at) >= ? AND status = 'closed'
-            ''', (start_date,))
-        elif period == 'year':
-            start_date = datetime.now().replace(month=1, day=1).strftime('%Y-%m-%d')
-            cursor.execute('''
-                SELECT SUM(total_revenue) FROM shifts 
-                WHERE DATE(opened_at) >= ? AND status = 'closed'
-            ''', (start_date,))
-        else:
-            cursor.execute('SELECT SUM(total_revenue) FROM shifts WHERE status = "closed"')
-
-        result = cursor.fetchone()
-        return result[0] or 0
-
-    # НОВЫЕ МЕТОДЫ ДЛЯ СТАТИСТИКИ ПО ГОДАМ И МЕСЯЦАМ
-    def get_sales_statistics_by_year(self, year):
-        """Получить статистику продаж за указанный год - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT ss.item_name, SUM(ss.quantity) as total_quantity, SUM(ss.total_amount) as total_amount
-            FROM shift_sales ss
-            JOIN shifts s ON ss.shift_id = s.id
-            WHERE substr(s.month_year, 1, 4) = ? AND s.status = 'closed'
-            GROUP BY ss.item_name
-            ORDER BY total_amount DESC
-        ''', (year,))
-        return cursor.fetchall()
-
-    def get_total_revenue_by_year(self, year):
-        """Получить общую выручку за указанный год - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT SUM(total_revenue) FROM shifts 
-            WHERE substr(month_year, 1, 4) = ? AND status = 'closed'
-        ''', (year,))
-        result = cursor.fetchone()
-        return result[0] or 0
-
-    def get_sales_statistics_by_year_month(self, year, month):
-        """Получить статистику продаж за указанный год и месяц - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
-        cursor = self.conn.cursor()
-        month_year = f"{year}-{month:02d}" if isinstance(month, int) else f"{year}-{month}"
-
-        cursor.execute('''
-            SELECT ss.item_name, SUM(ss.quantity) as total_quantity, SUM(ss.total_amount) as total_amount
-            FROM shift_sales ss
-            JOIN shifts s ON ss.shift_id = s.id
-            WHERE s.month_year = ? AND s.status = 'closed'
-            GROUP BY ss.item_name
+        condition, params = period.where_month('period')
+        cursor.execute(f'''
+            SELECT item_name, SUM(quantity) as total_quantity, SUM(total_amount) as total_amount
+            FROM rollup_item_sales
+            WHERE grain = 'month' AND {condition}
+            GROUP BY item_name
             ORDER BY total_amount DESC
-        ''', (month_year,))
+        ''', params)
         return cursor.fetchall()
 
-    def get_total_revenue_by_year_month(self, year, month):
-        """Получить общую выручку за указанный год и месяц - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
+    def get_total_revenue(self, period):
+        """Получить общую выручку закрытых смен за период"""
         cursor = self.conn.cursor()
-        month_year = f"{year}-{month:02d}" if isinstance(month, int) else f"{year}-{month}"
-
-        cursor.execute('''
-            SELECT SUM(total_revenue) FROM shifts 
-            WHERE month_year = ? AND status = 'closed'
-        ''', (month_year,))
+        condition, params = period.where_month('period')
+        cursor.execute(f'''
+            SELECT SUM(revenue) FROM rollup_totals
+            WHERE grain = 'month' AND {condition}
+        ''', params)
         result = cursor.fetchone()
         return result[0] or 0
 
     def get_all_shifts(self):
         """Получить все смены с сортировкой по дате открытия"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT * FROM shifts 
+        cursor = self._cursor(ShiftRow)
+        cursor.execute(f'''
+            SELECT {ShiftRow.columns()} FROM shifts 
             ORDER BY opened_at DESC
         ''')
         return cursor.fetchall()
 
     def get_shifts_by_month(self, month_year):
         """Получить смены за указанный месяц"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT * FROM shifts 
+        cursor = self._cursor(ShiftRow)
+        cursor.execute(f'''
+            SELECT {ShiftRow.columns()} FROM shifts 
             WHERE month_year = ? 
             ORDER BY shift_number ASC
         ''', (month_year,))
@@ -1207,10 +1556,11 @@ class Database:
     # НОВЫЕ МЕТОДЫ ДЛЯ ОТЛАДКИ
     def get_all_shifts_debug(self):
         """Для отладки - получить все смены с деталями"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT id, shift_number, month_year, opened_at, closed_at, 
-                   total_revenue, total_orders, status
+        fields = ('id', 'shift_number', 'month_year', 'opened_at', 'closed_at',
+                  'total_revenue', 'total_orders', 'status')
+        cursor = self._cursor(ShiftRow, fields)
+        cursor.execute(f'''
+            SELECT {ShiftRow.columns(fields=fields)}
             FROM shifts 
             ORDER BY month_year DESC, shift_number DESC
         ''')
@@ -1221,116 +1571,58 @@ class Database:
         return datetime.now().strftime('%Y-%m')
 
     # НОВЫЕ МЕТОДЫ ДЛЯ ПОДСЧЕТА СПИСАННЫХ БОНУСОВ
-    def get_spent_bonuses_by_shift(self, shift_number, month_year):
-        """Получить сумму списанных бонусов за смену"""
-        cursor = self.conn.cursor()
-
-        # Находим ID смены
-        shift = self.get_shift_by_number_and_month(shift_number, month_year)
-        if not shift:
-            return 0
-
-        shift_id = shift[0]
-        opened_at, closed_at = shift[4], shift[5]
-
-        if closed_at:
-            cursor.execute('''
-                SELECT SUM(amount) 
-                FROM transactions 
-                WHERE type = 'spend' 
-                AND date >= ? AND date <= ?
-            ''', (opened_at, closed_at))
-        else:
-            cursor.execute('''
-                SELECT SUM(amount) 
-                FROM transactions 
-                WHERE type = 'spend' 
-                AND date >= ?
-            ''', (opened_at,))
-
-        result = cursor.fetchone()
-        return result[0] or 0
-
-    def get_spent_bonuses_by_month(self, year, month):
-        """Получить сумму списанных бонусов за месяц"""
-        cursor = self.conn.cursor()
-
-        # Формируем строку месяца: YYYY-MM
-        if isinstance(month, int):
-            month_str = f"{year}-{month:02d}"
+    def get_spent_bonuses(self, period):
+        """Получить сумму списанных бонусов за период"""
+        cursor = self.conn.cursor()
+        rollup = period.rollup()
+        if rollup:
+            grain, condition, params = rollup
+            cursor.execute(f'''
+                SELECT SUM(spent_bonuses) FROM rollup_totals
+                WHERE grain = ? AND {condition}
+            ''', (grain, *params))
         else:
-            month_str = f"{year}-{month}"
-
-        cursor.execute('''
-            SELECT SUM(amount) 
-            FROM transactions 
-            WHERE type = 'spend' 
-            AND strftime('%Y-%m', date) = ?
-        ''', (month_str,))
+            condition, params = period.where('date')
+            cursor.execute(f'''
+                SELECT SUM(amount)
+                FROM transactions
+                WHERE type = 'spend' AND {condition}
+            ''', params)
 
         result = cursor.fetchone()
         return result[0] or 0
 
-    def get_spent_bonuses_by_year(self, year):
-        """Получить сумму списанных бонусов за год"""
+    def update_order_payment_method(self, order_id, payment_method):
+        """Обновить метод оплаты для заказа"""
         cursor = self.conn.cursor()
         cursor.execute('''
-            SELECT SUM(amount) 
-            FROM transactions 
-            WHERE type = 'spend' 
-            AND strftime('%Y', date) = ?
-        ''', (year,))
-
-        result = cursor.fetchone()
-        return result[0] or 0
-
-    def get_spent_bonuses_by_period(self, period):
-        """Получить сумму списанных бонусов за период (month/year)"""
-        cursor = self.conn.cursor()
-
-        if period == 'month':
-            start_date = datetime.now().replace(day=1).strftime('%Y-%m-%d')
-            cursor.execute('''
-                SELECT SUM(amount) 
-                FROM transactions 
-                WHERE type = 'spend' 
-                AND date >= ?
-            ''', (start_date,))
-        elif period == 'year':
-            start_date = datetime.now().replace(month=1, day=1).strftime('%Y-%m-%d')
-            cursor.execute('''
-                SELECT SUM(amount) 
-                FROM transactions 
-                WHERE type = 'spend' 
-                AND date >= ?
-            ''', (start_date,))
+            UPDATE orders SET payment_method = ? WHERE id = ?
+        ''', (payment_method, order_id))
+        self._refresh_order_payments(order_id)
+        self._commit()
+
+    def get_payment_statistics(self, period):
+        """Получить статистику по оплате закрытых заказов за период: {способ: {'count', 'total_amount'}}"""
+        cursor = self.conn.cursor()
+        rollup = period.rollup()
+        if rollup:
+            grain, condition, params = rollup
+            cursor.execute(f'''
+                SELECT payment_method, SUM(orders_count) as count, SUM(total_amount) as total_amount
+                FROM rollup_payments
+                WHERE grain = ? AND {condition}
+                GROUP BY payment_method
+            ''', (grain, *params))
         else:
-            cursor.execute('SELECT SUM(amount) FROM transactions WHERE type = "spend"')
-
-        result = cursor.fetchone()
-        return result[0] or 0
-
-    # ========== ДОБАВЬТЕ ЭТИ 2 НОВЫХ МЕТОДА ЗДЕСЬ ==========
-
-    def get_payment_statistics_by_month(self, year, month):
-        """Получить статистику по оплате за месяц"""
-        cursor = self.conn.cursor()
-        month_year = f"{year}-{month:02d}" if isinstance(month, int) else f"{year}-{month}"
-
-        cursor.execute('''
-            SELECT o.payment_method, COUNT(*) as count, SUM(total) as total_amount
-            FROM (
-                SELECT o.id, o.payment_method, 
-                       SUM(oi.price * oi.quantity) as total
-                FROM orders o
-                LEFT JOIN order_items oi ON o.id = oi.order_id
-                WHERE strftime('%Y-%m', o.created_at) = ? 
-                    AND o.status = 'closed'
-                    AND o.payment_method IS NOT NULL
-                GROUP BY o.id
-            ) o
-            GROUP BY o.payment_method
-        ''', (month_year,))
+            # Смены и произвольные интервалы считаются по заказам
+            condition, params = period.where('created_at')
+            cursor.execute(f'''
+                SELECT payment_method, COUNT(*) as count, SUM(total_amount) as total_amount
+                FROM orders
+                WHERE status = 'closed' AND {condition}
+                    AND payment_method IS NOT NULL
+                GROUP BY payment_method
+            ''', params)
 
         stats = {}
         for payment_method, count, total_amount in cursor.fetchall():
@@ -1338,158 +1630,208 @@ class Database:
 
         return stats
 
-    def get_payment_statistics_by_year(self, year):
-        """Получить статистику по оплате за год"""
-        cursor = self.conn.cursor()
+    def rebuild_rollups(self):
+        """Пересчитать сводные таблицы (rollups) по исходным данным"""
+        with self.transaction():
+            rollups.rebuild(self.conn)
 
-        cursor.execute('''
-            SELECT o.payment_method, COUNT(*) as count, SUM(total) as total_amount
-            FROM (
-                SELECT o.id, o.payment_method, 
-                       SUM(oi.price * oi.quantity) as total
-                FROM orders o
-                LEFT JOIN order_items oi ON o.id = oi.order_id
-                WHERE strftime('%Y', o.created_at) = ? 
-                    AND o.status = 'closed'
-                    AND o.payment_method IS NOT NULL
-                GROUP BY o.id
-            ) o
-            GROUP BY o.payment_method
-        ''', (year,))
+    # РАССЫЛКИ
+    def create_broadcast_job(self, admin_chat_id, from_chat_id, message_id, text=None, has_caption=False):
+        """Создать рассылку на активных пользователей, которым можно доставить
+        сообщение (см. get_deliverable_users). Возвращает id задания.
 
-        stats = {}
-        for payment_method, count, total_amount in cursor.fetchall():
-            stats[payment_method] = {'count': count, 'total_amount': total_amount or 0}
-
-        return stats
+        Получатели записываются сразу (state = 'pending'), поэтому задание можно
+        продолжить после перезапуска бота с того места, где оно остановилось.
+        """
+        cursor = self.conn.cursor()
+        with self.transaction():
+            cursor.execute('''
+                INSERT INTO broadcast_jobs (admin_chat_id, from_chat_id, message_id, text, has_caption, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (admin_chat_id, from_chat_id, message_id, text, has_caption, self.get_moscow_time()))
+            job_id = cursor.lastrowid
+            cursor.execute(f'''
+                INSERT INTO broadcast_recipients (job_id, user_id, telegram_id)
+                SELECT ?, id, telegram_id FROM users WHERE is_active = TRUE AND {self._deliverable_sql()}
+            ''', (job_id, self._reprobe_before()))
+        return job_id
+
+    def get_broadcast_job(self, job_id):
+        cursor = self._cursor(BroadcastJobRow)
+        cursor.execute(f'SELECT {BroadcastJobRow.columns()} FROM broadcast_jobs WHERE id = ?', (job_id,))
+        return cursor.fetchone()
 
-    # ========== ДОБАВЬТЕ ЭТИ МЕТОДЫ ЗДЕСЬ ==========
+    def get_running_broadcast_jobs(self):
+        """Незавершенные рассылки в порядке создания"""
+        cursor = self._cursor(BroadcastJobRow)
+        cursor.execute(f"SELECT {BroadcastJobRow.columns()} FROM broadcast_jobs "
+                       "WHERE status = 'running' ORDER BY id")
+        return cursor.fetchall()
 
-    def add_payment_method_column(self):
-        """Добавить колонку payment_method в таблицу orders если её нет"""
-        cursor = self.conn.cursor()
-        cursor.execute("PRAGMA table_info(orders)")
-        columns = [column[1] for column in cursor.fetchall()]
+    def get_recent_broadcast_jobs(self, limit=5):
+        """Последние рассылки, новые первыми"""
+        cursor = self._cursor(BroadcastJobRow)
+        cursor.execute(f'SELECT {BroadcastJobRow.columns()} FROM broadcast_jobs ORDER BY id DESC LIMIT ?',
+                       (limit,))
+        return cursor.fetchall()
 
-        if 'payment_method' not in columns:
-            print("🔄 Добавляем колонку payment_method в таблицу orders...")
-            cursor.execute('ALTER TABLE orders ADD COLUMN payment_method TEXT DEFAULT NULL')
-            self.conn.commit()
-            print("✅ Колонка payment_method добавлена")
-            return True
-        print("✅ Колонка payment_method уже существует")
-        return False
+    def get_pending_broadcast_recipients(self, job_id, limit):
+        """Следующие limit получателей рассылки, которым сообщение еще не отправлялось"""
+        cursor = self._cursor(BroadcastRecipientRow)
+        cursor.execute(f'''
+            SELECT {BroadcastRecipientRow.columns()} FROM broadcast_recipients
+            WHERE job_id = ? AND state = 'pending'
+            ORDER BY user_id
+            LIMIT ?
+        ''', (job_id, limit))
+        return cursor.fetchall()
 
-    def update_order_payment_method(self, order_id, payment_method):
-        """Обновить метод оплаты для заказа"""
+    def mark_broadcast_sending(self, job_id, user_id):
+        """Отметить начало отправки получателю (фиксируется до обращения к Telegram)"""
         cursor = self.conn.cursor()
         cursor.execute('''
-            UPDATE orders SET payment_method = ? WHERE id = ?
-        ''', (payment_method, order_id))
-        self.conn.commit()
+            UPDATE broadcast_recipients SET state = 'sending', updated_at = ?
+            WHERE job_id = ? AND user_id = ?
+        ''', (self.get_moscow_time(), job_id, user_id))
+        self._commit()
 
-    def get_payment_statistics_by_shift(self, shift_number, month_year):
-        """Получить статистику по оплате за смену"""
+    def record_broadcast_delivery(self, job_id, user_id, state, attempts, error=None):
+        """Записать итог отправки получателю: state - sent, failed или blocked.
+        Доступность чата пользователя обновляется вместе с итогом"""
         cursor = self.conn.cursor()
-
-        # Находим ID смены
-        shift = self.get_shift_by_number_and_month(shift_number, month_year)
-        if not shift:
-            return {}
-
-        shift_id = shift[0]
-        opened_at, closed_at = shift[4], shift[5]
-
-        if closed_at:
-            cursor.execute('''
-                SELECT o.payment_method, COUNT(*) as count, SUM(total) as total_amount
-                FROM (
-                    SELECT o.id, o.payment_method, 
-                           SUM(oi.price * oi.quantity) as total
-                    FROM orders o
-                    LEFT JOIN order_items oi ON o.id = oi.order_id
-                    WHERE o.created_at >= ? AND o.created_at <= ? 
-                        AND o.status = 'closed'
-                        AND o.payment_method IS NOT NULL
-                    GROUP BY o.id
-                ) o
-                GROUP BY o.payment_method
-            ''', (opened_at, closed_at))
-        else:
+        now = self.get_moscow_time()
+        with self.transaction():
             cursor.execute('''
-                SELECT o.payment_method, COUNT(*) as count, SUM(total) as total_amount
-                FROM (
-                    SELECT o.id, o.payment_method, 
-                           SUM(oi.price * oi.quantity) as total
-                    FROM orders o
-                    LEFT JOIN order_items oi ON o.id = oi.order_id
-                    WHERE o.created_at >= ? 
-                        AND o.status = 'closed'
-                        AND o.payment_method IS NOT NULL
-                    GROUP BY o.id
-                ) o
-                GROUP BY o.payment_method
-            ''', (opened_at,))
+                UPDATE broadcast_recipients SET state = ?, attempts = attempts + ?, error = ?, updated_at = ?
+                WHERE job_id = ? AND user_id = ?
+            ''', (state, attempts, error, now, job_id, user_id))
+            reachability = REACHABILITY_BY_DELIVERY.get(state)
+            if reachability:
+                cursor.execute('''
+                    UPDATE users SET reachability = ?, reachability_checked_at = ? WHERE id = ?
+                ''', (reachability, now, user_id))
 
-        stats = {}
-        for payment_method, count, total_amount in cursor.fetchall():
-            stats[payment_method] = {'count': count, 'total_amount': total_amount or 0}
+    def reset_interrupted_broadcasts(self):
+        """Получателей, отправка которым прервалась перезапуском, отметить как failed.
 
-        return stats
+        Дошло ли до них сообщение, неизвестно; повторная отправка могла бы дать
+        дубль, поэтому они не возвращаются в очередь. Возвращает их количество.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            UPDATE broadcast_recipients SET state = 'failed', error = ?, updated_at = ?
+            WHERE job_id IN (SELECT id FROM broadcast_jobs WHERE status = 'running') AND state = 'sending'
+        ''', ('Отправка прервана перезапуском бота', self.get_moscow_time()))
+        self._commit()
+        return cursor.rowcount
 
-    def get_payment_statistics_by_period(self, period):
-        """Получить статистику по оплате за период"""
+    def set_broadcast_status_message(self, job_id, message_id):
+        """Запомнить сообщение администратору о ходе рассылки"""
         cursor = self.conn.cursor()
+        cursor.execute('UPDATE broadcast_jobs SET status_message_id = ? WHERE id = ?', (message_id, job_id))
+        self._commit()
 
-        if period == 'month':
-            start_date = datetime.now().replace(day=1).strftime('%Y-%m-%d')
-            cursor.execute('''
-                SELECT o.payment_method, COUNT(*) as count, SUM(total) as total_amount
-                FROM (
-                    SELECT o.id, o.payment_method, 
-                           SUM(oi.price * oi.quantity) as total
-                    FROM orders o
-                    LEFT JOIN order_items oi ON o.id = oi.order_id
-                    WHERE o.created_at >= ? 
-                        AND o.status = 'closed'
-                        AND o.payment_method IS NOT NULL
-                    GROUP BY o.id
-                ) o
-                GROUP BY o.payment_method
-            ''', (start_date,))
-        elif period == 'year':
-            start_date = datetime.now().replace(month=1, day=1).strftime('%Y-%m-%d')
+    def finish_broadcast_job(self, job_id):
+        """Завершить рассылку. Получатели, итог отправки которым не записан из-за
+        ошибки (остались в sending), отмечаются failed: повторять им отправку нельзя"""
+        cursor = self.conn.cursor()
+        now = self.get_moscow_time()
+        with self.transaction():
             cursor.execute('''
-                SELECT o.payment_method, COUNT(*) as count, SUM(total) as total_amount
-                FROM (
-                    SELECT o.id, o.payment_method, 
-                           SUM(oi.price * oi.quantity) as total
-                    FROM orders o
-                    LEFT JOIN order_items oi ON o.id = oi.order_id
-                    WHERE o.created_at >= ? 
-                        AND o.status = 'closed'
-                        AND o.payment_method IS NOT NULL
-                    GROUP BY o.id
-                ) o
-                GROUP BY o.payment_method
-            ''', (start_date,))
-        else:
+                UPDATE broadcast_recipients SET state = 'failed', error = ?, updated_at = ?
+                WHERE job_id = ? AND state = 'sending'
+            ''', ('Итог отправки не записан', now, job_id))
+            cursor.execute("UPDATE broadcast_jobs SET status = 'done', finished_at = ? WHERE id = ?",
+                           (now, job_id))
+
+    def fail_broadcast_job(self, job_id):
+        """Остановить рассылку после повторных ошибок: неотправленные получатели - failed"""
+        cursor = self.conn.cursor()
+        now = self.get_moscow_time()
+        with self.transaction():
             cursor.execute('''
-                SELECT o.payment_method, COUNT(*) as count, SUM(total) as total_amount
-                FROM (
-                    SELECT o.id, o.payment_method, 
-                           SUM(oi.price * oi.quantity) as total
-                    FROM orders o
-                    LEFT JOIN order_items oi ON o.id = oi.order_id
-                    WHERE o.status = 'closed'
-                        AND o.payment_method IS NOT NULL
-                    GROUP BY o.id
-                ) o
-                GROUP BY o.payment_method
-            ''')
+                UPDATE broadcast_recipients SET state = 'failed', error = ?, updated_at = ?
+                WHERE job_id = ? AND state IN ('pending', 'sending')
+            ''', ('Рассылка остановлена после повторных ошибок', now, job_id))
+            cursor.execute("UPDATE broadcast_jobs SET status = 'failed', finished_at = ? WHERE id = ?",
+                           (now, job_id))
 
-        stats = {}
-        for payment_method, count, total_amount in cursor.fetchall():
-            stats[payment_method] = {'count': count, 'total_amount': total_amount or 0}
+    def get_broadcast_progress(self, job_id):
+        """Количество получателей рассылки по состояниям: {'pending': ..., 'sent': ..., 'total': ...}"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT state, COUNT(*) FROM broadcast_recipients WHERE job_id = ? GROUP BY state
+        ''', (job_id,))
+        progress = dict.fromkeys(('pending', 'sending', 'sent', 'failed', 'blocked'), 0)
+        progress.update(cursor.fetchall())
+        progress['total'] = sum(progress.values())
+        return progress
+
+    def get_broadcast_failures(self, job_id, limit=5):
+        """Первые limit получателей, которым рассылка не доставлена, с именами"""
+        cursor = self._cursor(BroadcastRecipientRow)
+        cursor.execute(f'''
+            SELECT {BroadcastRecipientRow.columns('r')}, u.first_name, u.last_name
+            FROM broadcast_recipients r
+            JOIN users u ON u.id = r.user_id
+            WHERE r.job_id = ? AND r.state IN ('failed', 'blocked')
+            ORDER BY r.user_id
+            LIMIT ?
+        ''', (job_id, limit))
+        return cursor.fetchall()
 
-        return stats
\ No newline at end of file
+    # ДОСТУПНОСТЬ ЧАТОВ ПОЛЬЗОВАТЕЛЕЙ
+    @staticmethod
+    def _deliverable_sql(alias='users'):
+        """SQL-условие: пользователю можно писать (параметр - _reprobe_before()).
+
+        Временные профили гостей (telegram_id <= 0) чата не имеют. Заблокировавшие
+        бота пропускаются, пока с последней проверки не пройдет
+        REACHABILITY_REPROBE_DAYS дней: затем следующая отправка проверяет их снова.
+        """
+        return (f"{alias}.telegram_id > 0 AND ({alias}.reachability IS NOT 'blocked' "
+                f"OR {alias}.reachability_checked_at < ?)")
+
+    def _reprobe_before(self):
+        """Заблокированные раньше этого момента проверяются снова"""
+        moment = datetime.now(pytz.timezone('Europe/Moscow')) - timedelta(days=REACHABILITY_REPROBE_DAYS)
+        return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+    def record_delivery(self, telegram_id, state):
+        """Запомнить итог отправки в чат telegram_id: state - sent, failed или blocked
+        (failed - временная ошибка, доступность не меняется)"""
+        reachability = REACHABILITY_BY_DELIVERY.get(state)
+        if not reachability:
+            return
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            UPDATE users SET reachability = ?, reachability_checked_at = ? WHERE telegram_id = ?
+        ''', (reachability, self.get_moscow_time(), telegram_id))
+        self._commit()
+
+    def get_user_reachable(self, telegram_id):
+        """Можно ли писать в чат telegram_id (неизвестные боту чаты считаются доступными)"""
+        if telegram_id is None or telegram_id <= 0:
+            return False
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT NOT ({self._deliverable_sql()}) FROM users WHERE telegram_id = ?
+        ''', (self._reprobe_before(), telegram_id))
+        row = cursor.fetchone()
+        return not (row and row[0])
+
+    def get_deliverable_users(self):
+        """Активные пользователи, которым можно доставить сообщение"""
+        cursor = self._cursor(UserRow, USER_LIST_FIELDS)
+        cursor.execute(f'''
+            SELECT {UserRow.columns(fields=USER_LIST_FIELDS)} FROM users
+            WHERE is_active = TRUE AND {self._deliverable_sql()}
+            ORDER BY id DESC
+        ''', (self._reprobe_before(),))
+        return cursor.fetchall()
+
+    def count_deliverable_users(self):
+        cursor = self.conn.cursor()
+        cursor.execute(f'SELECT COUNT(*) FROM users WHERE is_active = TRUE AND {self._deliverable_sql()}',
+                       (self._reprobe_before(),))
+        return cursor.fetchone()[0]
@@ -1,10 +1,10 @@
 # debug_shifts.py
-from database import Database
+from database import get_db
 
 
 def debug_shifts():
     """Отладочная функция для проверки смен в базе данных"""
-    db = Database()
+    db = get_db()
 
     print("🔍 Проверка смен в базе данных...")
 
@@ -1,10 +1,10 @@
 # fix_categories.py
-from database import Database
+from database import get_db
 
 
 def fix_menu_categories():
     """Исправить категории для позиций меню"""
-    db = Database()
+    db = get_db()
     cursor = db.conn.cursor()
 
     print("🔄 Исправление категорий в меню...")
@@ -48,7 +48,7 @@ def fix_menu_categories():
 
 def check_current_categories():
     """Проверить текущие категории проблемных позиций"""
-    db = Database()
+    db = get_db()
     cursor = db.conn.cursor()
 
     print("\n🔍 Текущие категории проблемных позиций:")
@@ -68,7 +68,7 @@ def check_current_categories():
 
 def repopulate_menu_completely():
     """Полностью перезаполнить меню с правильными категориями"""
-    db = Database()
+    db = get_db()
     cursor = db.conn.cursor()
 
     print("🔄 Полное обновление меню с правильными категориями...")
@@ -59,6 +59,7 @@ from .admin_bookings import (
     show_confirmed_bookings,
     show_cancelled_bookings,
     show_all_bookings,
+    show_more_bookings,
     back_to_booking_menu,
     handle_booking_action,
     handle_booking_cancellation_with_reason,
@@ -85,6 +86,7 @@ from .admin_messages import (
     message_user_callback,
     broadcast_message,
     process_broadcast_media,
+    show_broadcasts,
     start_user_message,
     user_selected_for_message,
     process_user_message
@@ -253,6 +255,7 @@ __all__ = [
     'show_confirmed_bookings',
     'show_cancelled_bookings',
     'show_all_bookings',
+    'show_more_bookings',
     'back_to_booking_menu',
     'handle_booking_action',
     'handle_booking_cancellation_with_reason',
@@ -277,6 +280,7 @@ __all__ = [
     'message_user_callback',
     'broadcast_message',
     'process_broadcast_media',
+    'show_broadcasts',
     'start_user_message',
     'user_selected_for_message',
     'process_user_message',
@@ -5,10 +5,10 @@ import logging
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton  # ДОБАВИТЬ Update
 from telegram.ext import ContextTypes, CallbackQueryHandler
 from config import ADMIN_IDS
-from database import Database
+from database import get_db
 
 logger = logging.getLogger(__name__)
-db = Database()
+db = get_db()
 
 
 def is_admin(user_id):
@@ -26,7 +26,7 @@ async def handle_bonus_requests(update: Update, context: ContextTypes.DEFAULT_TY
     # Очищаем только временные сообщения при переходе между разделами
     await message_manager.cleanup_user_messages(context, update.effective_user.id)
 
-    requests = db.get_pending_requests()
+    requests = await db.aget_pending_requests()
 
     # Постоянное сообщение с меню управления запросами
     await message_manager.send_message(
@@ -51,17 +51,17 @@ async def handle_bonus_requests(update: Update, context: ContextTypes.DEFAULT_TY
     for request in requests:
         message = (
             f"🎁 Запрос на списание баллов\n\n"
-            f"👤 Пользователь: {request[5]} {request[6]}\n"
-            f"🆔 ID пользователя: {request[1]}\n"
-            f"💰 Сумма: {request[2]} баллов\n"
-            f"📅 Дата: {request[4]}\n"
-            f"🆔 ID запроса: {request[0]}"
+            f"👤 Пользователь: {request.first_name} {request.last_name}\n"
+            f"🆔 ID пользователя: {request.user_id}\n"
+            f"💰 Сумма: {request.amount} баллов\n"
+            f"📅 Дата: {request.created_at}\n"
+            f"🆔 ID запроса: {request.id}"
         )
 
         await message_manager.send_message(
             update, context,
             message,
-            reply_markup=get_bonus_request_keyboard(request[0]),
+            reply_markup=get_bonus_request_keyboard(request.id),
             is_temporary=False
         )
 
@@ -91,10 +91,10 @@ async def handle_bonus_request_action(update: Update, context: ContextTypes.DEFA
     request_id = int(request_id)
 
     # Находим запрос
-    requests = db.get_pending_requests()
+    requests = await db.aget_pending_requests()
     request_data = None
     for req in requests:
-        if req[0] == request_id:
+        if req.id == request_id:
             request_data = req
             break
 
@@ -112,11 +112,11 @@ async def handle_bonus_request_action(update: Update, context: ContextTypes.DEFA
                 )
         return
 
-    user_data = db.get_user_by_id(request_data[1])
+    user_data = await db.aget_user_by_id(request_data.user_id)
 
     if action == 'approve':
         # Проверяем достаточно ли баллов
-        if request_data[2] > user_data[5]:
+        if request_data.amount > user_data.bonus_balance:
             try:
                 await query.edit_message_text("❌ У пользователя недостаточно баллов для списания.")
             except Exception as e:
@@ -130,25 +130,30 @@ async def handle_bonus_request_action(update: Update, context: ContextTypes.DEFA
                     )
             return
 
-        # Списание баллов
-        db.update_user_balance(request_data[1], -request_data[2])
-        db.update_bonus_request(request_id, 'approved')
-        db.add_transaction(request_data[1], -request_data[2], 'spend', 'Списание по запросу')
+        # Списание баллов: баланс, статус запроса и транзакция применяются вместе
+        if not await db.aapprove_bonus_request(request_id):
+            try:
+                await query.edit_message_text("❌ Запрос уже обработан или у пользователя недостаточно баллов.")
+            except Exception as e:
+                if "Message is not modified" not in str(e):
+                    logger.error(f"Ошибка при обработке запроса на списание: {e}")
+            return
 
         # Уведомляем пользователя
         try:
-            await context.bot.send_message(
-                user_data[1],
-                f"✅ Ваш запрос на списание {request_data[2]} бонусных баллов одобрен!\n"
-                f"💰 Новый баланс: {user_data[5] - request_data[2]} баллов"
+            from message_manager import message_manager
+            await message_manager.notify_user(
+                context, user_data.telegram_id,
+                f"✅ Ваш запрос на списание {request_data.amount} бонусных баллов одобрен!\n"
+                f"💰 Новый баланс: {user_data.bonus_balance - request_data.amount} баллов"
             )
         except Exception as e:
             logger.error(f"Не удалось уведомить пользователя: {e}")
 
         try:
             await query.edit_message_text(
-                f"✅ Запрос на списание {request_data[2]} баллов одобрен.\n"
-                f"👤 Пользователь: {user_data[2]} {user_data[3]}"
+                f"✅ Запрос на списание {request_data.amount} баллов одобрен.\n"
+                f"👤 Пользователь: {user_data.first_name} {user_data.last_name}"
             )
         except Exception as e:
             if "Message is not modified" not in str(e):
@@ -156,27 +161,27 @@ async def handle_bonus_request_action(update: Update, context: ContextTypes.DEFA
                 from message_manager import message_manager
                 await message_manager.send_message(
                     update, context,
-                    f"✅ Запрос на списание {request_data[2]} баллов одобрен.\n👤 Пользователь: {user_data[2]} {user_data[3]}",
+                    f"✅ Запрос на списание {request_data.amount} баллов одобрен.\n👤 Пользователь: {user_data.first_name} {user_data.last_name}",
                     is_temporary=False
                 )
 
     else:  # reject
-        db.update_bonus_request(request_id, 'rejected')
+        await db.aupdate_bonus_request(request_id, 'rejected')
 
         # Уведомляем пользователя
         try:
-            await context.bot.send_message(
-                user_data[1],
-                f"❌ Ваш запрос на списание {request_data[2]} бонусных баллов отклонен.",
-                is_temporary=True
+            from message_manager import message_manager
+            await message_manager.notify_user(
+                context, user_data.telegram_id,
+                f"❌ Ваш запрос на списание {request_data.amount} бонусных баллов отклонен."
             )
         except Exception as e:
             logger.error(f"Не удалось уведомить пользователя: {e}")
 
         try:
             await query.edit_message_text(
-                f"❌ Запрос на списание {request_data[2]} баллов отклонен.\n"
-                f"👤 Пользователь: {user_data[2]} {user_data[3]}"
+                f"❌ Запрос на списание {request_data.amount} баллов отклонен.\n"
+                f"👤 Пользователь: {user_data.first_name} {user_data.last_name}"
             )
         except Exception as e:
             if "Message is not modified" not in str(e):
@@ -184,7 +189,7 @@ async def handle_bonus_request_action(update: Update, context: ContextTypes.DEFA
                 from message_manager import message_manager
                 await message_manager.send_message(
                     update, context,
-                    f"❌ Запрос на списание {request_data[2]} баллов отклонен.\n👤 Пользователь: {user_data[2]} {user_data[3]}",
+                    f"❌ Запрос на списание {request_data.amount} баллов отклонен.\n👤 Пользователь: {user_data.first_name} {user_data.last_name}",
                     is_temporary=False
                 )
 
@@ -5,10 +5,10 @@ import logging
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes, ConversationHandler, CallbackQueryHandler, MessageHandler, filters
 from config import ADMIN_IDS
-from database import Database
+from database import get_db
 
 logger = logging.getLogger(__name__)
-db = Database()
+db = get_db()
 
 # Состояния для фильтрации бронирований и создания брони админом
 SELECTING_YEAR, SELECTING_MONTH, SELECTING_DATE, AWAITING_CANCELLATION_REASON, \
@@ -35,14 +35,14 @@ def _format_booking_message(booking):
     }
 
     return (
-        f"{status_emoji.get(booking[5], '📅')} Бронирование #{booking[0]}\n"
-        f"👤 {booking[7]} {booking[8]}\n"
-        f"📱 {booking[9]}\n"
-        f"📅 Дата: {booking[2]}\n"
-        f"⏰ Время: {booking[3]}\n"
-        f"👥 Гостей: {booking[4]}\n"
-        f"📊 Статус: {status_text.get(booking[5], booking[5])}\n"
-        f"🆔 ID брони: {booking[0]}"
+        f"{status_emoji.get(booking.status, '📅')} Бронирование #{booking.id}\n"
+        f"👤 {booking.first_name} {booking.last_name}\n"
+        f"📱 {booking.phone}\n"
+        f"📅 Дата: {booking.booking_date}\n"
+        f"⏰ Время: {booking.booking_time}\n"
+        f"👥 Гостей: {booking.guests}\n"
+        f"📊 Статус: {status_text.get(booking.status, booking.status)}\n"
+        f"🆔 ID брони: {booking.id}"
     )
 
 
@@ -58,7 +58,7 @@ async def show_bookings(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await message_manager.cleanup_user_messages(context, update.effective_user.id)
 
     # Получаем статистику бронирований
-    stats = db.get_booking_stats()
+    stats = await db.aget_booking_stats()
 
     message = (
         "📅 Управление бронированиями\n\n"
@@ -79,192 +79,136 @@ async def show_bookings(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
-async def show_pending_bookings(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Показать ожидающие бронирования"""
-    if not is_admin(update.effective_user.id):
-        return
+# Заголовок и текст пустого списка для каждого фильтра (None - все бронирования)
+_BOOKING_LISTS = {
+    'pending': ("⏳ Ожидающие бронирования", "⏳ Нет ожидающих бронирований."),
+    'confirmed': ("✅ Подтвержденные бронирования", "✅ Нет подтвержденных бронирований."),
+    'cancelled': ("❌ Отмененные бронирования", "❌ Нет отмененных бронирований."),
+    None: ("📋 Все бронирования", "📭 Бронирования не найдены."),
+}
+
 
+async def _send_bookings_page(update, context, status, after_id=None, shown=0):
+    """Отправить очередную страницу бронирований со статусом status.
+
+    Каждое бронирование - отдельное сообщение; под страницей, если бронирования еще
+    остались, кнопка "Показать еще" с курсором: bookings_more_<фильтр>_<показано>_<id
+    последнего бронирования>.
+    """
     from message_manager import message_manager
     from keyboards.menus import get_booking_filter_menu, get_booking_actions_keyboard
 
-    # Очищаем только временные сообщения при переходе между разделами
-    await message_manager.cleanup_user_messages(context, update.effective_user.id)
+    title, empty_text = _BOOKING_LISTS[status]
+    total = await db.acount_bookings(status)
+    bookings = await db.aget_bookings_page(status, after_id=after_id)
 
-    bookings = db.get_bookings_by_status('pending')
+    if after_id is None:
+        if not bookings:
+            await message_manager.send_message(
+                update, context,
+                empty_text,
+                reply_markup=get_booking_filter_menu(),
+                is_temporary=True
+            )
+            return
 
-    if not bookings:
         await message_manager.send_message(
             update, context,
-            "⏳ Нет ожидающих бронирований.",
+            f"{title} ({total}):",
             reply_markup=get_booking_filter_menu(),
-            is_temporary=True
+            is_temporary=False
         )
-        return
-
-    await message_manager.send_message(
-        update, context,
-        f"⏳ Ожидающие бронирования ({len(bookings)}):",
-        reply_markup=get_booking_filter_menu(),
-        is_temporary=False
-    )
 
     for booking in bookings:
         message = _format_booking_message(booking)
+
+        # Для ожидающих бронирований показываем кнопки действий
+        if booking.status == 'pending':
+            await message_manager.send_message(
+                update, context,
+                message,
+                reply_markup=get_booking_actions_keyboard(booking.id),
+                is_temporary=False
+            )
+        else:
+            await message_manager.send_message(
+                update, context,
+                message,
+                is_temporary=False
+            )
+
+    shown += len(bookings)
+    if bookings and shown < total:
         await message_manager.send_message(
             update, context,
-            message,
-            reply_markup=get_booking_actions_keyboard(booking[0]),
+            f"📋 Показано {shown} из {total}",
+            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(
+                "⬇️ Показать еще",
+                callback_data=f"bookings_more_{status or 'all'}_{shown}_{bookings[-1].id}"
+            )]]),
             is_temporary=False
         )
 
 
-async def show_confirmed_bookings(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Показать подтвержденные бронирования"""
+async def _show_bookings_list(update: Update, context: ContextTypes.DEFAULT_TYPE, status):
+    """Показать первую страницу бронирований со статусом status (None - все)"""
     if not is_admin(update.effective_user.id):
         return
 
     from message_manager import message_manager
-    from keyboards.menus import get_booking_filter_menu
 
     # Очищаем только временные сообщения при переходе между разделами
     await message_manager.cleanup_user_messages(context, update.effective_user.id)
 
-    bookings = db.get_bookings_by_status('confirmed')
+    await _send_bookings_page(update, context, status)
 
-    if not bookings:
-        await message_manager.send_message(
-            update, context,
-            "✅ Нет подтвержденных бронирований.",
-            reply_markup=get_booking_filter_menu(),
-            is_temporary=True
-        )
-        return
 
-    await message_manager.send_message(
-        update, context,
-        f"✅ Подтвержденные бронирования ({len(bookings)}):",
-        reply_markup=get_booking_filter_menu(),
-        is_temporary=False
-    )
+async def show_pending_bookings(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Показать ожидающие бронирования"""
+    await _show_bookings_list(update, context, 'pending')
 
-    for booking in bookings:
-        message = _format_booking_message(booking)
-        await message_manager.send_message(
-            update, context,
-            message,
-            is_temporary=False
-        )
+
+async def show_confirmed_bookings(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Показать подтвержденные бронирования"""
+    await _show_bookings_list(update, context, 'confirmed')
 
 
 async def show_cancelled_bookings(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показать отмененные бронирования"""
-    if not is_admin(update.effective_user.id):
-        return
-
-    from message_manager import message_manager
-    from keyboards.menus import get_booking_filter_menu
-
-    # Очищаем только временные сообщения при переходе между разделами
-    await message_manager.cleanup_user_messages(context, update.effective_user.id)
-
-    bookings = db.get_bookings_by_status('cancelled')
-
-    if not bookings:
-        await message_manager.send_message(
-            update, context,
-            "❌ Нет отмененных бронирований.",
-            reply_markup=get_booking_filter_menu(),
-            is_temporary=True
-        )
-        return
-
-    await message_manager.send_message(
-        update, context,
-        f"❌ Отмененные бронирования ({len(bookings)}):",
-        reply_markup=get_booking_filter_menu(),
-        is_temporary=False
-    )
-
-    for booking in bookings:
-        message = _format_booking_message(booking)
-        await message_manager.send_message(
-            update, context,
-            message,
-            is_temporary=False
-        )
+    await _show_bookings_list(update, context, 'cancelled')
 
 
 async def show_all_bookings(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показать все бронирования"""
-    if not is_admin(update.effective_user.id):
-        return
+    await _show_bookings_list(update, context, None)
 
-    from message_manager import message_manager
-    from keyboards.menus import get_booking_filter_menu, get_booking_actions_keyboard
-
-    # Очищаем только временные сообщения при переходе между разделами
-    await message_manager.cleanup_user_messages(context, update.effective_user.id)
 
-    bookings = db.get_all_bookings_sorted()
+async def show_more_bookings(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Кнопка "Показать еще": следующая страница бронирований после курсора"""
+    query = update.callback_query
+    await query.answer()
 
-    if not bookings:
-        await message_manager.send_message(
-            update, context,
-            "📭 Бронирования не найдены.",
-            is_temporary=True
-        )
+    if not is_admin(query.from_user.id):
         return
 
-    await message_manager.send_message(
-        update, context,
-        f"📋 Все бронирования ({len(bookings)}):",
-        is_temporary=False
-    )
+    _, _, status, shown, after_id = query.data.split('_')
+    status = None if status == 'all' else status
 
-    for booking in bookings:
-        message = _format_booking_message(booking)
+    # Кнопка больше не нужна: страница продолжится новыми сообщениями ниже
+    try:
+        await query.edit_message_reply_markup(reply_markup=None)
+    except Exception as e:
+        if "Message is not modified" not in str(e):
+            logger.error(f"Ошибка при обновлении кнопки списка бронирований: {e}")
 
-        # Для ожидающих бронирований показываем кнопки действий
-        if booking[5] == 'pending':
-            await message_manager.send_message(
-                update, context,
-                message,
-                reply_markup=get_booking_actions_keyboard(booking[0]),
-                is_temporary=False
-            )
-        else:
-            await message_manager.send_message(
-                update, context,
-                message,
-                is_temporary=False
-            )
+    await _send_bookings_page(update, context, status, after_id=int(after_id), shown=int(shown))
 
 
 # Функции для фильтрации бронирований по году/месяцу/дате
-def get_booking_years():
+async def get_booking_years():
     """Получить список годов, в которых есть бронирования"""
-    cursor = db.conn.cursor()
     try:
-        cursor.execute('''
-            SELECT DISTINCT booking_date 
-            FROM bookings 
-            WHERE booking_date IS NOT NULL AND booking_date != ''
-            ORDER BY booking_date DESC
-        ''')
-        dates = cursor.fetchall()
-
-        years_set = set()
-        for date_tuple in dates:
-            date_str = date_tuple[0]
-            if date_str and '.' in date_str:
-                try:
-                    day, month, year = date_str.split('.')
-                    if len(year) == 4 and year.isdigit():
-                        years_set.add(year)
-                except ValueError:
-                    continue
-
-        years = sorted(years_set, reverse=True)
+        years = await db.aget_booking_years()
         logger.info(f"🔍 Найдено годов с бронированиями: {years}")
         return years
 
@@ -273,30 +217,10 @@ def get_booking_years():
         return []
 
 
-def get_booking_months(year):
+async def get_booking_months(year):
     """Получить список месяцев для указанного года"""
-    cursor = db.conn.cursor()
     try:
-        cursor.execute('''
-            SELECT DISTINCT booking_date 
-            FROM bookings 
-            WHERE booking_date IS NOT NULL AND booking_date != ''
-            ORDER BY booking_date DESC
-        ''')
-        dates = cursor.fetchall()
-
-        months_set = set()
-        for date_tuple in dates:
-            date_str = date_tuple[0]
-            if date_str and '.' in date_str:
-                try:
-                    day, month, date_year = date_str.split('.')
-                    if date_year == year and len(month) == 2 and month.isdigit():
-                        months_set.add(month)
-                except ValueError:
-                    continue
-
-        months = sorted(months_set, reverse=True)
+        months = await db.aget_booking_months(year)
         logger.info(f"🔍 Найдено месяцев за {year} год: {months}")
         return months
 
@@ -305,31 +229,12 @@ def get_booking_months(year):
         return []
 
 
-def get_booking_dates_by_year_month(year, month):
+async def get_booking_dates_by_year_month(year, month):
     """Получить список дат для указанного года и месяца"""
-    cursor = db.conn.cursor()
     try:
-        cursor.execute('''
-            SELECT DISTINCT booking_date 
-            FROM bookings 
-            WHERE booking_date IS NOT NULL AND booking_date != ''
-            ORDER BY booking_date DESC
-        ''')
-        dates = cursor.fetchall()
-
-        filtered_dates = []
-        for date_tuple in dates:
-            date_str = date_tuple[0]
-            if date_str and '.' in date_str:
-                try:
-                    day, date_month, date_year = date_str.split('.')
-                    if date_year == year and date_month == month:
-                        filtered_dates.append(date_str)
-                except ValueError:
-                    continue
-
-        logger.info(f"🔍 Найдено дат за {month}.{year}: {filtered_dates}")
-        return filtered_dates
+        dates = await db.aget_booking_days(year, month)
+        logger.info(f"🔍 Найдено дат за {month}.{year}: {dates}")
+        return dates
 
     except Exception as e:
         logger.error(f"❌ Ошибка при получении дат бронирований: {e}")
@@ -346,7 +251,7 @@ async def show_dates_for_filter(update: Update, context: ContextTypes.DEFAULT_TY
         print(f"🔍 НЕ АДМИН! Выход")
         return
 
-    years = get_booking_years()
+    years = await get_booking_years()
     print(f"🔍 Найдено годов: {years}")
 
     if not years:
@@ -394,7 +299,7 @@ async def select_year_for_filter(update: Update, context: ContextTypes.DEFAULT_T
     year = update.message.text.replace("📅 ", "").replace(" год", "").strip()
     context.user_data['selected_year'] = year
 
-    months = get_booking_months(year)
+    months = await get_booking_months(year)
 
     if not months:
         from message_manager import message_manager
@@ -465,7 +370,7 @@ async def select_month_for_filter(update: Update, context: ContextTypes.DEFAULT_
     year = context.user_data['selected_year']
     context.user_data['selected_month'] = month
 
-    dates = get_booking_dates_by_year_month(year, month)
+    dates = await get_booking_dates_by_year_month(year, month)
 
     if not dates:
         from message_manager import message_manager
@@ -512,7 +417,7 @@ async def show_bookings_by_selected_date(update: Update, context: ContextTypes.D
     selected_date = update.message.text.strip()
     formatted_date = selected_date
 
-    bookings = db.get_bookings_by_date(formatted_date)
+    bookings = await db.aget_bookings_by_date(formatted_date)
 
     from message_manager import message_manager
     from keyboards.menus import get_booking_filter_menu
@@ -540,7 +445,7 @@ async def show_bookings_by_selected_date(update: Update, context: ContextTypes.D
 
         # Для ВСЕХ бронирований показываем кнопку отмены
         cancel_keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton("❌ Отменить бронирование", callback_data=f"cancel_booking_reason_{booking[0]}")]
+            [InlineKeyboardButton("❌ Отменить бронирование", callback_data=f"cancel_booking_reason_{booking.id}")]
         ])
 
         # Отправляем каждое бронирование БЕЗ клавиатуры (только инлайн кнопки)
@@ -606,14 +511,7 @@ async def handle_booking_action(update: Update, context: ContextTypes.DEFAULT_TY
                 )
         return
 
-    cursor = db.conn.cursor()
-    cursor.execute('''
-        SELECT b.*, u.first_name, u.last_name, u.telegram_id
-        FROM bookings b 
-        JOIN users u ON b.user_id = u.id 
-        WHERE b.id = ?
-    ''', (booking_id,))
-    booking = cursor.fetchone()
+    booking = await db.aget_booking_with_user(booking_id)
 
     if not booking:
         try:
@@ -629,21 +527,21 @@ async def handle_booking_action(update: Update, context: ContextTypes.DEFAULT_TY
                 )
         return
 
-    booking_id = booking[0]
-    booking_date = booking[2]
-    booking_time = booking[3]
-    guests = booking[4]
-    user_first_name = booking[7]
-    user_last_name = booking[8]
-    user_telegram_id = booking[9]
+    booking_id = booking.id
+    booking_date = booking.booking_date
+    booking_time = booking.booking_time
+    guests = booking.guests
+    user_first_name = booking.first_name
+    user_last_name = booking.last_name
+    user_telegram_id = booking.telegram_id
 
     if action == 'confirm_booking':
-        cursor.execute('UPDATE bookings SET status = ? WHERE id = ?', ('confirmed', booking_id))
-        db.conn.commit()
+        await db.aupdate_booking_status(booking_id, 'confirmed')
 
         try:
-            await context.bot.send_message(
-                user_telegram_id,
+            from message_manager import message_manager
+            await message_manager.notify_user(
+                context, user_telegram_id,
                 f"✅ Ваше бронирование подтверждено!\n\n"
                 f"📅 Дата: {booking_date}\n"
                 f"⏰ Время: {booking_time}\n"
@@ -669,12 +567,12 @@ async def handle_booking_action(update: Update, context: ContextTypes.DEFAULT_TY
                 )
 
     elif action == 'cancel_booking':
-        cursor.execute('UPDATE bookings SET status = ? WHERE id = ?', ('cancelled', booking_id))
-        db.conn.commit()
+        await db.aupdate_booking_status(booking_id, 'cancelled')
 
         try:
-            await context.bot.send_message(
-                user_telegram_id,
+            from message_manager import message_manager
+            await message_manager.notify_user(
+                context, user_telegram_id,
                 f"❌ Ваше бронирование отменено.\n\n"
                 f"📅 Дата: {booking_date}\n"
                 f"⏰ Время: {booking_time}\n"
@@ -762,14 +660,7 @@ async def process_cancellation_reason(update: Update, context: ContextTypes.DEFA
     reason = update.message.text
     booking_id = context.user_data['cancelling_booking_id']
 
-    cursor = db.conn.cursor()
-    cursor.execute('''
-        SELECT b.*, u.first_name, u.last_name, u.telegram_id
-        FROM bookings b 
-        JOIN users u ON b.user_id = u.id 
-        WHERE b.id = ?
-    ''', (booking_id,))
-    booking = cursor.fetchone()
+    booking = await db.aget_booking_with_user(booking_id)
 
     if not booking:
         from message_manager import message_manager
@@ -778,18 +669,18 @@ async def process_cancellation_reason(update: Update, context: ContextTypes.DEFA
         await back_to_main_menu(update, context)
         return ConversationHandler.END
 
-    cursor.execute('UPDATE bookings SET status = ? WHERE id = ?', ('cancelled', booking_id))
-    db.conn.commit()
+    await db.aupdate_booking_status(booking_id, 'cancelled')
 
-    # Проверяем, есть ли telegram_id у пользователя
-    if booking[9] and booking[9] != 0:
+    # Временные профили гостей и недоступные чаты notify_user пропускает сам
+    if booking.telegram_id:
         try:
-            await context.bot.send_message(
-                booking[9],
+            from message_manager import message_manager
+            await message_manager.notify_user(
+                context, booking.telegram_id,
                 f"❌ Ваше бронирование отменено.\n\n"
-                f"📅 Дата: {booking[2]}\n"
-                f"⏰ Время: {booking[3]}\n"
-                f"👥 Гостей: {booking[4]}\n\n"
+                f"📅 Дата: {booking.booking_date}\n"
+                f"⏰ Время: {booking.booking_time}\n"
+                f"👥 Гостей: {booking.guests}\n\n"
                 f"📝 Причина: {reason}\n\n"
                 f"Если у вас есть вопросы, свяжитесь с нами."
             )
@@ -800,7 +691,7 @@ async def process_cancellation_reason(update: Update, context: ContextTypes.DEFA
     await message_manager.send_message(
         update, context,
         f"❌ Бронирование #{booking_id} отменено.\n"
-        f"👤 Пользователь: {booking[7]} {booking[8]}\n"
+        f"👤 Пользователь: {booking.first_name} {booking.last_name}\n"
         f"📝 Причина: {reason}",
         is_temporary=False
     )
@@ -863,8 +754,9 @@ async def handle_admin_booking_calendar(update: Update, context: ContextTypes.DE
         day = int(parts[4])
 
         from datetime import date
+        from utils.helpers import moscow_today
         selected_date_obj = date(year, month, day)
-        today = date.today()
+        today = moscow_today()
 
         if selected_date_obj < today:
             from keyboards.menus import get_calendar_keyboard
@@ -1046,22 +938,10 @@ async def get_admin_booking_phone(update: Update, context: ContextTypes.DEFAULT_
 
     phone = update.message.text.strip()
 
-    # Функция для нормализации номера телефона (приводим к формату 7XXXXXXXXXX)
-    def normalize_phone(phone_str):
-        import re
-        cleaned = re.sub(r'\D', '', phone_str)
-
-        if len(cleaned) == 11:
-            if cleaned.startswith('8'):
-                return '7' + cleaned[1:]
-            elif cleaned.startswith('7'):
-                return cleaned
-        elif len(cleaned) == 10:
-            return '7' + cleaned
-        return cleaned
-
-    from utils.helpers import validate_phone
-    if not validate_phone(phone):
+    # Номер в формате E.164 (+7XXXXXXXXXX): так он хранится в users.phone_e164
+    from utils.helpers import normalize_phone
+    normalized_phone = normalize_phone(phone)
+    if not normalized_phone:
         from message_manager import message_manager
         await message_manager.send_message(
             update, context,
@@ -1070,9 +950,7 @@ async def get_admin_booking_phone(update: Update, context: ContextTypes.DEFAULT_
         )
         return AWAITING_ADMIN_BOOKING_PHONE
 
-    # Нормализуем номер для поиска в базе (формат: 7XXXXXXXXXX)
-    normalized_phone = normalize_phone(phone)
-    display_phone = f"+7{normalized_phone[1:]}"
+    display_phone = normalized_phone
 
     # Получаем данные из контекста
     booking_date = context.user_data.get('admin_booking_date')
@@ -1091,43 +969,26 @@ async def get_admin_booking_phone(update: Update, context: ContextTypes.DEFAULT_
         await back_to_main_menu(update, context)
         return ConversationHandler.END
 
-    cursor = db.conn.cursor()
-
-    # Ищем по нормализованному номеру (7XXXXXXXXXX)
-    cursor.execute('SELECT id, first_name, last_name, phone FROM users WHERE phone = ?', (normalized_phone,))
-    existing_user = cursor.fetchone()
+    # Поиск по уникальному индексу phone_e164: номер найдется в любом формате,
+    # в котором его ввели при регистрации
+    existing_user = await db.afind_user_by_phone(normalized_phone)
 
     if existing_user:
         # Пользователь найден, используем его ID
-        user_id = existing_user[0]
-        user_first_name = existing_user[1] or client_name
-        user_last_name = existing_user[2] or ""
-        stored_phone = existing_user[3]
+        user_id = existing_user.id
+        user_first_name = existing_user.first_name or client_name
+        user_last_name = existing_user.last_name or ""
 
-        logger.info(f"👤 Найден существующий пользователь с ID {user_id} для брони (телефон: {stored_phone})")
-        display_phone = f"+7{stored_phone[1:]}" if stored_phone.startswith('7') else stored_phone
+        logger.info(f"👤 Найден существующий пользователь с ID {user_id} для брони (телефон: {existing_user.phone})")
     else:
-        # Ищем максимальный telegram_id среди временных пользователей
-        cursor.execute('SELECT MAX(telegram_id) FROM users WHERE telegram_id < 0')
-        max_temp_id = cursor.fetchone()[0]
-
-        # Создаем новый отрицательный ID ( -1, -2, -3 и т.д.)
-        new_temp_id = (max_temp_id or 0) - 1
-
-        # Сохраняем номер в формате 7XXXXXXXXXX (без +)
-        phone_to_save = normalized_phone
-
-        cursor.execute('''
-            INSERT INTO users (telegram_id, first_name, last_name, phone, bonus_balance, registration_date)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (new_temp_id, client_name, "", phone_to_save, 0, db.get_moscow_time()))
-        user_id = cursor.lastrowid
-        db.conn.commit()
+        # Создаем временного пользователя с отрицательным telegram_id (-1, -2, -3 и т.д.),
+        # номер сохраняется в формате E.164
+        user_id, new_temp_id = await db.acreate_guest_user(client_name, normalized_phone)
 
         logger.info(f"🆕 Создан временный пользователь с ID {user_id} (telegram_id: {new_temp_id}) для брони")
 
     # Создаем бронирование
-    booking_id = db.create_booking(user_id, booking_date, booking_time, guests)
+    booking_id = await db.acreate_booking(user_id, booking_date, booking_time, guests)
 
     from message_manager import message_manager
     from keyboards.menus import get_admin_main_menu
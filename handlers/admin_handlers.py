@@ -4,7 +4,7 @@
 import logging
 from telegram import Update  # ДОБАВИТЬ ЭТОТ ИМПОРТ
 from telegram.ext import ContextTypes  # ДОБАВИТЬ ЭТОТ ИМПОРТ
-from database import Database
+from database import get_db
 
 # Импортируем все функции из подмодулей
 from .admin_utils import (
@@ -41,6 +41,7 @@ from .admin_bookings import (
     show_confirmed_bookings,
     show_cancelled_bookings,
     show_all_bookings,
+    show_more_bookings,
     show_dates_for_filter,
     select_year_for_filter,
     select_month_for_filter,
@@ -63,6 +64,7 @@ from .admin_bonuses import (
 from .admin_messages import (
     broadcast_message,
     process_broadcast_media,
+    show_broadcasts,
     start_user_message,
     user_selected_for_message,
     process_user_message,
@@ -72,7 +74,7 @@ from .admin_messages import (
 )
 
 logger = logging.getLogger(__name__)
-db = Database()
+db = get_db()
 
 # Сброс данных смены
 async def reset_shift_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -4,12 +4,12 @@
 import logging
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton  # УЖЕ ЕСТЬ
 from telegram.ext import ContextTypes, ConversationHandler
-from config import ADMIN_IDS
-from database import Database
+from config import ADMIN_IDS, USERS_PAGE_SIZE
+from database import get_db
 import asyncio
 
 logger = logging.getLogger(__name__)
-db = Database()
+db = get_db()
 
 # Состояния для админских функций
 AWAITING_BONUS_AMOUNT, AWAITING_SPENT_AMOUNT, AWAITING_SEARCH_QUERY = range(3)
@@ -36,7 +36,8 @@ async def show_users_list(update: Update, context: ContextTypes.DEFAULT_TYPE, pa
         "📌 Просто напишите в чат:\n"
         "• ID пользователя (например: 123)\n"
         "• Имя или фамилию (например: Иван)\n"
-        "• Часть имени\n\n"
+        "• Начало имени или фамилии\n"
+        "• Телефон или его последние 4 цифры\n\n"
         "Или нажмите кнопку для просмотра полного списка:",
         reply_markup=InlineKeyboardMarkup([
             [InlineKeyboardButton("📋 Показать полный список", callback_data="show_full_users_list_0")],
@@ -84,26 +85,8 @@ async def process_user_search(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
         return AWAITING_SEARCH_QUERY
 
-    # Ищем пользователей в базе данных
-    cursor = db.conn.cursor()
-
-    # Поиск по ID
-    if search_query.isdigit():
-        cursor.execute('''
-            SELECT * FROM users 
-            WHERE id = ? AND is_active = TRUE 
-            ORDER BY id DESC
-        ''', (int(search_query),))
-    else:
-        # Поиск по имени или фамилии
-        search_pattern = f"%{search_query}%"
-        cursor.execute('''
-            SELECT * FROM users 
-            WHERE (first_name LIKE ? OR last_name LIKE ?) AND is_active = TRUE 
-            ORDER BY id DESC
-        ''', (search_pattern, search_pattern))
-
-    users = cursor.fetchall()
+    # Поиск по ID, имени, фамилии, телефону или Telegram ID (индекс users_fts)
+    users = await db.asearch_users(search_query)
 
     if not users:
         from message_manager import message_manager
@@ -124,8 +107,8 @@ async def process_user_search(update: Update, context: ContextTypes.DEFAULT_TYPE
     keyboard = []
     for user in users:
         keyboard.append([InlineKeyboardButton(
-            f"{user[2]} {user[3]} (ID: {user[0]}) | 💰 {user[5]} баллов",
-            callback_data=f"select_user_{user[0]}"
+            f"{user.first_name} {user.last_name} (ID: {user.id}) | 💰 {user.bonus_balance} баллов",
+            callback_data=f"select_user_{user.id}"
         )])
 
     keyboard.append([InlineKeyboardButton("⬅️ Назад к списку", callback_data="back_to_users_list")])
@@ -191,22 +174,22 @@ async def user_selected_callback(update: Update, context: ContextTypes.DEFAULT_T
         return
 
     user_id = int(query.data.split('_')[-1])
-    user_data = db.get_user_by_id(user_id)
+    user_data = await db.aget_user_by_id(user_id)
 
     if user_data:
         # Получаем информацию о рефералах
-        referral_stats = db.get_referrer_stats(user_id)
+        referral_stats = await db.aget_referrer_stats(user_id)
         total_referrals = referral_stats[0] if referral_stats else 0
 
         message = (
             f"👤 Пользователь:\n\n"
-            f"🆔 ID: {user_data[0]}\n"
-            f"👤 Имя: {user_data[2]} {user_data[3]}\n"
-            f"📱 Телефон: {user_data[4]}\n"
-            f"💰 Баланс: {user_data[5]} баллов\n"
-            f"📅 Дата регистрации: {user_data[6]}\n"
+            f"🆔 ID: {user_data.id}\n"
+            f"👤 Имя: {user_data.first_name} {user_data.last_name}\n"
+            f"📱 Телефон: {user_data.phone}\n"
+            f"💰 Баланс: {user_data.bonus_balance} баллов\n"
+            f"📅 Дата регистрации: {user_data.registration_date}\n"
             f"👥 Приглашено друзей: {total_referrals}\n"
-            f"🔗 Telegram ID: {user_data[1]}"
+            f"🔗 Telegram ID: {user_data.telegram_id}"
         )
 
         from keyboards.menus import get_user_actions_keyboard
@@ -248,18 +231,18 @@ async def user_info_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
 
     user_id = int(query.data.split('_')[-1])
-    user_data = db.get_user_by_id(user_id)
+    user_data = await db.aget_user_by_id(user_id)
 
     if user_data:
         message = (
             f"👤 Информация о пользователе:\n\n"
-            f"🆔 ID: {user_data[0]}\n"
-            f"👤 Имя: {user_data[2]}\n"
-            f"📝 Фамилия: {user_data[3]}\n"
-            f"📱 Телефон: {user_data[4]}\n"
-            f"💰 Баланс: {user_data[5]} баллов\n"
-            f"📅 Регистрация: {user_data[6]}\n"
-            f"🔗 Telegram ID: {user_data[1]}"
+            f"🆔 ID: {user_data.id}\n"
+            f"👤 Имя: {user_data.first_name}\n"
+            f"📝 Фамилия: {user_data.last_name}\n"
+            f"📱 Телефон: {user_data.phone}\n"
+            f"💰 Баланс: {user_data.bonus_balance} баллов\n"
+            f"📅 Регистрация: {user_data.registration_date}\n"
+            f"🔗 Telegram ID: {user_data.telegram_id}"
         )
 
         from keyboards.menus import get_user_actions_keyboard
@@ -306,56 +289,64 @@ async def exit_search_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def show_full_users_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Показать полный список пользователей"""
+    """Показать полный список пользователей.
+
+    callback_data кнопок навигации: show_full_users_list_<страница>_<курсор>, где курсор -
+    n<id> (пользователи после id, следующая страница) или p<id> (пользователи перед id,
+    предыдущая страница). show_full_users_list_0 - первая страница.
+    """
     query = update.callback_query
     await query.answer()
 
     if not is_admin(query.from_user.id):
         return
 
-    page = 0
-    if query.data.startswith("show_full_users_list_"):
-        try:
-            page = int(query.data.split("_")[-1])
-        except:
-            page = 0
+    page, _, cursor = query.data[len("show_full_users_list_"):].partition('_')
+    try:
+        page = int(page)
+        cursor_id = int(cursor[1:]) if cursor else None
+    except ValueError:
+        page, cursor, cursor_id = 0, '', None
 
     context.user_data.pop('search_users_mode', None)
-    users = db.get_all_users()
-
-    if not users:
-        await query.edit_message_text("📭 Пользователи не найдены.")
-        return
+    total_users = await db.acount_active_users()
 
-    users_per_page = 20
-    total_pages = (len(users) + users_per_page - 1) // users_per_page
+    if cursor.startswith('p'):
+        users_page = await db.aget_users_page(before_id=cursor_id)
+    else:
+        users_page = await db.aget_users_page(after_id=cursor_id)
 
-    if page < 0:
+    if not users_page and cursor:
+        # Пользователи за курсором исчезли (список изменился) - показываем начало
         page = 0
-    elif page >= total_pages:
-        page = total_pages - 1
+        users_page = await db.aget_users_page()
 
-    start_index = page * users_per_page
-    end_index = min(start_index + users_per_page, len(users))
-    users_page = users[start_index:end_index]
+    if not users_page:
+        await query.edit_message_text("📭 Пользователи не найдены.")
+        return
 
-    message = f"👥 Список пользователей (стр. {page + 1}/{total_pages}, всего: {len(users)})\n\n"
+    total_pages = max((total_users + USERS_PAGE_SIZE - 1) // USERS_PAGE_SIZE, 1)
+    page = min(max(page, 0), total_pages - 1)
+
+    message = f"👥 Список пользователей (стр. {page + 1}/{total_pages}, всего: {total_users})\n\n"
     message += "Выберите пользователя:"
 
     keyboard = []
     nav_buttons = []
     if page > 0:
-        nav_buttons.append(InlineKeyboardButton("⬅️ Предыдущая", callback_data=f"show_full_users_list_{page - 1}"))
+        nav_buttons.append(InlineKeyboardButton(
+            "⬅️ Предыдущая", callback_data=f"show_full_users_list_{page - 1}_p{users_page[0].id}"))
     if page < total_pages - 1:
-        nav_buttons.append(InlineKeyboardButton("Следующая ➡️", callback_data=f"show_full_users_list_{page + 1}"))
+        nav_buttons.append(InlineKeyboardButton(
+            "Следующая ➡️", callback_data=f"show_full_users_list_{page + 1}_n{users_page[-1].id}"))
 
     if nav_buttons:
         keyboard.append(nav_buttons)
 
     for user in users_page:
         keyboard.append([InlineKeyboardButton(
-            f"{user[2]} {user[3]} (ID: {user[0]}) | 💰 {user[5]} баллов",
-            callback_data=f"select_user_{user[0]}"
+            f"{user.first_name} {user.last_name} (ID: {user.id}) | 💰 {user.bonus_balance} баллов",
+            callback_data=f"select_user_{user.id}"
         )])
 
     keyboard.append([InlineKeyboardButton("🔄 Обновить", callback_data="refresh_users")])
@@ -383,7 +374,8 @@ async def back_to_search_mode(update: Update, context: ContextTypes.DEFAULT_TYPE
         "📌 Просто напишите в чат:\n"
         "• ID пользователя (например: 123)\n"
         "• Имя или фамилию (например: Иван)\n"
-        "• Часть имени\n\n"
+        "• Начало имени или фамилии\n"
+        "• Телефон или его последние 4 цифры\n\n"
         "Или нажмите кнопку для просмотра полного списка:",
         reply_markup=InlineKeyboardMarkup([
             [InlineKeyboardButton("📋 Показать полный список", callback_data="show_full_users_list_0")],
@@ -406,7 +398,8 @@ async def new_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "🔍 Введите новый поисковый запрос:\n"
         "• ID пользователя\n"
         "• Имя или фамилию\n"
-        "• Часть имени\n\n"
+        "• Начало имени или фамилии\n"
+        "• Телефон или его последние 4 цифры\n\n"
         "Или нажмите кнопку для просмотра полного списка:",
         reply_markup=InlineKeyboardMarkup([
             [InlineKeyboardButton("📋 Показать полный список", callback_data="show_full_users_list_0")],
@@ -428,15 +421,15 @@ async def add_bonus_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     context.user_data['selected_user'] = user_id
     context.user_data['action'] = 'add_bonus_percent'
 
-    user_data = db.get_user_by_id(user_id)
+    user_data = await db.aget_user_by_id(user_id)
 
     from keyboards.menus import get_cancel_keyboard
     from message_manager import message_manager
     await message_manager.send_message(
         update, context,
         f"💰 Начисление баллов пользователю:\n"
-        f"👤 {user_data[2]} {user_data[3]}\n"
-        f"💰 Текущий баланс: {user_data[5]} баллов\n\n"
+        f"👤 {user_data.first_name} {user_data.last_name}\n"
+        f"💰 Текущий баланс: {user_data.bonus_balance} баллов\n\n"
         f"Введите сумму, которую потратил пользователь (рубли):",
         reply_markup=get_cancel_keyboard(),
         is_temporary=False
@@ -469,20 +462,21 @@ async def process_spent_amount(update: Update, context: ContextTypes.DEFAULT_TYP
             )
             return AWAITING_SPENT_AMOUNT
 
-        user_data = db.get_user_by_id(user_id)
+        user_data = await db.aget_user_by_id(user_id)
 
         if action == 'add_bonus_percent':
             bonus_amount = int(spent_amount * 0.05)
-            db.update_user_balance(user_id, bonus_amount)
-            db.add_transaction(user_id, bonus_amount, 'earn', f'Начисление 5% от суммы {spent_amount} руб')
+            await db.achange_bonus_balance(user_id, bonus_amount, 'earn',
+                                           f'Начисление 5% от суммы {spent_amount} руб')
 
             # Уведомляем пользователя о начислении
             try:
-                await context.bot.send_message(
-                    user_data[1],
+                from message_manager import message_manager
+                await message_manager.notify_user(
+                    context, user_data.telegram_id,
                     f"🎉 Вам начислены бонусные баллы!\n\n"
                     f"💰 Начислено: {bonus_amount} баллов (5% от {spent_amount} руб)\n"
-                    f"💳 Новый баланс: {user_data[5] + bonus_amount} баллов\n\n"
+                    f"💳 Новый баланс: {user_data.bonus_balance + bonus_amount} баллов\n\n"
                     f"Мы будем рады если вы оставите свой отзыв:\n"
                     f"📍 [Оставить отзыв на Яндекс Картах](https://yandex.ru/maps/org/vovsetyazhkiye/57633254342)\n\n"
                     f"Спасибо за посещение нашего заведения! 🏪",
@@ -495,8 +489,8 @@ async def process_spent_amount(update: Update, context: ContextTypes.DEFAULT_TYP
             from message_manager import message_manager
             await message_manager.send_message(
                 update, context,
-                f"✅ Пользователю {user_data[2]} {user_data[3]} начислено {bonus_amount} бонусных баллов (5% от {spent_amount} руб).\n"
-                f"💰 Новый баланс: {user_data[5] + bonus_amount} баллов",
+                f"✅ Пользователю {user_data.first_name} {user_data.last_name} начислено {bonus_amount} бонусных баллов (5% от {spent_amount} руб).\n"
+                f"💰 Новый баланс: {user_data.bonus_balance + bonus_amount} баллов",
                 reply_markup=get_admin_main_menu(),
                 is_temporary=False
             )
@@ -527,15 +521,15 @@ async def remove_bonus_callback(update: Update, context: ContextTypes.DEFAULT_TY
     context.user_data['selected_user'] = user_id
     context.user_data['action'] = 'remove_bonus'
 
-    user_data = db.get_user_by_id(user_id)
+    user_data = await db.aget_user_by_id(user_id)
 
     from keyboards.menus import get_cancel_keyboard
     from message_manager import message_manager
     await message_manager.send_message(
         update, context,
         f"📊 Списание баллов у пользователя:\n"
-        f"👤 {user_data[2]} {user_data[3]}\n"
-        f"💰 Текущий баланс: {user_data[5]} баллов\n\n"
+        f"👤 {user_data.first_name} {user_data.last_name}\n"
+        f"💰 Текущий баланс: {user_data.bonus_balance} баллов\n\n"
         f"Введите сумму для списания:",
         reply_markup=get_cancel_keyboard(),
         is_temporary=False
@@ -567,9 +561,11 @@ async def process_remove_bonus(update: Update, context: ContextTypes.DEFAULT_TYP
             )
             return AWAITING_BONUS_AMOUNT
 
-        user_data = db.get_user_by_id(user_id)
+        user_data = await db.aget_user_by_id(user_id)
 
-        if amount > user_data[5]:
+        # Проверка баланса повторяется при списании, в той же транзакции
+        if amount > user_data.bonus_balance or not await db.achange_bonus_balance(user_id, -amount, 'spend',
+                                                                       'Списание администратором'):
             from message_manager import message_manager
             await message_manager.send_message(
                 update, context,
@@ -578,15 +574,13 @@ async def process_remove_bonus(update: Update, context: ContextTypes.DEFAULT_TYP
             )
             return AWAITING_BONUS_AMOUNT
 
-        db.update_user_balance(user_id, -amount)
-        db.add_transaction(user_id, -amount, 'spend', 'Списание администратором')
-
         # Уведомляем пользователя о списании
         try:
-            await context.bot.send_message(
-                user_data[1],
+            from message_manager import message_manager
+            await message_manager.notify_user(
+                context, user_data.telegram_id,
                 f"📊 С вашего счета списано {amount} бонусных баллов.\n"
-                f"💰 Новый баланс: {user_data[5] - amount} баллов"
+                f"💰 Новый баланс: {user_data.bonus_balance - amount} баллов"
             )
         except Exception as e:
             logger.error(f"Не удалось уведомить пользователя о списании: {e}")
@@ -595,8 +589,8 @@ async def process_remove_bonus(update: Update, context: ContextTypes.DEFAULT_TYP
         from message_manager import message_manager
         await message_manager.send_message(
             update, context,
-            f"✅ У пользователя {user_data[2]} {user_data[3]} списано {amount} бонусных баллов.\n"
-            f"💰 Новый баланс: {user_data[5] - amount} баллов",
+            f"✅ У пользователя {user_data.first_name} {user_data.last_name} списано {amount} бонусных баллов.\n"
+            f"💰 Новый баланс: {user_data.bonus_balance - amount} баллов",
             reply_markup=get_admin_main_menu(),
             is_temporary=False
         )
@@ -94,36 +94,29 @@ async def show_statistics(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_admin(update.effective_user.id):
         return
 
-    from database import Database
+    from database import get_db
     from message_manager import message_manager
     from keyboards.menus import get_admin_main_menu
 
-    db = Database()
+    db = get_db()
 
     # Очищаем только временные сообщения при переходе между разделами
     await message_manager.cleanup_user_messages(context, update.effective_user.id)
 
-    users = db.get_all_users()
-    total_users = len(users)
-    total_bonuses = sum(user[5] for user in users)
-
-    # Получаем статистику бронирований
-    booking_stats = db.get_booking_stats()
-
-    # Получаем статистику запросов
-    requests = db.get_pending_requests()
-    pending_requests_count = len(requests)
+    # Все показатели считаются агрегатами в базе, строки пользователей не загружаются
+    stats = await db.aget_dashboard_stats()
+    booking_stats = stats['bookings']
 
     message = (
         f"📊 Статистика системы:\n\n"
-        f"👥 Всего пользователей: {total_users}\n"
-        f"💰 Всего бонусных баллов: {total_bonuses}\n"
-        f"🏆 Средний баланс: {total_bonuses // total_users if total_users > 0 else 0} баллов\n\n"
+        f"👥 Всего пользователей: {stats['users']}\n"
+        f"💰 Всего бонусных баллов: {stats['total_balance']}\n"
+        f"🏆 Средний баланс: {stats['average_balance']} баллов\n\n"
         f"📅 Бронирования:\n"
-        f"⏳ Ожидающие: {booking_stats.get('pending', 0)}\n"
-        f"✅ Подтвержденные: {booking_stats.get('confirmed', 0)}\n"
-        f"❌ Отмененные: {booking_stats.get('cancelled', 0)}\n\n"
-        f"📋 Запросы на списание: {pending_requests_count}"
+        f"⏳ Ожидающие: {booking_stats['pending']}\n"
+        f"✅ Подтвержденные: {booking_stats['confirmed']}\n"
+        f"❌ Отмененные: {booking_stats['cancelled']}\n\n"
+        f"📋 Запросы на списание: {stats['pending_requests']}"
     )
 
     # Статистика - постоянное сообщение
@@ -1,9 +1,10 @@
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, filters, CommandHandler, \
     CallbackQueryHandler
-from database import Database
+from database import get_db
 from keyboards.menus import get_user_main_menu, get_cancel_keyboard, get_calendar_keyboard
 from config import ADMIN_IDS
+from utils.helpers import moscow_today
 from message_manager import message_manager
 import logging
 import re
@@ -11,7 +12,7 @@ from datetime import datetime, date
 
 logger = logging.getLogger(__name__)
 
-db = Database()
+db = get_db()
 
 # Состояния для бронирования
 BOOKING_DATE, BOOKING_TIME, BOOKING_GUESTS = range(3)
@@ -22,7 +23,7 @@ async def start_booking(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await message_manager.cleanup_all_messages(context, update.effective_user.id)
 
     user = update.effective_user
-    user_data = db.get_user(user.id)
+    user_data = await db.aget_user(user.id)
 
     if not user_data:
         await message_manager.send_message(
@@ -70,8 +71,8 @@ async def handle_calendar_callback(update: Update, context: ContextTypes.DEFAULT
         # Создаем объект даты для проверки
         selected_date_obj = date(year, month, day)
 
-        # Проверяем, что дата не в прошлом
-        today = date.today()
+        # Проверяем, что дата не в прошлом (по тому же московскому "сегодня", что и календарь)
+        today = moscow_today()
         if selected_date_obj < today:
             await query.edit_message_text(
                 text="❌ Нельзя выбрать прошедшую дату. Выберите другую дату:",
@@ -214,11 +215,11 @@ async def get_booking_guests(update: Update, context: ContextTypes.DEFAULT_TYPE)
             return BOOKING_GUESTS
 
         user = update.effective_user
-        user_data = db.get_user(user.id)
+        user_data = await db.aget_user(user.id)
 
         # Создаем бронирование
-        booking_id = db.create_booking(
-            user_data[0],
+        booking_id = await db.acreate_booking(
+            user_data.id,
             context.user_data['booking_date'],
             context.user_data['booking_time'],
             guests
@@ -230,8 +231,8 @@ async def get_booking_guests(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 await message_manager.send_message_to_chat(
                     context, admin_id,
                     f"📅 Новое бронирование!\n\n"
-                    f"👤 Пользователь: {user_data[2]} {user_data[3]}\n"
-                    f"📱 Телефон: {user_data[4]}\n"
+                    f"👤 Пользователь: {user_data.first_name} {user_data.last_name}\n"
+                    f"📱 Телефон: {user_data.phone}\n"
                     f"📅 Дата: {context.user_data['booking_date']}\n"
                     f"⏰ Время: {context.user_data['booking_time']}\n"
                     f"👥 Гостей: {guests}\n"
@@ -1,7 +1,7 @@
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes, MessageHandler, filters, CallbackQueryHandler, ConversationHandler
 from config import ADMIN_IDS
-from database import Database
+from database import get_db
 from keyboards.menus import (
     get_menu_management_keyboard, get_categories_keyboard,
     get_menu_items_keyboard, get_menu_item_actions_keyboard,
@@ -12,7 +12,7 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-db = Database()
+db = get_db()
 
 # Состояния для управления меню
 AWAITING_ITEM_NAME, AWAITING_ITEM_PRICE = range(2)
@@ -41,7 +41,7 @@ async def view_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_admin(update.effective_user.id):
         return
 
-    categories = db.get_all_menu_categories()
+    categories = await db.aget_all_menu_categories()
 
     if not categories:
         await update.message.reply_text(
@@ -53,11 +53,11 @@ async def view_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     message = "📋 Текущее меню:\n\n"
 
     for category in categories:
-        items = db.get_menu_items_by_category(category)
+        items = await db.aget_menu_items_by_category(category)
         if items:
             message += f"🍽️ {category}:\n"
             for item in items:
-                message += f"• {item[1]} - {item[2]}₽\n"
+                message += f"• {item.name} - {item.price}₽\n"
             message += "\n"
 
     await update.message.reply_text(
@@ -71,7 +71,7 @@ async def show_categories_for_action(update: Update, context: ContextTypes.DEFAU
     if not is_admin(update.effective_user.id):
         return
 
-    categories = db.get_all_menu_categories()
+    categories = await db.aget_all_menu_categories()
 
     if not categories:
         await update.message.reply_text(
@@ -119,7 +119,7 @@ async def handle_category_selection(update: Update, context: ContextTypes.DEFAUL
 
     else:
         # Для других действий показываем список позиций в категории
-        items = db.get_menu_items_by_category(category)
+        items = await db.aget_menu_items_by_category(category)
 
         if not items:
             await query.message.reply_text(
@@ -164,7 +164,7 @@ async def process_item_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     item_name = update.message.text.strip()
 
     # Проверяем, не существует ли уже позиция с таким названием
-    existing_item = db.get_menu_item_by_name(item_name)
+    existing_item = await db.aget_menu_item_by_name(item_name)
     if existing_item:
         await update.message.reply_text(
             "❌ Позиция с таким названием уже существует. Введите другое название:",
@@ -207,7 +207,7 @@ async def process_item_price(update: Update, context: ContextTypes.DEFAULT_TYPE)
     category = context.user_data.get('new_item_category')
 
     # Добавляем позицию в базу
-    success, message = db.add_menu_item(name, price, category)
+    success, message = await db.aadd_menu_item(name, price, category)
 
     if success:
         await update.message.reply_text(
@@ -245,7 +245,7 @@ async def handle_edit_item_selection(update: Update, context: ContextTypes.DEFAU
         return
 
     item_id = int(query.data.replace("edit_item_", ""))
-    item = db.get_menu_item_by_id(item_id)
+    item = await db.aget_menu_item_by_id(item_id)
 
     if not item:
         await query.message.reply_text(
@@ -256,9 +256,9 @@ async def handle_edit_item_selection(update: Update, context: ContextTypes.DEFAU
 
     await query.message.reply_text(
         f"✏️ Редактирование позиции:\n\n"
-        f"🍽️ Название: {item[1]}\n"
-        f"💰 Цена: {item[2]}₽\n"
-        f"📁 Категория: {item[3]}\n\n"
+        f"🍽️ Название: {item.name}\n"
+        f"💰 Цена: {item.price}₽\n"
+        f"📁 Категория: {item.category}\n\n"
         f"Выберите что хотите изменить:",
         reply_markup=get_menu_item_actions_keyboard(item_id)
     )
@@ -276,11 +276,11 @@ async def start_edit_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['editing_item_id'] = item_id
     context.user_data['editing_field'] = 'name'
 
-    item = db.get_menu_item_by_id(item_id)
+    item = await db.aget_menu_item_by_id(item_id)
 
     await query.message.reply_text(
         f"✏️ Изменение названия позиции:\n"
-        f"Текущее название: {item[1]}\n\n"
+        f"Текущее название: {item.name}\n\n"
         f"Введите новое название:",
         reply_markup=get_cancel_keyboard()
     )
@@ -299,11 +299,11 @@ async def start_edit_price(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['editing_item_id'] = item_id
     context.user_data['editing_field'] = 'price'
 
-    item = db.get_menu_item_by_id(item_id)
+    item = await db.aget_menu_item_by_id(item_id)
 
     await query.message.reply_text(
         f"💰 Изменение цены позиции:\n"
-        f"Текущая цена: {item[2]}₽\n\n"
+        f"Текущая цена: {item.price}₽\n\n"
         f"Введите новую цену:",
         reply_markup=get_cancel_keyboard()
     )
@@ -324,7 +324,7 @@ async def process_edit_field(update: Update, context: ContextTypes.DEFAULT_TYPE)
     field = context.user_data.get('editing_field')
     value = update.message.text.strip()
 
-    item = db.get_menu_item_by_id(item_id)
+    item = await db.aget_menu_item_by_id(item_id)
     if not item:
         await update.message.reply_text(
             "❌ Позиция не найдена.",
@@ -336,15 +336,15 @@ async def process_edit_field(update: Update, context: ContextTypes.DEFAULT_TYPE)
     try:
         if field == 'name':
             # Проверяем, не существует ли другой позиции с таким же названием
-            existing_item = db.get_menu_item_by_name(value)
-            if existing_item and existing_item[0] != item_id:
+            existing_item = await db.aget_menu_item_by_name(value)
+            if existing_item and existing_item.id != item_id:
                 await update.message.reply_text(
                     "❌ Позиция с таким названием уже существует. Введите другое название:",
                     reply_markup=get_cancel_keyboard()
                 )
                 return AWAITING_EDIT_NAME
 
-            success, message = db.update_menu_item(item_id, value, item[2], item[3])
+            success, message = await db.aupdate_menu_item(item_id, value, item.price, item.category)
 
         elif field == 'price':
             try:
@@ -358,16 +358,16 @@ async def process_edit_field(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 )
                 return AWAITING_EDIT_PRICE
 
-            success, message = db.update_menu_item(item_id, item[1], price, item[3])
+            success, message = await db.aupdate_menu_item(item_id, item.name, price, item.category)
 
         if success:
-            updated_item = db.get_menu_item_by_id(item_id)
+            updated_item = await db.aget_menu_item_by_id(item_id)
             await update.message.reply_text(
                 f"✅ {message}\n\n"
                 f"Обновленная позиция:\n"
-                f"🍽️ Название: {updated_item[1]}\n"
-                f"💰 Цена: {updated_item[2]}₽\n"
-                f"📁 Категория: {updated_item[3]}",
+                f"🍽️ Название: {updated_item.name}\n"
+                f"💰 Цена: {updated_item.price}₽\n"
+                f"📁 Категория: {updated_item.category}",
                 reply_markup=get_menu_management_keyboard()
             )
         else:
@@ -405,7 +405,7 @@ async def handle_delete_item_selection(update: Update, context: ContextTypes.DEF
         return
 
     item_id = int(query.data.replace("delete_item_", ""))
-    item = db.get_menu_item_by_id(item_id)
+    item = await db.aget_menu_item_by_id(item_id)
 
     if not item:
         await query.message.reply_text(
@@ -416,9 +416,9 @@ async def handle_delete_item_selection(update: Update, context: ContextTypes.DEF
 
     await query.message.reply_text(
         f"🗑️ Вы уверены, что хотите удалить позицию?\n\n"
-        f"🍽️ Название: {item[1]}\n"
-        f"💰 Цена: {item[2]}₽\n"
-        f"📁 Категория: {item[3]}\n\n"
+        f"🍽️ Название: {item.name}\n"
+        f"💰 Цена: {item.price}₽\n"
+        f"📁 Категория: {item.category}\n\n"
         f"Эта операция необратима!",
         reply_markup=get_edit_confirmation_keyboard(item_id)
     )
@@ -433,7 +433,7 @@ async def confirm_delete_item(update: Update, context: ContextTypes.DEFAULT_TYPE
         return
 
     item_id = int(query.data.replace("confirm_delete_", ""))
-    item = db.get_menu_item_by_id(item_id)
+    item = await db.aget_menu_item_by_id(item_id)
 
     if not item:
         await query.message.reply_text(
@@ -442,12 +442,12 @@ async def confirm_delete_item(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
         return
 
-    success, message = db.delete_menu_item(item_id)
+    success, message = await db.adelete_menu_item(item_id)
 
     if success:
         await query.message.reply_text(
             f"✅ {message}\n\n"
-            f"Удаленная позиция: {item[1]}",
+            f"Удаленная позиция: {item.name}",
             reply_markup=get_back_to_menu_management_keyboard()
         )
     else:
@@ -478,7 +478,7 @@ async def back_to_categories_list(update: Update, context: ContextTypes.DEFAULT_
         return
 
     action = context.user_data.get('menu_action')
-    categories = db.get_all_menu_categories()
+    categories = await db.aget_all_menu_categories()
 
     action_texts = {
         "add": "➕ Добавление новой позиции",
@@ -49,14 +49,14 @@ async def handle_table_number(update: Update, context: ContextTypes.DEFAULT_TYPE
         context.user_data['table_number'] = table_number
 
         # Проверяем, нет ли уже активного заказа на этот стол
-        existing_order = db.get_active_order_by_table(table_number)
+        existing_order = await db.aget_active_order_by_table(table_number)
         if existing_order:
             await message_manager.send_message(
                 update, context,
                 f"⚠️ На столе {table_number} уже есть активный заказ.\n"
                 f"Хотите добавить позиции к существующему заказу?",
                 reply_markup=InlineKeyboardMarkup(
-                    [[InlineKeyboardButton("✅ Да", callback_data=f"add_to_existing_{existing_order[0]}"),
+                    [[InlineKeyboardButton("✅ Да", callback_data=f"add_to_existing_{existing_order.id}"),
                       InlineKeyboardButton("❌ Нет", callback_data="cancel_order")]]),
                 is_temporary=False
             )
@@ -66,10 +66,10 @@ async def handle_table_number(update: Update, context: ContextTypes.DEFAULT_TYPE
         telegram_id = update.effective_user.id
         print(f"🔄 DEBUG: Ищем пользователя с telegram_id: {telegram_id}")
 
-        user_data = db.get_user(telegram_id)
+        user_data = await db.aget_user(telegram_id)
 
         if user_data:
-            print(f"✅ DEBUG: Найден пользователь: ID={user_data[0]}, Имя={user_data[2]}, Фамилия={user_data[3]}")
+            print(f"✅ DEBUG: Найден пользователь: ID={user_data.id}, Имя={user_data.first_name}, Фамилия={user_data.last_name}")
         else:
             print(f"❌ DEBUG: Пользователь не найден в базе")
 
@@ -81,11 +81,11 @@ async def handle_table_number(update: Update, context: ContextTypes.DEFAULT_TYPE
             )
             return
 
-        user_id = user_data[0]  # id из таблицы users
+        user_id = user_data.id  # id из таблицы users
         print(f"🔄 DEBUG: Создаем заказ для user_id: {user_id}")
 
         # Создаем новый заказ с user_id
-        order_id = menu_manager.create_order(table_number, user_id)
+        order_id = await db.acreate_order(table_number, user_id)
         print(f"✅ DEBUG: Создан заказ #{order_id} для стола {table_number}, admin_id={user_id}")
 
         context.user_data['current_order_id'] = order_id
@@ -166,10 +166,10 @@ async def handle_item_selection(update: Update, context: ContextTypes.DEFAULT_TY
         order_id = context.user_data['current_order_id']
 
         # Добавляем позицию в заказ
-        success = menu_manager.add_item_to_order(order_id, item_name)
+        item = menu_manager.get_item_by_name(item_name)
+        success = bool(item) and await db.aadd_order_item(order_id, item[0], item[1])
 
         if success:
-            item = menu_manager.get_item_by_name(item_name)
             try:
                 await query.edit_message_text(
                     f"✅ Добавлено: {item_name} - {item[1]}₽\n\n"
@@ -265,14 +265,14 @@ async def finish_order(update: Update, context: ContextTypes.DEFAULT_TYPE):
     table_number = context.user_data['table_number']
 
     # Получаем все позиции заказа
-    items = menu_manager.get_order_items(order_id)
-    total = menu_manager.calculate_order_total(order_id)
+    items = await db.aget_order_items(order_id)
+    total = await db.aget_order_total(order_id)
 
     from handlers.order_utils import format_datetime
     message = f"✅ Заказ #{order_id} для стола {table_number} завершен!\n\n"
     message += "📋 Состав заказа:\n"
     for item in items:
-        message += f"• {item[2]} - {item[3]}₽ x {item[4]} = {item[3] * item[4]}₽\n"
+        message += f"• {item.item_name} - {item.price}₽ x {item.quantity} = {item.price * item.quantity}₽\n"
     message += f"\n💰 Общая сумма: {total}₽"
 
     try:
@@ -7,8 +7,9 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from datetime import datetime, timedelta
 from keyboards.menus import PAYMENT_METHOD_NAMES
+from periods import Period
 from handlers.order_utils import (
-    is_admin, message_manager, menu_manager, db, logger, format_datetime,
+    is_admin, message_manager, db, logger, format_datetime,
     group_items_by_category, back_to_admin_main
 )
 
@@ -74,7 +75,7 @@ async def show_shift_history(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
 
     # Получаем ID текущей смены
-    shift = db.get_shift_by_number_and_month(shift_number, month_year)
+    shift = await db.aget_shift_by_number_and_month(shift_number, month_year)
     if not shift:
         try:
             await query.edit_message_text(
@@ -95,10 +96,10 @@ async def show_shift_history(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 )
         return
 
-    shift_id = shift[0]
+    shift_id = shift.id
 
     # Получаем все заказы текущей смены (активные и закрытые)
-    shift_orders = db.get_orders_by_shift_id(shift_id)
+    shift_orders = await db.aget_orders_by_shift_id(shift_id)
 
     if not shift_orders:
         try:
@@ -126,25 +127,31 @@ async def show_shift_history(update: Update, context: ContextTypes.DEFAULT_TYPE)
     closed_orders_count = 0
 
     message = f"📊 Текущая смена #{shift_number} ({month_year})\n\n"
-    message += f"📅 Открыта: {format_datetime(shift[4])}\n"
+    message += f"📅 Открыта: {format_datetime(shift.opened_at)}\n"
     message += f"📋 Всего заказов: {len(shift_orders)}\n\n"
 
     # Получаем сумму списанных бонусов за смену
-    spent_bonuses = db.get_spent_bonuses_by_shift(shift_number, month_year)
+    shift_period = Period.shift(shift.opened_at, shift.closed_at)
+    spent_bonuses = await db.aget_spent_bonuses(shift_period)
 
     # Получаем статистику по оплате за смену
-    payment_stats = db.get_payment_statistics_by_shift(shift_number, month_year)
+    payment_stats = await db.aget_payment_statistics(shift_period)
+
+    # Позиции и суммы всех заказов смены загружаем разом
+    order_ids = [order.id for order in shift_orders]
+    items_by_order = await db.aget_order_items_for_orders(order_ids)
+    totals = await db.aget_order_totals(order_ids)
 
     # Обрабатываем каждый заказ
     for order in shift_orders:
-        order_id = order[0]
-        table_number = order[1]
-        status = order[3]
-        created_at = format_datetime(order[4])
-        closed_at = format_datetime(order[5]) if order[5] else "Еще не закрыт"
-
-        items = menu_manager.get_order_items(order_id)
-        total = menu_manager.calculate_order_total(order_id)
+        order_id = order.id
+        table_number = order.table_number
+        status = order.status
+        created_at = format_datetime(order.created_at)
+        closed_at = format_datetime(order.closed_at) if order.closed_at else "Еще не закрыт"
+
+        items = items_by_order[order_id]
+        total = totals[order_id]
         total_revenue += total
 
         # Считаем статистику по статусам
@@ -165,8 +172,8 @@ async def show_shift_history(update: Update, context: ContextTypes.DEFAULT_TYPE)
         if items:
             message += "🛒 Позиции:\n"
             for item in items:
-                item_total = item[3] * item[4]
-                message += f"  • {item[2]} - {item[3]}₽ x {item[4]} = {item_total}₽\n"
+                item_total = item.price * item.quantity
+                message += f"  • {item.item_name} - {item.price}₽ x {item.quantity} = {item_total}₽\n"
         else:
             message += "🛒 Позиции: нет\n"
 
@@ -254,8 +261,9 @@ async def show_month_history(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await query.answer()
 
     # Получаем статистику за месяц
-    sales_stats = db.get_sales_statistics_by_period('month')
-    total_revenue = db.get_total_revenue_by_period('month')
+    month_period = Period.current('month')
+    sales_stats = await db.aget_sales_statistics(month_period)
+    total_revenue = await db.aget_total_revenue(month_period)
 
     if not sales_stats:
         try:
@@ -282,11 +290,10 @@ async def show_month_history(update: Update, context: ContextTypes.DEFAULT_TYPE)
     total_sales_amount = sum(total_amount for _, _, total_amount in sales_stats)
 
     # Получаем сумму списанных бонусов за текущий месяц
-    current_date = datetime.now()
-    spent_bonuses = db.get_spent_bonuses_by_month(current_date.year, current_date.month)
+    spent_bonuses = await db.aget_spent_bonuses(month_period)
 
     # Получаем статистику по оплате за месяц
-    payment_stats = db.get_payment_statistics_by_period('month')
+    payment_stats = await db.aget_payment_statistics(month_period)
 
     # Группируем позиции по категориям
     categories = group_items_by_category(sales_stats)
@@ -354,7 +361,7 @@ async def show_year_history(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
 
     # ИСПРАВЛЕННЫЙ ВЫЗОВ - через экземпляр db
-    years = db.get_shift_years()
+    years = await db.aget_shift_years()
 
     if not years:
         try:
@@ -410,7 +417,7 @@ async def select_year_for_history(update: Update, context: ContextTypes.DEFAULT_
     context.user_data['selected_year'] = year
 
     # ИСПРАВЛЕННЫЙ ВЫЗОВ - через экземпляр db
-    months = db.get_shift_months(year)
+    months = await db.aget_shift_months(year)
 
     if not months:
         try:
@@ -473,7 +480,8 @@ async def show_full_year_history(update: Update, context: ContextTypes.DEFAULT_T
     context.user_data['selected_year'] = year
 
     # Получаем статистику за весь год
-    sales_stats = db.get_sales_statistics_by_year(year)
+    year_period = Period.year(year)
+    sales_stats = await db.aget_sales_statistics(year_period)
 
     if not sales_stats:
         try:
@@ -490,13 +498,13 @@ async def show_full_year_history(update: Update, context: ContextTypes.DEFAULT_T
                 logger.error(f"Ошибка при показе статистики года: {e}")
         return
 
-    total_revenue = db.get_total_revenue_by_year(year)
+    total_revenue = await db.aget_total_revenue(year_period)
 
     # Получаем сумму списанных бонусов за год
-    spent_bonuses = db.get_spent_bonuses_by_year(year)
+    spent_bonuses = await db.aget_spent_bonuses(year_period)
 
     # Получаем статистику по оплате за год
-    payment_stats = db.get_payment_statistics_by_year(year)
+    payment_stats = await db.aget_payment_statistics(year_period)
 
     # Считаем общую сумму всех продаж
     total_sales_amount = sum(total_amount for _, _, total_amount in sales_stats)
@@ -600,7 +608,7 @@ async def select_month_for_history(update: Update, context: ContextTypes.DEFAULT
     context.user_data['selected_month'] = month
 
     # ИСПРАВЛЕННЫЙ ВЫЗОВ - через экземпляр db
-    shifts = db.get_shifts_by_year_month(year, month)
+    shifts = await db.aget_shifts(Period.month(year, month))
 
     if not shifts:
         try:
@@ -630,19 +638,22 @@ async def select_month_for_history(update: Update, context: ContextTypes.DEFAULT
         [InlineKeyboardButton(f"📊 Весь {month_name} {year}", callback_data=f"history_full_month_{year}_{month}")])
     keyboard.append([InlineKeyboardButton("─" * 20, callback_data="separator")])  # Разделитель
 
+    # Администраторы всех смен загружаются одним запросом
+    admins = await db.aget_users_by_ids([shift.admin_id for shift in shifts])
+
     # ПОКАЗЫВАЕМ ВСЕ СМЕНЫ (не только 10)
     for shift in shifts:
-        shift_number = shift[1]
-        month_year = shift[2]
+        shift_number = shift.shift_number
+        month_year = shift.month_year
 
         # Получаем информацию об администраторе
-        admin_id = shift[3]  # admin_id
-        admin_data = db.get_user_by_id(admin_id)
+        admin_id = shift.admin_id
+        admin_data = admins.get(admin_id)
 
         # Формируем имя администратора
         if admin_data:
-            first_name = admin_data[2] or ""
-            last_name = admin_data[3] or ""
+            first_name = admin_data.first_name or ""
+            last_name = admin_data.last_name or ""
             admin_name = f"{first_name} {last_name}".strip()
             if len(admin_name) > 10:  # Обрезаем длинные имена
                 admin_name = admin_name[:8] + ".."
@@ -651,7 +662,7 @@ async def select_month_for_history(update: Update, context: ContextTypes.DEFAULT
         else:
             admin_name = f"ID:{admin_id}"
 
-        revenue = shift[6] or 0
+        revenue = shift.total_revenue or 0
 
         # ИСПРАВЛЕННЫЙ ФОРМАТ: #{shift_number} | {admin_name} | {revenue}₽
         button_text = f"#{shift_number} | {admin_name} | {revenue}₽"
@@ -698,7 +709,7 @@ async def show_more_shifts(update: Update, context: ContextTypes.DEFAULT_TYPE):
     page = int(parts[5])
 
     # ИСПРАВЛЕННЫЙ ВЫЗОВ - через экземпляр db
-    shifts = db.get_shifts_by_year_month(year, month)
+    shifts = await db.aget_shifts(Period.month(year, month))
 
     if not shifts:
         await query.edit_message_text("📭 Нет смен за выбранный период.")
@@ -718,18 +729,21 @@ async def show_more_shifts(update: Update, context: ContextTypes.DEFAULT_TYPE):
     start_idx = (page - 1) * items_per_page
     end_idx = start_idx + items_per_page
 
-    for shift in shifts[start_idx:end_idx]:
-        shift_number = shift[1]
-        month_year = shift[2]
+    page_shifts = shifts[start_idx:end_idx]
+    admins = await db.aget_users_by_ids([shift.admin_id for shift in page_shifts])
+
+    for shift in page_shifts:
+        shift_number = shift.shift_number
+        month_year = shift.month_year
 
         # Получаем информацию об администраторе
-        admin_id = shift[3]  # admin_id
-        admin_data = db.get_user_by_id(admin_id)
+        admin_id = shift.admin_id
+        admin_data = admins.get(admin_id)
 
         # Формируем имя администратора
         if admin_data:
-            first_name = admin_data[2] or ""
-            last_name = admin_data[3] or ""
+            first_name = admin_data.first_name or ""
+            last_name = admin_data.last_name or ""
             admin_name = f"{first_name} {last_name}".strip()
             if len(admin_name) > 10:  # Обрезаем длинные имена
                 admin_name = admin_name[:8] + ".."
@@ -738,7 +752,7 @@ async def show_more_shifts(update: Update, context: ContextTypes.DEFAULT_TYPE):
         else:
             admin_name = f"ID:{admin_id}"
 
-        revenue = shift[6] or 0
+        revenue = shift.total_revenue or 0
 
         # ИСПРАВЛЕННЫЙ ФОРМАТ: #{shift_number} | {admin_name} | {revenue}₽
         button_text = f"#{shift_number} | {admin_name} | {revenue}₽"
@@ -793,8 +807,9 @@ async def show_full_month_history(update: Update, context: ContextTypes.DEFAULT_
         return
 
     # Получаем статистику за весь месяц
-    sales_stats = db.get_sales_statistics_by_year_month(year, month)
-    total_revenue = db.get_total_revenue_by_year_month(year, month)
+    month_period = Period.month(year, month)
+    sales_stats = await db.aget_sales_statistics(month_period)
+    total_revenue = await db.aget_total_revenue(month_period)
 
     if not sales_stats:
         try:
@@ -818,10 +833,10 @@ async def show_full_month_history(update: Update, context: ContextTypes.DEFAULT_
     month_name = month_names.get(month, month)
 
     # Получаем сумму списанных бонусов за месяц
-    spent_bonuses = db.get_spent_bonuses_by_month(year, month)
+    spent_bonuses = await db.aget_spent_bonuses(month_period)
 
     # Получаем статистику по оплате за месяц
-    payment_stats = db.get_payment_statistics_by_month(year, month)
+    payment_stats = await db.aget_payment_statistics(month_period)
 
     # Считаем общую сумму всех продаж
     total_sales_amount = sum(total_amount for _, _, total_amount in sales_stats)
@@ -901,18 +916,18 @@ async def show_selected_shift_history(update: Update, context: ContextTypes.DEFA
         else:  # Старый формат: history_shift_30 (для обратной совместимости)
             shift_number = int(query.data.replace("history_shift_", ""))
             # Пытаемся найти смену по номеру
-            shift = db.get_shift_by_number(shift_number)
+            shift = await db.aget_shift_by_number(shift_number)
             if not shift:
                 await query.edit_message_text(f"📭 Нет данных по смене #{shift_number}.")
                 return
-            month_year = shift[2]
+            month_year = shift.month_year
     else:
         await query.edit_message_text("❌ Неверный формат данных.")
         return
 
     # Получаем статистику по выбранной смене
-    shift_sales = db.get_shift_sales(shift_number, month_year)
-    shift_info = db.get_shift_by_number_and_month(shift_number, month_year)
+    shift_sales = await db.aget_shift_sales(shift_number, month_year)
+    shift_info = await db.aget_shift_by_number_and_month(shift_number, month_year)
 
     if not shift_sales or not shift_info:
         try:
@@ -936,18 +951,19 @@ async def show_selected_shift_history(update: Update, context: ContextTypes.DEFA
         return
 
     # Получаем информацию об администраторе
-    admin_id = shift_info[3]
-    admin_data = db.get_user_by_id(admin_id)
-    admin_name = f"{admin_data[2]} {admin_data[3]}" if admin_data else f"ID: {admin_id}"
+    admin_id = shift_info.admin_id
+    admin_data = await db.aget_user_by_id(admin_id)
+    admin_name = f"{admin_data.first_name} {admin_data.last_name}" if admin_data else f"ID: {admin_id}"
 
-    total_revenue = shift_info[6] or 0
-    total_orders = shift_info[7] or 0
+    total_revenue = shift_info.total_revenue or 0
+    total_orders = shift_info.total_orders or 0
 
     # Получаем сумму списанных бонусов за смену
-    spent_bonuses = db.get_spent_bonuses_by_shift(shift_number, month_year)
+    shift_period = Period.shift(shift_info.opened_at, shift_info.closed_at)
+    spent_bonuses = await db.aget_spent_bonuses(shift_period)
 
     # Получаем статистику по оплате за смену
-    payment_stats = db.get_payment_statistics_by_shift(shift_number, month_year)
+    payment_stats = await db.aget_payment_statistics(shift_period)
 
     # Считаем общую сумму всех проданных позиций за смену
     total_sales_amount = sum(total_amount for _, _, total_amount in shift_sales)
@@ -957,9 +973,9 @@ async def show_selected_shift_history(update: Update, context: ContextTypes.DEFA
 
     message = f"📊 Статистика за смену #{shift_number} ({month_year})\n\n"
     message += f"👨‍💼 Администратор: {admin_name}\n"
-    message += f"📅 Открыта: {format_datetime(shift_info[4])}\n"
-    if shift_info[5]:
-        message += f"📅 Закрыта: {format_datetime(shift_info[5])}\n"
+    message += f"📅 Открыта: {format_datetime(shift_info.opened_at)}\n"
+    if shift_info.closed_at:
+        message += f"📅 Закрыта: {format_datetime(shift_info.closed_at)}\n"
     message += f"📋 Заказов: {total_orders}\n"
     message += f"💰 Сумма всех продаж: {total_sales_amount}₽\n"
     message += f"🎫 Сумма списанных бонусов: {spent_bonuses}₽\n\n"
@@ -1023,7 +1039,7 @@ async def show_select_shift_menu(update: Update, context: ContextTypes.DEFAULT_T
     await query.answer()
 
     # Получаем список всех закрытых смен
-    shifts = db.get_all_shifts_sorted()
+    shifts = await db.aget_shifts(Period.all())
 
     if not shifts:
         try:
@@ -1046,18 +1062,19 @@ async def show_select_shift_menu(update: Update, context: ContextTypes.DEFAULT_T
         return
 
     keyboard = []
+    admins = await db.aget_users_by_ids([shift.admin_id for shift in shifts[:15]])
     for shift in shifts[:15]:  # Показываем последние 15 смен
-        shift_number = shift[1]
-        month_year = shift[2]
+        shift_number = shift.shift_number
+        month_year = shift.month_year
 
         # Получаем информацию об администраторе
-        admin_id = shift[3]  # admin_id
-        admin_data = db.get_user_by_id(admin_id)
+        admin_id = shift.admin_id
+        admin_data = admins.get(admin_id)
 
         # Формируем имя администратора
         if admin_data:
-            first_name = admin_data[2] or ""
-            last_name = admin_data[3] or ""
+            first_name = admin_data.first_name or ""
+            last_name = admin_data.last_name or ""
             admin_name = f"{first_name} {last_name}".strip()
             if len(admin_name) > 10:  # Обрезаем длинные имена
                 admin_name = admin_name[:8] + ".."
@@ -1066,7 +1083,7 @@ async def show_select_shift_menu(update: Update, context: ContextTypes.DEFAULT_T
         else:
             admin_name = f"ID:{admin_id}"
 
-        revenue = shift[6] or 0
+        revenue = shift.total_revenue or 0
 
         # ИСПРАВЛЕННЫЙ ФОРМАТ: #{shift_number} ({month_year}) | {admin_name} | {revenue}₽
         button_text = f"#{shift_number} ({month_year}) | {admin_name} | {revenue}₽"
@@ -1103,7 +1120,7 @@ async def show_today_orders(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
 
     today = datetime.now().strftime('%Y-%m-%d')
-    orders = db.get_orders_by_date(today, status='closed')
+    orders = await db.aget_orders(Period.day(today), status='closed')
 
     await show_orders_history(update, context, orders, f"за сегодня ({today})")
 
@@ -1114,7 +1131,7 @@ async def show_yesterday_orders(update: Update, context: ContextTypes.DEFAULT_TY
     await query.answer()
 
     yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
-    orders = db.get_orders_by_date(yesterday, status='closed')
+    orders = await db.aget_orders(Period.day(yesterday), status='closed')
 
     await show_orders_history(update, context, orders, f"за вчера ({yesterday})")
 
@@ -1124,7 +1141,7 @@ async def show_all_closed_orders(update: Update, context: ContextTypes.DEFAULT_T
     query = update.callback_query
     await query.answer()
 
-    orders = db.get_all_closed_orders()
+    orders = await db.aget_all_closed_orders()
 
     await show_orders_history(update, context, orders, "все закрытые")
 
@@ -1135,7 +1152,7 @@ async def show_select_date_menu(update: Update, context: ContextTypes.DEFAULT_TY
     await query.answer()
 
     # Получаем список дат, по которым есть закрытые заказы
-    dates = db.get_order_dates()
+    dates = await db.aget_order_dates()
 
     if not dates:
         try:
@@ -1191,7 +1208,7 @@ async def show_orders_by_date(update: Update, context: ContextTypes.DEFAULT_TYPE
     await query.answer()
 
     date = query.data.replace("history_date_", "")
-    orders = db.get_orders_by_date(date, status='closed')
+    orders = await db.aget_orders(Period.day(date), status='closed')
 
     await show_orders_history(update, context, orders, f"за {date}")
 
@@ -1213,33 +1230,39 @@ async def show_orders_history(update: Update, context: ContextTypes.DEFAULT_TYPE
     message = f"📊 История заказов ({period_text})\n\n"
     message += f"📋 Всего заказов: {total_orders}\n"
 
+    # Позиции, суммы и администраторы всех заказов загружаются разом, а не по заказу
+    order_ids = [order.id for order in orders]
+    items_by_order = await db.aget_order_items_for_orders(order_ids)
+    totals = await db.aget_order_totals(order_ids)
+    admins = await db.aget_users_by_ids([order.admin_id for order in orders])
+
     for order in orders:
-        items = menu_manager.get_order_items(order[0])
-        total = menu_manager.calculate_order_total(order[0])
+        items = items_by_order[order.id]
+        total = totals[order.id]
         total_revenue += total
 
         # Получаем информацию об администраторе
         admin_info = "Неизвестный администратор"
-        if order[2]:  # admin_id
-            admin_data = db.get_user_by_id(order[2])
+        if order.admin_id:
+            admin_data = admins.get(order.admin_id)
             if admin_data:
-                admin_info = f"{admin_data[2]} {admin_data[3]} (ID: {admin_data[0]})"
+                admin_info = f"{admin_data.first_name} {admin_data.last_name} (ID: {admin_data.id})"
 
-        message += f"\n🧾 Заказ #{order[0]} | Стол {order[1]}\n"
+        message += f"\n🧾 Заказ #{order.id} | Стол {order.table_number}\n"
         message += f"💰 Сумма: {total}₽\n"
         message += f"👨‍💼 Админ: {admin_info}\n"
-        message += f"📅 Создан: {format_datetime(order[4])}\n"
+        message += f"📅 Создан: {format_datetime(order.created_at)}\n"
 
         # Добавляем время закрытия если заказ закрыт
-        if order[5]:  # closed_at
-            message += f"📅 Закрыт: {format_datetime(order[5])}\n"
+        if order.closed_at:
+            message += f"📅 Закрыт: {format_datetime(order.closed_at)}\n"
 
         # Показываем ВЕСЬ список товаров
         if items:
             message += "🛒 Позиции:\n"
             for item in items:
-                item_total = item[3] * item[4]
-                message += f"  • {item[2]} - {item[3]}₽ x {item[4]} = {item_total}₽\n"
+                item_total = item.price * item.quantity
+                message += f"  • {item.item_name} - {item.price}₽ x {item.quantity} = {item_total}₽\n"
         message += "─" * 30 + "\n"
 
     message += f"\n💰 Общая выручка: {total_revenue}₽"
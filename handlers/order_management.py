@@ -13,7 +13,7 @@ async def show_active_orders(update: Update, context: ContextTypes.DEFAULT_TYPE)
     query = update.callback_query
     await query.answer()
 
-    active_orders = db.get_active_orders()
+    active_orders = await db.aget_active_orders()
 
     if not active_orders:
         try:
@@ -40,42 +40,48 @@ async def show_active_orders(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 )
         return
 
+    # Позиции, суммы и администраторы всех активных заказов загружаются разом
+    order_ids = [order.id for order in active_orders]
+    items_by_order = await db.aget_order_items_for_orders(order_ids)
+    totals = await db.aget_order_totals(order_ids)
+    admins = await db.aget_users_by_ids([order.admin_id for order in active_orders])
+
     for order in active_orders:
-        items = menu_manager.get_order_items(order[0])
-        total = menu_manager.calculate_order_total(order[0])
+        items = items_by_order[order.id]
+        total = totals[order.id]
 
         # ТА ЖЕ ЛОГИКА, ЧТО И В close_shift()
-        admin_id = order[2]  # admin_id из orders таблицы
-        admin_data = db.get_user_by_id(admin_id)  # Ищем по ID в таблице users
+        admin_id = order.admin_id  # admin_id из orders таблицы
+        admin_data = admins.get(admin_id)  # Ищем по ID в таблице users
 
         # Формируем имя администратора как в close_shift()
         if admin_data:
-            first_name = admin_data[2] or ""
-            last_name = admin_data[3] or ""
+            first_name = admin_data.first_name or ""
+            last_name = admin_data.last_name or ""
             admin_name = f"{first_name} {last_name}".strip()
             if not admin_name:
                 admin_name = f"ID: {admin_id}"
         else:
             admin_name = f"ID: {admin_id} (пользователь не найден)"
 
-        message = f"📋 Заказ #{order[0]} | Стол {order[1]}\n"
+        message = f"📋 Заказ #{order.id} | Стол {order.table_number}\n"
         message += f"👨‍💼 Админ: {admin_name}\n"
         message += f"💰 Сумма: {total}₽\n"
-        message += f"📅 Создан: {format_datetime(order[4])}\n"
+        message += f"📅 Создан: {format_datetime(order.created_at)}\n"
 
         # Добавляем информацию о позициях если они есть
         if items:
             message += "\n🛒 Позиции:\n"
             for item in items[:3]:  # Показываем первые 3 позиции
-                message += f"• {item[2]} x{item[4]}\n"
+                message += f"• {item.item_name} x{item.quantity}\n"
             if len(items) > 3:
                 message += f"• ... и еще {len(items) - 3} позиций\n"
 
         # Кнопки для управления заказом
         keyboard = [
-            [InlineKeyboardButton("➕ Добавить позиции", callback_data=f"add_items_{order[0]}")],
-            [InlineKeyboardButton("👀 Просмотреть детали", callback_data=f"view_order_{order[0]}")],
-            [InlineKeyboardButton("💰 Рассчитать", callback_data=f"calculate_{order[0]}")]
+            [InlineKeyboardButton("➕ Добавить позиции", callback_data=f"add_items_{order.id}")],
+            [InlineKeyboardButton("👀 Просмотреть детали", callback_data=f"view_order_{order.id}")],
+            [InlineKeyboardButton("💰 Рассчитать", callback_data=f"calculate_{order.id}")]
         ]
 
         await message_manager.send_message(
@@ -105,11 +111,11 @@ async def add_items_to_existing_order(update: Update, context: ContextTypes.DEFA
     order_id = int(query.data.replace("add_to_existing_", ""))
     context.user_data['current_order_id'] = order_id
 
-    order = db.get_order_by_id(order_id)
-    context.user_data['table_number'] = order[1]
+    order = await db.aget_order_by_id(order_id)
+    context.user_data['table_number'] = order.table_number
 
     await query.edit_message_text(
-        f"✅ Добавление к заказу #{order_id} для стола {order[1]}\n\n"
+        f"✅ Добавление к заказу #{order_id} для стола {order.table_number}\n\n"
         f"Выберите категорию меню:",
         reply_markup=menu_manager.get_category_keyboard()
     )
@@ -135,16 +141,16 @@ async def show_order_for_editing(update: Update, context: ContextTypes.DEFAULT_T
         await query.edit_message_text("❌ Ошибка: неизвестная команда.")
         return
 
-    order = db.get_order_by_id(order_id)
+    order = await db.aget_order_by_id(order_id)
     if not order:
         await query.edit_message_text("❌ Заказ не найден.")
         return
 
-    items = menu_manager.get_order_items(order_id)
-    total = menu_manager.calculate_order_total(order_id)
+    items = await db.aget_order_items(order_id)
+    total = await db.aget_order_total(order_id)
 
     message = f"✏️ Редактирование заказа #{order_id}\n"
-    message += f"🍽️ Стол: {order[1]}\n"
+    message += f"🍽️ Стол: {order.table_number}\n"
     message += f"💰 Текущая сумма: {total}₽\n\n"
 
     if not items:
@@ -154,10 +160,10 @@ async def show_order_for_editing(update: Update, context: ContextTypes.DEFAULT_T
 
     keyboard = []
     for item in items:
-        item_total = item[3] * item[4]
+        item_total = item.price * item.quantity
         keyboard.append([InlineKeyboardButton(
-            f"❌ {item[2]} - {item[3]}₽ x {item[4]} = {item_total}₽",
-            callback_data=f"remove_item_{order_id}_{item[2].replace(' ', '_')}"  # Заменяем пробелы на подчеркивания
+            f"❌ {item.item_name} - {item.price}₽ x {item.quantity} = {item_total}₽",
+            callback_data=f"remove_item_{order_id}_{item.item_name.replace(' ', '_')}"  # Заменяем пробелы на подчеркивания
         )])
 
     keyboard.append([InlineKeyboardButton("➕ Добавить позиции", callback_data=f"add_items_{order_id}")])
@@ -197,7 +203,7 @@ async def remove_item_from_order(update: Update, context: ContextTypes.DEFAULT_T
     item_name = item_name.replace('_', ' ')
 
     # Удаляем позицию
-    success, message = menu_manager.remove_item_from_order(order_id, item_name)
+    success, message = await db.aremove_item_from_order(order_id, item_name)
 
     if success:
         # Показываем обновленный заказ
@@ -217,19 +223,19 @@ async def view_order_details(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await query.answer()
 
     order_id = int(query.data.replace("view_order_", ""))
-    order = db.get_order_by_id(order_id)
-    items = menu_manager.get_order_items(order_id)
-    total = menu_manager.calculate_order_total(order_id)
+    order = await db.aget_order_by_id(order_id)
+    items = await db.aget_order_items(order_id)
+    total = await db.aget_order_total(order_id)
 
     message = f"📋 Детали заказа #{order_id}\n"
-    message += f"🍽️ Стол: {order[1]}\n"
-    message += f"📅 Создан: {format_datetime(order[4])}\n"
-    message += f"📊 Статус: {order[3]}\n\n"
+    message += f"🍽️ Стол: {order.table_number}\n"
+    message += f"📅 Создан: {format_datetime(order.created_at)}\n"
+    message += f"📊 Статус: {order.status}\n\n"
     message += "🛒 Позиции:\n"
 
     for item in items:
-        item_total = item[3] * item[4]
-        message += f"• {item[2]} - {item[3]}₽ x {item[4]} = {item_total}₽\n"
+        item_total = item.price * item.quantity
+        message += f"• {item.item_name} - {item.price}₽ x {item.quantity} = {item_total}₽\n"
 
     message += f"\n💰 Общая сумма: {total}₽"
 
@@ -267,11 +273,11 @@ async def handle_add_items(update: Update, context: ContextTypes.DEFAULT_TYPE):
     order_id = int(query.data.replace("add_items_", ""))
     context.user_data['current_order_id'] = order_id
 
-    order = db.get_order_by_id(order_id)
-    context.user_data['table_number'] = order[1]
+    order = await db.aget_order_by_id(order_id)
+    context.user_data['table_number'] = order.table_number
 
     await query.edit_message_text(
-        f"✅ Добавление позиций к заказу #{order_id} для стола {order[1]}\n\n"
+        f"✅ Добавление позиций к заказу #{order_id} для стола {order.table_number}\n\n"
         f"Выберите категорию меню:",
         reply_markup=menu_manager.get_category_keyboard()
     )
\ No newline at end of file
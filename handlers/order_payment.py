@@ -6,7 +6,7 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from keyboards.menus import PAYMENT_METHOD_NAMES
-from handlers.order_utils import is_admin, message_manager, menu_manager, db, logger, format_datetime
+from handlers.order_utils import is_admin, message_manager, db, logger, format_datetime
 
 
 async def show_active_orders_for_calculation(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -14,18 +14,19 @@ async def show_active_orders_for_calculation(update: Update, context: ContextTyp
     query = update.callback_query
     await query.answer()
 
-    active_orders = db.get_active_orders()
+    active_orders = await db.aget_active_orders()
 
     if not active_orders:
         await query.edit_message_text("📭 Активных заказов для расчета нет.")
         return
 
     keyboard = []
+    totals = await db.aget_order_totals([order.id for order in active_orders])
     for order in active_orders:
-        total = menu_manager.calculate_order_total(order[0])
+        total = totals[order.id]
         keyboard.append([InlineKeyboardButton(
-            f"Стол {order[1]} - {total}₽ (Заказ #{order[0]})",
-            callback_data=f"calculate_{order[0]}"
+            f"Стол {order.table_number} - {total}₽ (Заказ #{order.id})",
+            callback_data=f"calculate_{order.id}"
         )])
 
     keyboard.append([InlineKeyboardButton("💰 Рассчитать все", callback_data="calculate_all_orders")])
@@ -48,27 +49,27 @@ async def show_payment_selection(update: Update, context: ContextTypes.DEFAULT_T
         await query.edit_message_text("❌ Неверный ID заказа.")
         return
 
-    order = db.get_order_by_id(order_id)
+    order = await db.aget_order_by_id(order_id)
     if not order:
         await query.edit_message_text("❌ Заказ не найден.")
         return
 
-    items = menu_manager.get_order_items(order_id)
-    total = menu_manager.calculate_order_total(order_id)
+    items = await db.aget_order_items(order_id)
+    total = await db.aget_order_total(order_id)
 
     if not items:
         await query.edit_message_text("❌ В заказе нет позиций.")
         return
 
     # Формируем чек
-    message = f"🧾 Чек для стола {order[1]}\n"
+    message = f"🧾 Чек для стола {order.table_number}\n"
     message += f"🆔 Заказ #{order_id}\n"
-    message += f"📅 Время: {format_datetime(order[4])}\n\n"
+    message += f"📅 Время: {format_datetime(order.created_at)}\n\n"
     message += "📋 Позиции:\n"
 
     for item in items:
-        item_total = item[3] * item[4]
-        message += f"• {item[2]} - {item[3]}₽ x {item[4]} = {item_total}₽\n"
+        item_total = item.price * item.quantity
+        message += f"• {item.item_name} - {item.price}₽ x {item.quantity} = {item_total}₽\n"
 
     message += f"\n💰 Итого: {total}₽\n"
     message += f"💵 К оплате: {total}₽\n\n"
@@ -96,17 +97,17 @@ async def handle_payment_selection(update: Update, context: ContextTypes.DEFAULT
     order_id = int(parts[2])
 
     # Обновляем метод оплаты в базе данных
-    db.update_order_payment_method(order_id, payment_method)
+    await db.aupdate_order_payment_method(order_id, payment_method)
 
     # Закрываем заказ
-    menu_manager.close_order(order_id)
+    await db.aclose_order(order_id)
 
     # Показываем финальное сообщение
-    order = db.get_order_by_id(order_id)
-    total = menu_manager.calculate_order_total(order_id)
+    order = await db.aget_order_by_id(order_id)
+    total = await db.aget_order_total(order_id)
 
     message = f"✅ Заказ #{order_id} закрыт!\n"
-    message += f"🍽️ Стол: {order[1]}\n"
+    message += f"🍽️ Стол: {order.table_number}\n"
     message += f"💰 Сумма: {total}₽\n"
     message += f"💳 Способ оплаты: {PAYMENT_METHOD_NAMES.get(payment_method, payment_method)}\n"
     message += f"📅 Время: {format_datetime(db.get_moscow_time())}\n\n"
@@ -135,14 +136,15 @@ async def handle_back_to_calculation(update: Update, context: ContextTypes.DEFAU
     order_id = int(query.data.replace("back_to_calculation_", ""))
 
     # Показываем активные заказы с расчетом
-    active_orders = db.get_active_orders()
+    active_orders = await db.aget_active_orders()
 
     keyboard = []
+    totals = await db.aget_order_totals([order.id for order in active_orders])
     for order in active_orders:
-        total = menu_manager.calculate_order_total(order[0])
+        total = totals[order.id]
         keyboard.append([InlineKeyboardButton(
-            f"Стол {order[1]} - {total}₽ (Заказ #{order[0]})",
-            callback_data=f"calculate_{order[0]}"
+            f"Стол {order.table_number} - {total}₽ (Заказ #{order.id})",
+            callback_data=f"calculate_{order.id}"
         )])
 
     keyboard.append([InlineKeyboardButton("❌ Отмена", callback_data="active_orders")])
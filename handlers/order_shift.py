@@ -7,10 +7,9 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from config import ADMIN_IDS
 from message_manager import message_manager
-from menu_manager import menu_manager
-from database import Database
 import logging
 from datetime import datetime
+from progress import ProgressReporter
 from handlers.order_utils import is_admin, format_datetime, db, logger
 
 # СИСТЕМА УПРАВЛЕНИЯ СМЕНОЙ
@@ -23,15 +22,15 @@ async def open_shift(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # Находим user_id по telegram_id
-    user_data = db.get_user(query.from_user.id)
+    user_data = await db.aget_user(query.from_user.id)
     if not user_data:
         await query.edit_message_text("❌ Пользователь не найден в базе данных.")
         return
 
-    user_id = user_data[0]  # id из таблицы users
+    user_id = user_data.id  # id из таблицы users
 
     # Проверяем, не открыта ли уже смена
-    active_orders = db.get_active_orders()
+    active_orders = await db.aget_active_orders()
     if active_orders:
         try:
             await query.edit_message_text(
@@ -58,7 +57,7 @@ async def open_shift(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Создаем новую смену в базе данных с текущим месяцем
     current_month = datetime.now().strftime('%Y-%m')
-    shift_number = db.create_shift(user_id, current_month)  # Используем user_id, а не telegram_id
+    shift_number = await db.acreate_shift(user_id, current_month)  # Используем user_id, а не telegram_id
 
     # Сохраняем в context для текущей сессии
     context.bot_data['shift_open'] = True
@@ -113,7 +112,7 @@ async def close_shift(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # Проверяем, есть ли активные заказы
-    active_orders = db.get_active_orders()
+    active_orders = await db.aget_active_orders()
     if active_orders:
         try:
             await query.edit_message_text(
@@ -157,75 +156,52 @@ async def close_shift(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # Получаем ID текущей смены
-    shift = db.get_shift_by_number_and_month(shift_number, month_year)
+    shift = await db.aget_shift_by_number_and_month(shift_number, month_year)
     if not shift:
         await query.edit_message_text("❌ Смена не найдена в базе данных.")
         return
 
-    shift_id = shift[0]
-
     # Получаем информацию об администраторе
-    admin_id = shift[3]  # shift[3] = admin_id
-    admin_data = db.get_user_by_id(admin_id)
+    admin_id = shift.admin_id  # shift.admin_id = admin_id
+    admin_data = await db.aget_user_by_id(admin_id)
 
     # Формируем имя администратора
     if admin_data:
-        first_name = admin_data[2] or ""
-        last_name = admin_data[3] or ""
+        first_name = admin_data.first_name or ""
+        last_name = admin_data.last_name or ""
         admin_name = f"{first_name} {last_name}".strip()
         if not admin_name:
             admin_name = f"ID: {admin_id}"
     else:
         admin_name = f"ID: {admin_id} (пользователь не найден)"
 
-    # Получаем заказы за смену
-    shift_orders = db.get_orders_by_shift_id(shift_id)
-
-    # Правильно считаем общую сумму всех продаж
-    total_sales_amount = 0
-    sales_data = {}
-
-    for order in shift_orders:
-        items = menu_manager.get_order_items(order[0])
-        for item in items:
-            item_name = item[2]
-            quantity = item[4]
-            price = item[3]
-            item_total_amount = price * quantity
-
-            # Суммируем общую сумму продаж
-            total_sales_amount += item_total_amount
-
-            if item_name not in sales_data:
-                sales_data[item_name] = {'quantity': 0, 'total_amount': 0}
-
-            sales_data[item_name]['quantity'] += quantity
-            sales_data[item_name]['total_amount'] += item_total_amount
+    # Продажи, итоги и статус смены считаются и сохраняются в базе одной транзакцией
+    summary = await db.aclose_shift(shift_number, month_year)
+    if not summary:
+        await query.edit_message_text("❌ Смена не найдена в базе данных.")
+        return
 
-    # Сохраняем статистику в базу
-    db.close_shift(shift_number, month_year, total_sales_amount, len(shift_orders))
-    db.save_shift_sales(shift_number, month_year, sales_data)
+    total_sales_amount = summary['total_revenue']
 
     # Закрываем смену в context
     context.bot_data['shift_open'] = False
-    context.bot_data['shift_closed_at'] = db.get_moscow_time()
+    context.bot_data['shift_closed_at'] = summary['closed_at']
 
     # Формируем сообщение со статистикой - ДОБАВЛЕНО ИМЯ АДМИНИСТРАТОРА
     message = (
         f"🔒 Смена #{shift_number} ({month_year}) закрыта!\n\n"
         f"👨‍💼 Администратор: {admin_name}\n"
-        f"📅 Открыта: {format_datetime(shift[4])}\n"  # shift[4] = opened_at
+        f"📅 Открыта: {format_datetime(shift.opened_at)}\n"  # shift.opened_at = opened_at
         f"📅 Закрыта: {format_datetime(context.bot_data['shift_closed_at'])}\n"
         f"💰 Сумма всех продаж: {total_sales_amount}₽\n"
-        f"📋 Количество заказов: {len(shift_orders)}\n\n"
+        f"📋 Количество заказов: {summary['total_orders']}\n\n"
     )
 
     # Добавляем все проданные позиции
-    if sales_data:
+    if summary['sales']:
         message += "📈 Продажи по позициям:\n"
-        sorted_sales = sorted(sales_data.items(), key=lambda x: x[1]['total_amount'], reverse=True)
-        for i, (item_name, data) in enumerate(sorted_sales, 1):
-            message += f"{i}. {item_name}: {data['quantity']} шт. - {data['total_amount']}₽\n"
+        for i, (item_name, quantity, total_amount) in enumerate(summary['sales'], 1):
+            message += f"{i}. {item_name}: {quantity} шт. - {total_amount}₽\n"
 
     message += "\nСпасибо за работу! 🏮"
 
@@ -260,7 +236,7 @@ async def calculate_all_orders(update: Update, context: ContextTypes.DEFAULT_TYP
     if not is_admin(query.from_user.id):
         return
 
-    active_orders = db.get_active_orders()
+    active_orders = await db.aget_active_orders()
     if not active_orders:
         await query.edit_message_text("📭 Нет активных заказов для расчета.")
         return
@@ -274,35 +250,33 @@ async def calculate_all_orders(update: Update, context: ContextTypes.DEFAULT_TYP
         reply_markup=None
     )
 
+    # Позиции и суммы всех заказов загружаются разом
+    order_ids = [order.id for order in active_orders]
+    items_by_order = await db.aget_order_items_for_orders(order_ids)
+    totals = await db.aget_order_totals(order_ids)
+
+    # Ход расчета показывается в том же сообщении не чаще раза в несколько секунд
+    progress = ProgressReporter(query.edit_message_text, len(active_orders), "Расчет заказов")
+
     # Рассчитываем каждый заказ
     for order in active_orders:
-        order_id = order[0]
-        items = menu_manager.get_order_items(order_id)
+        order_id = order.id
+        items = items_by_order[order_id]
 
         if items and len(items) > 0:  # Проверяем что есть позиции
             try:
-                total = menu_manager.calculate_order_total(order_id)
+                total = totals[order_id]
                 total_revenue += total
 
                 # Закрываем заказ напрямую через базу
-                cursor = db.conn.cursor()
-                cursor.execute('''
-                    UPDATE orders SET status = 'closed', closed_at = ? WHERE id = ?
-                ''', (db.get_moscow_time(), order_id))
-                db.conn.commit()
+                await db.aclose_order(order_id)
 
                 calculated_count += 1
 
-                # Показываем прогресс
-                if calculated_count % 3 == 0:  # Обновляем каждые 3 заказа
-                    await query.edit_message_text(
-                        f"🔄 Рассчитано {calculated_count}/{len(active_orders)} заказов...",
-                        reply_markup=None
-                    )
-
             except Exception as e:
                 logger.error(f"Ошибка при расчете заказа {order_id}: {e}")
-                continue
+
+        await progress.advance(details=f"💰 Выручка: {total_revenue}₽")
 
     # Финальное сообщение
     if calculated_count > 0:
@@ -314,7 +288,7 @@ async def calculate_all_orders(update: Update, context: ContextTypes.DEFAULT_TYP
             f"💰 Общая выручка: {total_revenue}₽\n\n"
         )
 
-        remaining_orders = db.get_active_orders()
+        remaining_orders = await db.aget_active_orders()
         if remaining_orders:
             message += f"⚠️ Осталось активных заказов: {len(remaining_orders)}\n\n"
             keyboard = [
@@ -329,9 +303,14 @@ async def calculate_all_orders(update: Update, context: ContextTypes.DEFAULT_TYP
                 [InlineKeyboardButton("⬅️ Назад", callback_data="back_to_order_management")]
             ]
 
-        await query.edit_message_text(
-            message,
-            reply_markup=InlineKeyboardMarkup(keyboard)
+        await progress.finish(message, reply_markup=InlineKeyboardMarkup(keyboard))
+    else:
+        await progress.finish(
+            "❌ Не удалось рассчитать ни одного заказа.",
+            reply_markup=InlineKeyboardMarkup([
+                [InlineKeyboardButton("📋 Активные заказы", callback_data="active_orders")],
+                [InlineKeyboardButton("⬅️ Назад", callback_data="back_to_order_management")]
+            ])
         )
 
 
@@ -344,7 +323,7 @@ async def show_shift_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     shift_open = context.bot_data.get('shift_open', False)
-    active_orders = db.get_active_orders()
+    active_orders = await db.aget_active_orders()
 
     if shift_open:
         shift_number = context.bot_data.get('shift_number', 'Неизвестно')
@@ -400,7 +379,7 @@ async def start_order_management(update: Update, context: ContextTypes.DEFAULT_T
     await message_manager.cleanup_user_messages(context, update.effective_user.id)
 
     shift_open = context.bot_data.get('shift_open', False)
-    active_orders = db.get_active_orders()
+    active_orders = await db.aget_active_orders()
 
     if update.callback_query:
         query = update.callback_query
@@ -8,7 +8,7 @@ from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, filt
 from config import ADMIN_IDS
 from message_manager import message_manager
 from menu_manager import menu_manager
-from database import Database
+from database import get_db
 import logging
 from datetime import datetime, timedelta
 from keyboards.menus import PAYMENT_METHOD_NAMES
@@ -16,7 +16,7 @@ from keyboards.menus import PAYMENT_METHOD_NAMES
 logger = logging.getLogger(__name__)
 
 # Убедитесь, что db инициализирован правильно
-db = Database()
+db = get_db()
 
 # Состояния для управления заказами (теперь не используются в ConversationHandler)
 AWAITING_TABLE_NUMBER, SELECTING_CATEGORY, SELECTING_ITEMS, SELECTING_DATE_FOR_HISTORY = range(4)
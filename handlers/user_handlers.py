@@ -3,7 +3,7 @@ from telegram.ext import (
     ContextTypes, ConversationHandler, MessageHandler,
     filters, CommandHandler, CallbackQueryHandler
 )
-from database import Database
+from database import get_db
 from keyboards.menus import (
     get_user_main_menu, get_phone_keyboard, get_confirmation_keyboard,
     get_spend_bonus_keyboard, get_cancel_keyboard, get_user_booking_filter_menu,
@@ -17,7 +17,7 @@ import asyncio
 
 logger = logging.getLogger(__name__)
 
-db = Database()
+db = get_db()
 
 # Состояния для регистрации
 FIRST_NAME, LAST_NAME, PHONE, CONFIRMATION = range(4)
@@ -32,7 +32,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await message_manager.cleanup_user_messages(context, update.effective_user.id)
 
     user = update.effective_user
-    user_data = db.get_user(user.id)
+    user_data = await db.aget_user(user.id)
 
     if user_data:
         # Показываем разное меню для админов и обычных пользователей
@@ -40,14 +40,14 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             from keyboards.menus import get_admin_main_menu
             await message_manager.send_message(
                 update, context,
-                f"Добро пожаловать обратно, {user_data[2]}! 🎉",
+                f"Добро пожаловать обратно, {user_data.first_name}! 🎉",
                 reply_markup=get_admin_main_menu(),
                 is_temporary=False
             )
         else:
             await message_manager.send_message(
                 update, context,
-                f"Добро пожаловать обратно, {user_data[2]}! 🎉",
+                f"Добро пожаловать обратно, {user_data.first_name}! 🎉",
                 reply_markup=get_user_main_menu(),
                 is_temporary=False
             )
@@ -59,7 +59,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             try:
                 referred_by = int(context.args[0])
                 # Проверяем существование реферера
-                referrer_data = db.get_user_by_id(referred_by)
+                referrer_data = await db.aget_user_by_id(referred_by)
                 if not referrer_data:
                     referred_by = None
             except ValueError:
@@ -152,7 +152,7 @@ async def confirm_registration(update: Update, context: ContextTypes.DEFAULT_TYP
     user_data = context.user_data
     user = update.effective_user
 
-    user_id = db.add_user(
+    user_id = await db.aadd_user(
         user.id,
         user_data['first_name'],
         user_data['last_name'],
@@ -161,16 +161,16 @@ async def confirm_registration(update: Update, context: ContextTypes.DEFAULT_TYP
     )
 
     if user_id:
-        db.add_transaction(user_id, 100, 'earn', 'Приветственные бонусы')
+        await db.aadd_transaction(user_id, 100, 'earn', 'Приветственные бонусы')
 
         # Начисляем реферальный бонус если есть
-        referrer_id, bonus_amount = db.award_referral_bonus(user_id)
+        referrer_id, bonus_amount = await db.aaward_referral_bonus(user_id)
 
         success_message = "🎉 Благодарим за регистрацию! Вам начислено 100 бонусных баллов.\n\n"
 
         if referrer_id:
-            referrer_data = db.get_user_by_id(referrer_id)
-            success_message += f"🎁 Вы зарегистрировались по приглашению {referrer_data[2]} {referrer_data[3]}! "
+            referrer_data = await db.aget_user_by_id(referrer_id)
+            success_message += f"🎁 Вы зарегистрировались по приглашению {referrer_data.first_name} {referrer_data.last_name}! "
             success_message += f"Ваш друг получил {bonus_amount} бонусных баллов.\n\n"
 
         success_message += f"Ваш ID: {user_id}\n\n"
@@ -245,17 +245,17 @@ async def show_balance(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await message_manager.cleanup_user_messages(context, update.effective_user.id)
 
     user = update.effective_user
-    user_data = db.get_user(user.id)
+    user_data = await db.aget_user(user.id)
 
     if user_data:
         # Получаем статистику рефералов
-        referral_stats = db.get_referrer_stats(user_data[0])
+        referral_stats = await db.aget_referrer_stats(user_data.id)
         total_referrals = referral_stats[0] if referral_stats else 0
         awarded_referrals = referral_stats[1] if referral_stats else 0
 
         message = (
-            f"💰 Ваш баланс: {user_data[5]} бонусных баллов\n"
-            f"👤 Ваш ID: {user_data[0]}\n"
+            f"💰 Ваш баланс: {user_data.bonus_balance} бонусных баллов\n"
+            f"👤 Ваш ID: {user_data.id}\n"
         )
 
         if total_referrals > 0:
@@ -282,7 +282,7 @@ async def show_referral_info(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await message_manager.cleanup_user_messages(context, update.effective_user.id)
 
     user = update.effective_user
-    user_data = db.get_user(user.id)
+    user_data = await db.aget_user(user.id)
 
     if not user_data:
         await message_manager.send_message(
@@ -292,7 +292,7 @@ async def show_referral_info(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
         return
 
-    referral_stats = db.get_referrer_stats(user_data[0])
+    referral_stats = await db.aget_referrer_stats(user_data.id)
     total_referrals = referral_stats[0] if referral_stats else 0
     awarded_referrals = referral_stats[1] if referral_stats else 0
 
@@ -303,10 +303,10 @@ async def show_referral_info(update: Update, context: ContextTypes.DEFAULT_TYPE)
     # Получаем username бота для создания ссылки
     try:
         bot_username = (await context.bot.get_me()).username
-        referral_link = f"https://t.me/{bot_username}?start={user_data[0]}"
+        referral_link = f"https://t.me/{bot_username}?start={user_data.id}"
     except Exception as e:
         logger.error(f"Ошибка при получении username бота: {e}")
-        referral_link = f"Используйте команду: /start {user_data[0]}"
+        referral_link = f"Используйте команду: /start {user_data.id}"
 
     message = (
         f"🎁 Реферальная программа\n\n"
@@ -334,7 +334,7 @@ async def show_user_bookings(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await message_manager.cleanup_user_messages(context, update.effective_user.id)
 
     user = update.effective_user
-    user_data = db.get_user(user.id)
+    user_data = await db.aget_user(user.id)
 
     if not user_data:
         await message_manager.send_message(
@@ -345,13 +345,13 @@ async def show_user_bookings(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
 
     # Получаем статистику бронирований пользователя
-    all_bookings = db.get_user_bookings(user_data[0])
-    pending_count = len([b for b in all_bookings if b[5] == 'pending'])
-    confirmed_count = len([b for b in all_bookings if b[5] == 'confirmed'])
-    cancelled_count = len([b for b in all_bookings if b[5] == 'cancelled'])
+    all_bookings = await db.aget_user_bookings(user_data.id)
+    pending_count = len([b for b in all_bookings if b.status == 'pending'])
+    confirmed_count = len([b for b in all_bookings if b.status == 'confirmed'])
+    cancelled_count = len([b for b in all_bookings if b.status == 'cancelled'])
 
     # ОТЛАДОЧНАЯ ИНФОРМАЦИЯ
-    logger.info(f"👤 Пользователь {user_data[0]} открыл фильтрацию бронирований")
+    logger.info(f"👤 Пользователь {user_data.id} открыл фильтрацию бронирований")
     logger.info(
         f"📊 Статистика: ожидающие={pending_count}, подтвержденные={confirmed_count}, отмененные={cancelled_count}")
 
@@ -378,7 +378,7 @@ async def show_user_pending_bookings(update: Update, context: ContextTypes.DEFAU
     await message_manager.cleanup_user_messages(context, update.effective_user.id)
 
     user = update.effective_user
-    user_data = db.get_user(user.id)
+    user_data = await db.aget_user(user.id)
 
     if not user_data:
         await message_manager.send_message(
@@ -388,8 +388,8 @@ async def show_user_pending_bookings(update: Update, context: ContextTypes.DEFAU
         )
         return
 
-    bookings = db.get_user_bookings(user_data[0])
-    pending_bookings = [b for b in bookings if b[5] == 'pending']
+    bookings = await db.aget_user_bookings(user_data.id)
+    pending_bookings = [b for b in bookings if b.status == 'pending']
 
     if not pending_bookings:
         await message_manager.send_message(
@@ -412,7 +412,7 @@ async def show_user_pending_bookings(update: Update, context: ContextTypes.DEFAU
         await message_manager.send_message(
             update, context,
             message,
-            reply_markup=get_user_booking_cancel_keyboard(booking[0]),
+            reply_markup=get_user_booking_cancel_keyboard(booking.id),
             is_temporary=False
         )
 
@@ -422,7 +422,7 @@ async def show_user_confirmed_bookings(update: Update, context: ContextTypes.DEF
     await message_manager.cleanup_user_messages(context, update.effective_user.id)
 
     user = update.effective_user
-    user_data = db.get_user(user.id)
+    user_data = await db.aget_user(user.id)
 
     if not user_data:
         await message_manager.send_message(
@@ -432,8 +432,8 @@ async def show_user_confirmed_bookings(update: Update, context: ContextTypes.DEF
         )
         return
 
-    bookings = db.get_user_bookings(user_data[0])
-    confirmed_bookings = [b for b in bookings if b[5] == 'confirmed']
+    bookings = await db.aget_user_bookings(user_data.id)
+    confirmed_bookings = [b for b in bookings if b.status == 'confirmed']
 
     if not confirmed_bookings:
         await message_manager.send_message(
@@ -456,7 +456,7 @@ async def show_user_confirmed_bookings(update: Update, context: ContextTypes.DEF
         await message_manager.send_message(
             update, context,
             message,
-            reply_markup=get_user_booking_cancel_keyboard(booking[0]),
+            reply_markup=get_user_booking_cancel_keyboard(booking.id),
             is_temporary=False
         )
 
@@ -466,7 +466,7 @@ async def show_user_cancelled_bookings(update: Update, context: ContextTypes.DEF
     await message_manager.cleanup_user_messages(context, update.effective_user.id)
 
     user = update.effective_user
-    user_data = db.get_user(user.id)
+    user_data = await db.aget_user(user.id)
 
     if not user_data:
         await message_manager.send_message(
@@ -476,8 +476,8 @@ async def show_user_cancelled_bookings(update: Update, context: ContextTypes.DEF
         )
         return
 
-    bookings = db.get_user_bookings(user_data[0])
-    cancelled_bookings = [b for b in bookings if b[5] == 'cancelled']
+    bookings = await db.aget_user_bookings(user_data.id)
+    cancelled_bookings = [b for b in bookings if b.status == 'cancelled']
 
     if not cancelled_bookings:
         await message_manager.send_message(
@@ -509,7 +509,7 @@ async def show_user_all_bookings(update: Update, context: ContextTypes.DEFAULT_T
     await message_manager.cleanup_user_messages(context, update.effective_user.id)
 
     user = update.effective_user
-    user_data = db.get_user(user.id)
+    user_data = await db.aget_user(user.id)
 
     if not user_data:
         await message_manager.send_message(
@@ -519,7 +519,7 @@ async def show_user_all_bookings(update: Update, context: ContextTypes.DEFAULT_T
         )
         return
 
-    bookings = db.get_user_bookings(user_data[0])
+    bookings = await db.aget_user_bookings(user_data.id)
 
     if not bookings:
         await message_manager.send_message(
@@ -541,11 +541,11 @@ async def show_user_all_bookings(update: Update, context: ContextTypes.DEFAULT_T
         message = _format_user_booking_message(booking)
 
         # Для активных бронирований показываем кнопку отмены
-        if booking[5] in ['pending', 'confirmed']:
+        if booking.status in ['pending', 'confirmed']:
             await message_manager.send_message(
                 update, context,
                 message,
-                reply_markup=get_user_booking_cancel_keyboard(booking[0]),
+                reply_markup=get_user_booking_cancel_keyboard(booking.id),
                 is_temporary=False
             )
         else:
@@ -571,12 +571,12 @@ def _format_user_booking_message(booking):
     }
 
     return (
-        f"{status_emoji.get(booking[5], '📅')} Бронирование #{booking[0]}\n"
-        f"📅 Дата: {booking[2]}\n"
-        f"⏰ Время: {booking[3]}\n"
-        f"👥 Гостей: {booking[4]}\n"
-        f"📊 Статус: {status_text.get(booking[5], booking[5])}\n"
-        f"🆔 ID брони: {booking[0]}"
+        f"{status_emoji.get(booking.status, '📅')} Бронирование #{booking.id}\n"
+        f"📅 Дата: {booking.booking_date}\n"
+        f"⏰ Время: {booking.booking_time}\n"
+        f"👥 Гостей: {booking.guests}\n"
+        f"📊 Статус: {status_text.get(booking.status, booking.status)}\n"
+        f"🆔 ID брони: {booking.id}"
     )
 
 
@@ -587,7 +587,7 @@ async def handle_user_cancel_booking(update: Update, context: ContextTypes.DEFAU
     await query.answer()
 
     user = update.effective_user
-    user_data = db.get_user(user.id)
+    user_data = await db.aget_user(user.id)
 
     if not user_data:
         await query.edit_message_text("❌ Вы не зарегистрированы.")
@@ -597,37 +597,29 @@ async def handle_user_cancel_booking(update: Update, context: ContextTypes.DEFAU
     booking_id = int(query.data.split('_')[-1])
 
     # Находим бронирование
-    cursor = db.conn.cursor()
-    cursor.execute('''
-        SELECT b.*, u.first_name, u.last_name, u.telegram_id
-        FROM bookings b 
-        JOIN users u ON b.user_id = u.id 
-        WHERE b.id = ? AND u.id = ?
-    ''', (booking_id, user_data[0]))
-    booking = cursor.fetchone()
+    booking = await db.aget_booking_with_user(booking_id, user_data.id)
 
     if not booking:
         await query.edit_message_text("❌ Бронирование не найдено.")
         return
 
     # Проверяем, что бронирование принадлежит пользователю
-    if booking[1] != user_data[0]:
+    if booking.user_id != user_data.id:
         await query.edit_message_text("❌ Это не ваше бронирование.")
         return
 
     # Проверяем статус бронирования - разрешаем отмену для pending и confirmed
-    if booking[5] == 'cancelled':
+    if booking.status == 'cancelled':
         await query.edit_message_text("❌ Это бронирование уже отменено.")
         return
 
     # Отменяем бронирование
-    cursor.execute('UPDATE bookings SET status = ? WHERE id = ?', ('cancelled', booking_id))
-    db.conn.commit()
+    await db.aupdate_booking_status(booking_id, 'cancelled')
 
     # Форматируем информацию о бронировании
-    booking_date = booking[2]
-    booking_time = booking[3]
-    guests = booking[4]
+    booking_date = booking.booking_date
+    booking_time = booking.booking_time
+    guests = booking.guests
 
     # Обновляем сообщение
     await query.edit_message_text(
@@ -644,8 +636,8 @@ async def handle_user_cancel_booking(update: Update, context: ContextTypes.DEFAU
             await message_manager.send_message_to_chat(
                 context, admin_id,
                 f"❌ Пользователь отменил бронирование!\n\n"
-                f"👤 Пользователь: {user_data[2]} {user_data[3]}\n"
-                f"📱 Телефон: {user_data[4]}\n"
+                f"👤 Пользователь: {user_data.first_name} {user_data.last_name}\n"
+                f"📱 Телефон: {user_data.phone}\n"
                 f"📅 Дата: {booking_date}\n"
                 f"⏰ Время: {booking_time}\n"
                 f"👥 Гостей: {guests}\n"
@@ -670,13 +662,13 @@ async def start_spend_bonus(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await message_manager.cleanup_user_messages(context, update.effective_user.id)
 
     user = update.effective_user
-    user_data = db.get_user(user.id)
+    user_data = await db.aget_user(user.id)
 
     if not user_data:
         await message_manager.send_message(update, context, "❌ Вы не зарегистрированы.", is_temporary=True)
         return ConversationHandler.END
 
-    if user_data[5] <= 0:
+    if user_data.bonus_balance <= 0:
         await message_manager.send_message(
             update, context,
             "❌ У вас недостаточно баллов для списания.",
@@ -688,7 +680,7 @@ async def start_spend_bonus(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await message_manager.send_message(
         update, context,
         f"🎁 Списание бонусных баллов\n\n"
-        f"💰 Ваш текущий баланс: {user_data[5]} баллов\n\n"
+        f"💰 Ваш текущий баланс: {user_data.bonus_balance} баллов\n\n"
         f"Выберите сумму для списания или введите свою:",
         reply_markup=get_spend_bonus_keyboard(),
         is_temporary=False
@@ -708,7 +700,7 @@ async def process_spend_bonus(update: Update, context: ContextTypes.DEFAULT_TYPE
         return ConversationHandler.END
 
     user = update.effective_user
-    user_data = db.get_user(user.id)
+    user_data = await db.aget_user(user.id)
 
     try:
         if update.message.text in ["50 баллов", "100 баллов", "200 баллов", "500 баллов"]:
@@ -724,7 +716,7 @@ async def process_spend_bonus(update: Update, context: ContextTypes.DEFAULT_TYPE
             )
             return SPEND_BONUS
 
-        if amount > user_data[5]:
+        if amount > user_data.bonus_balance:
             await message_manager.send_message(
                 update, context,
                 "❌ Недостаточно баллов для списания.",
@@ -733,7 +725,7 @@ async def process_spend_bonus(update: Update, context: ContextTypes.DEFAULT_TYPE
             return SPEND_BONUS
 
         # Создаем запрос на списание
-        request_id = db.create_bonus_request(user_data[0], amount)
+        request_id = await db.acreate_bonus_request(user_data.id, amount)
 
         # Уведомляем администратора
         from config import ADMIN_IDS
@@ -742,8 +734,8 @@ async def process_spend_bonus(update: Update, context: ContextTypes.DEFAULT_TYPE
                 await message_manager.send_message_to_chat(
                     context, admin_id,
                     f"🎁 Новый запрос на списание баллов!\n\n"
-                    f"👤 Пользователь: {user_data[2]} {user_data[3]}\n"
-                    f"📱 Телефон: {user_data[4]}\n"
+                    f"👤 Пользователь: {user_data.first_name} {user_data.last_name}\n"
+                    f"📱 Телефон: {user_data.phone}\n"
                     f"💰 Сумма: {amount} баллов\n"
                     f"🆔 ID запроса: {request_id}",
                     is_temporary=False
@@ -987,90 +979,30 @@ async def handle_back_to_contacts_callback(update: Update, context: ContextTypes
 
 
 # ФУНКЦИИ ДЛЯ ФИЛЬТРАЦИИ ПО ДАТЕ
-def get_user_booking_years(user_id):
+async def get_user_booking_years(user_id):
     """Получить список годов, в которых есть бронирования у пользователя"""
-    cursor = db.conn.cursor()
     try:
-        cursor.execute('''
-            SELECT booking_date 
-            FROM bookings 
-            WHERE user_id = ? AND booking_date IS NOT NULL AND booking_date != ''
-            ORDER BY booking_date DESC
-        ''', (user_id,))
-        dates = cursor.fetchall()
-
-        years_set = set()
-        for date_tuple in dates:
-            date_str = date_tuple[0]
-            if date_str and '.' in date_str:
-                try:
-                    day, month, year = date_str.split('.')
-                    if len(year) == 4 and year.isdigit():
-                        years_set.add(year)
-                except ValueError:
-                    continue
-
-        return sorted(years_set, reverse=True)
+        return await db.aget_booking_years(user_id)
 
     except Exception as e:
         logger.error(f"❌ Ошибка при получении годов бронирований пользователя: {e}")
         return []
 
 
-def get_user_booking_months(user_id, year):
+async def get_user_booking_months(user_id, year):
     """Получить список месяцев для указанного года для пользователя"""
-    cursor = db.conn.cursor()
     try:
-        cursor.execute('''
-            SELECT booking_date 
-            FROM bookings 
-            WHERE user_id = ? AND booking_date IS NOT NULL AND booking_date != ''
-            ORDER BY booking_date DESC
-        ''', (user_id,))
-        dates = cursor.fetchall()
-
-        months_set = set()
-        for date_tuple in dates:
-            date_str = date_tuple[0]
-            if date_str and '.' in date_str:
-                try:
-                    day, month, date_year = date_str.split('.')
-                    if date_year == year and len(month) == 2 and month.isdigit():
-                        months_set.add(month)
-                except ValueError:
-                    continue
-
-        return sorted(months_set, reverse=True)
+        return await db.aget_booking_months(year, user_id)
 
     except Exception as e:
         logger.error(f"❌ Ошибка при получении месяцев бронирований пользователя: {e}")
         return []
 
 
-def get_user_booking_dates_by_year_month(user_id, year, month):
+async def get_user_booking_dates_by_year_month(user_id, year, month):
     """Получить список дат для указанного года и месяца для пользователя"""
-    cursor = db.conn.cursor()
     try:
-        cursor.execute('''
-            SELECT DISTINCT booking_date 
-            FROM bookings 
-            WHERE user_id = ? AND booking_date IS NOT NULL AND booking_date != ''
-            ORDER BY booking_date DESC
-        ''', (user_id,))
-        dates = cursor.fetchall()
-
-        filtered_dates = []
-        for date_tuple in dates:
-            date_str = date_tuple[0]
-            if date_str and '.' in date_str:
-                try:
-                    day, date_month, date_year = date_str.split('.')
-                    if date_year == year and date_month == month:
-                        filtered_dates.append(date_str)
-                except ValueError:
-                    continue
-
-        return filtered_dates
+        return await db.aget_booking_days(year, month, user_id)
 
     except Exception as e:
         logger.error(f"❌ Ошибка при получении дат бронирований пользователя: {e}")
@@ -1080,7 +1012,7 @@ def get_user_booking_dates_by_year_month(user_id, year, month):
 async def show_user_dates_for_filter(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показать список годов для фильтрации (пользователь)"""
     user = update.effective_user
-    user_data = db.get_user(user.id)
+    user_data = await db.aget_user(user.id)
 
     if not user_data:
         await message_manager.send_message(
@@ -1090,8 +1022,8 @@ async def show_user_dates_for_filter(update: Update, context: ContextTypes.DEFAU
         )
         return ConversationHandler.END
 
-    db_user_id = user_data[0]
-    years = get_user_booking_years(db_user_id)
+    db_user_id = user_data.id
+    years = await get_user_booking_years(db_user_id)
 
     if not years:
         await message_manager.send_message(
@@ -1123,16 +1055,16 @@ async def user_select_year_for_filter(update: Update, context: ContextTypes.DEFA
         return ConversationHandler.END
 
     user = update.effective_user
-    user_data = db.get_user(user.id)
+    user_data = await db.aget_user(user.id)
     if not user_data:
         return ConversationHandler.END
 
-    db_user_id = user_data[0]
+    db_user_id = user_data.id
 
     year = update.message.text.replace("📅 ", "").replace(" год", "").strip()
     context.user_data['user_selected_year'] = year
 
-    months = get_user_booking_months(db_user_id, year)
+    months = await get_user_booking_months(db_user_id, year)
 
     if not months:
         await message_manager.send_message(
@@ -1171,11 +1103,11 @@ async def user_select_month_for_filter(update: Update, context: ContextTypes.DEF
         return ConversationHandler.END
 
     user = update.effective_user
-    user_data = db.get_user(user.id)
+    user_data = await db.aget_user(user.id)
     if not user_data:
         return ConversationHandler.END
 
-    db_user_id = user_data[0]
+    db_user_id = user_data.id
 
     month_text = update.message.text.replace("📆 ", "").strip()
     month_names = {
@@ -1196,7 +1128,7 @@ async def user_select_month_for_filter(update: Update, context: ContextTypes.DEF
     year = context.user_data['user_selected_year']
     context.user_data['user_selected_month'] = month
 
-    dates = get_user_booking_dates_by_year_month(db_user_id, year, month)
+    dates = await get_user_booking_dates_by_year_month(db_user_id, year, month)
 
     if not dates:
         await message_manager.send_message(
@@ -1228,22 +1160,15 @@ async def show_user_bookings_by_selected_date(update: Update, context: ContextTy
         return ConversationHandler.END
 
     user = update.effective_user
-    user_data = db.get_user(user.id)
+    user_data = await db.aget_user(user.id)
     if not user_data:
         return ConversationHandler.END
 
-    db_user_id = user_data[0]
+    db_user_id = user_data.id
 
     selected_date = update.message.text.strip()
 
-    cursor = db.conn.cursor()
-    cursor.execute('''
-        SELECT * FROM bookings 
-        WHERE user_id = ? AND booking_date = ?
-        ORDER BY booking_time
-    ''', (db_user_id, selected_date))
-
-    bookings = cursor.fetchall()
+    bookings = await db.aget_user_bookings_by_date(db_user_id, selected_date)
 
     if not bookings:
         await message_manager.send_message(
@@ -1265,11 +1190,11 @@ async def show_user_bookings_by_selected_date(update: Update, context: ContextTy
         message = _format_user_booking_message(booking)
 
         # Для ожидающих и подтвержденных бронирований показываем кнопку отмены
-        if booking[5] in ['pending', 'confirmed']:
+        if booking.status in ['pending', 'confirmed']:
             await message_manager.send_message(
                 update, context,
                 message,
-                reply_markup=get_user_booking_cancel_keyboard(booking[0]),
+                reply_markup=get_user_booking_cancel_keyboard(booking.id),
                 is_temporary=False
             )
         else:
@@ -0,0 +1,90 @@
+# keyboards/cache.py
+"""
+Кэш готовых клавиатур.
+
+Главные меню не меняются вовсе, а клавиатуры категорий и позиций меняются
+только вместе с меню заведения. Поэтому разметка строится один раз на
+(построитель, аргументы, версия меню) и дальше отдается готовой. Объекты
+InlineKeyboardMarkup / ReplyKeyboardMarkup в python-telegram-bot неизменяемы,
+так что один экземпляр можно отправлять в любые чаты.
+"""
+import functools
+import threading
+from collections import OrderedDict
+
+from config import KEYBOARD_CACHE_SIZE
+
+
+def _freeze(value):
+    """Аргумент построителя в виде, пригодном для ключа (списки -> кортежи)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class KeyboardCache:
+    """LRU-кэш клавиатур со счетчиками попаданий и промахов.
+
+    Ключ записи - (ключ построителя, версия меню). Клавиатуры, не зависящие
+    от меню, хранятся с версией None. Как только приходит запрос с новой
+    версией меню, все записи старых версий удаляются.
+    """
+
+    def __init__(self, max_size=KEYBOARD_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._menu_version = None
+        self._markups = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build, version=None):
+        """Готовая клавиатура для key; build() вызывается только при промахе"""
+        entry = (key, version)
+        with self._lock:
+            if version is not None and version != self._menu_version:
+                # Меню изменилось: клавиатуры прежних версий больше не нужны
+                for stale in [k for k in self._markups if k[1] is not None and k[1] != version]:
+                    del self._markups[stale]
+                self._menu_version = version
+            markup = self._markups.get(entry)
+            if markup is not None:
+                self._markups.move_to_end(entry)
+                self.hits += 1
+                return markup
+            self.misses += 1
+
+        markup = build()
+        with self._lock:
+            self._markups[entry] = markup
+            while len(self._markups) > self.max_size:
+                self._markups.popitem(last=False)
+        return markup
+
+    def clear(self):
+        """Удалить все клавиатуры и обнулить счетчики"""
+        with self._lock:
+            self._markups.clear()
+            self._menu_version = None
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Счетчики кэша: {'size', 'hits', 'misses'}"""
+        with self._lock:
+            return {'size': len(self._markups), 'hits': self.hits, 'misses': self.misses}
+
+
+# Общий кэш клавиатур бота
+keyboard_cache = KeyboardCache()
+
+
+def cached_keyboard(builder):
+    """Декоратор для построителей клавиатур, зависящих только от своих аргументов"""
+
+    @functools.wraps(builder)
+    def wrapper(*args):
+        key = (builder.__qualname__, _freeze(args))
+        return keyboard_cache.get(key, lambda: builder(*args))
+
+    return wrapper
@@ -2,6 +2,8 @@
 from telegram import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from datetime import datetime, date, timedelta
 from calendar import monthrange
+from keyboards.cache import KeyboardCache, cached_keyboard
+from utils.helpers import moscow_today
 
 
 # ========== ДОБАВЬТЕ ЭТОТ СЛОВАРЬ ЗДЕСЬ ==========
@@ -14,8 +16,12 @@ PAYMENT_METHOD_NAMES = {
 }
 # ========== КОНЕЦ ДОБАВЛЕНИЯ ==========
 
+# Клавиатуры с @cached_keyboard строятся один раз на набор аргументов
+# и затем отдаются из keyboards.cache готовыми
+
 
 # Главное меню пользователя
+@cached_keyboard
 def get_user_main_menu():
     keyboard = [
         [KeyboardButton("💰 Мой баланс")],
@@ -28,6 +34,7 @@ def get_user_main_menu():
 
 
 # Клавиатура контактов
+@cached_keyboard
 def get_contacts_keyboard():
     keyboard = [
         [KeyboardButton("📞 Позвонить"), KeyboardButton("💬 Написать в Telegram")],
@@ -37,6 +44,7 @@ def get_contacts_keyboard():
 
 
 # Меню фильтрации бронирований для пользователя
+@cached_keyboard
 def get_user_booking_filter_menu():
     keyboard = [
         [KeyboardButton("⏳ Ожидающие"), KeyboardButton("📅 По дате")],
@@ -55,6 +63,7 @@ def get_user_booking_cancel_keyboard(booking_id):
 
 
 # Главное меню администратора
+@cached_keyboard
 def get_admin_main_menu():
     keyboard = [
         [KeyboardButton("👥 Список пользователей")],
@@ -67,6 +76,7 @@ def get_admin_main_menu():
 
 
 # Меню управления меню для администратора
+@cached_keyboard
 def get_menu_management_keyboard():
     keyboard = [
         [KeyboardButton("📋 Просмотр меню")],
@@ -78,6 +88,7 @@ def get_menu_management_keyboard():
 
 
 # Меню фильтрации бронирований для администратора (ИЗМЕНЕНО)
+@cached_keyboard
 def get_booking_filter_menu():
     """
     Меню фильтрации бронирований для администратора
@@ -115,8 +126,8 @@ def get_users_keyboard(users):
     keyboard = []
     for user in users:
         keyboard.append([InlineKeyboardButton(
-            f"{user[2]} {user[3]} (ID: {user[0]})",
-            callback_data=f"select_user_{user[0]}"
+            f"{user.first_name} {user.last_name} (ID: {user.id})",
+            callback_data=f"select_user_{user.id}"
         )])
     return InlineKeyboardMarkup(keyboard)
 
@@ -159,12 +170,14 @@ def get_booking_actions_keyboard(booking_id):
 
 
 # Кнопка для отправки номера телефона
+@cached_keyboard
 def get_phone_keyboard():
     keyboard = [[KeyboardButton("📱 Отправить номер телефона", request_contact=True)]]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
 
 
 # Клавиатура подтверждения
+@cached_keyboard
 def get_confirmation_keyboard():
     keyboard = [
         [KeyboardButton("✅ Подтвердить"), KeyboardButton("✏️ Изменить данные")],
@@ -174,12 +187,14 @@ def get_confirmation_keyboard():
 
 
 # Клавиатура отмены
+@cached_keyboard
 def get_cancel_keyboard():
     keyboard = [[KeyboardButton("❌ Отмена")]]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
 
 
 # Клавиатура для списания баллов
+@cached_keyboard
 def get_spend_bonus_keyboard():
     keyboard = [
         [KeyboardButton("50 баллов"), KeyboardButton("100 баллов")],
@@ -190,6 +205,7 @@ def get_spend_bonus_keyboard():
 
 
 # Клавиатура реферальной программы
+@cached_keyboard
 def get_referral_keyboard():
     keyboard = [
         [KeyboardButton("📊 Моя статистика"), KeyboardButton("🔗 Получить ссылку")],
@@ -198,6 +214,7 @@ def get_referral_keyboard():
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
 
 
+@cached_keyboard
 def get_bonus_requests_menu():
     """Меню для управления запросами на списание"""
     keyboard = [
@@ -211,6 +228,7 @@ def get_bonus_requests_menu():
 
 # НОВЫЕ КЛАВИАТУРЫ ДЛЯ УПРАВЛЕНИЯ МЕНЮ
 
+@cached_keyboard
 def get_categories_keyboard(categories):
     """Клавиатура для выбора категории меню"""
     keyboard = []
@@ -230,8 +248,8 @@ def get_menu_items_keyboard(items, action_prefix):
     for item in items:
         keyboard.append([
             InlineKeyboardButton(
-                f"{item[1]} - {item[2]}₽",
-                callback_data=f"{action_prefix}_{item[0]}"
+                f"{item.name} - {item.price}₽",
+                callback_data=f"{action_prefix}_{item.id}"
             )
         ])
     keyboard.append([InlineKeyboardButton("⬅️ Назад к категориям", callback_data="back_to_categories_list")])
@@ -261,6 +279,7 @@ def get_edit_confirmation_keyboard(item_id):
     return InlineKeyboardMarkup(keyboard)
 
 
+@cached_keyboard
 def get_back_to_menu_management_keyboard():
     """Клавиатура для возврата в управление меню"""
     keyboard = [[InlineKeyboardButton("⬅️ Назад в управление меню", callback_data="back_to_menu_management")]]
@@ -269,112 +288,129 @@ def get_back_to_menu_management_keyboard():
 
 # ========== КАЛЕНДАРНАЯ КЛАВИАТУРА ==========
 
-def get_calendar_keyboard(year=None, month=None, selected_date=None):
-    """Создает инлайн клавиатуру-календарь с подсветкой выбранной даты"""
-    from datetime import date
-    from calendar import monthrange
+# Названия месяцев и дней недели для календаря
+MONTH_NAMES = ["", "Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
+               "Июль", "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь"]
+WEEKDAY_NAMES = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
 
-    today = date.today()
-    if year is None:
-        year = today.year
-    if month is None:
-        month = today.month
+# Сетки календаря по (год, месяц) с датой "сегодня" в качестве версии:
+# в полночь по Москве приходит новая дата и сетки прошлого дня удаляются
+_calendar_cache = KeyboardCache()
 
-    # Названия месяцев
-    month_names = ["", "Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
-                   "Июль", "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь"]
 
-    # Получаем первый день месяца и количество дней
-    first_weekday, num_days = monthrange(year, month)
+class CalendarSkeleton:
+    """Сетка месяца без выбранной даты и занятых дней.
 
-    # Заголовок календаря
-    keyboard = []
-    header = [
-        InlineKeyboardButton("◀️", callback_data=f"cal_prev_{year}_{month}"),
-        InlineKeyboardButton(f"{month_names[month]} {year}", callback_data="ignore"),
-        InlineKeyboardButton("▶️", callback_data=f"cal_next_{year}_{month}")
-    ]
-    keyboard.append(header)
+    weeks - ряды кнопок по неделям, visible - показывать ли неделю (недели,
+    целиком ушедшие в прошлое, скрываются), cells - положение каждого дня
+    месяца в сетке {день: (неделя, столбец)}, markup - готовая клавиатура.
+    """
 
-    # Дни недели
-    weekdays = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
-    keyboard.append([InlineKeyboardButton(day, callback_data="ignore") for day in weekdays])
+    def __init__(self, head, weeks, visible, cells, tail):
+        self.head = head
+        self.weeks = weeks
+        self.visible = visible
+        self.cells = cells
+        self.tail = tail
+        self.markup = InlineKeyboardMarkup(self.rows())
+
+    def rows(self, overlay=None):
+        """Ряды клавиатуры; overlay {день: кнопка} заменяет кнопки отдельных дней"""
+        weeks = [list(week) for week in self.weeks]
+        visible = list(self.visible)
+        for day, button in (overlay or {}).items():
+            week, column = self.cells[day]
+            weeks[week][column] = button
+            visible[week] = True
+        return self.head + [week for week, shown in zip(weeks, visible) if shown] + self.tail
+
+
+def _build_calendar_skeleton(year, month, today):
+    """Построить сетку месяца относительно даты today"""
+    first_weekday, num_days = monthrange(year, month)
+    head = [
+        [
+            InlineKeyboardButton("◀️", callback_data=f"cal_prev_{year}_{month}"),
+            InlineKeyboardButton(f"{MONTH_NAMES[month]} {year}", callback_data="ignore"),
+            InlineKeyboardButton("▶️", callback_data=f"cal_next_{year}_{month}")
+        ],
+        [InlineKeyboardButton(day, callback_data="ignore") for day in WEEKDAY_NAMES]
+    ]
 
-    # Дни месяца
-    current_day = 1
-    for week in range(6):  # Максимум 6 недель в месяце
+    weeks, visible, cells = [], [], {}
+    blank = InlineKeyboardButton(" ", callback_data="ignore")
+    day = 1
+    while day <= num_days:
         row = []
-        for day in range(7):
-            if current_day > num_days:
-                # Пустые кнопки после последнего дня
-                row.append(InlineKeyboardButton(" ", callback_data="ignore"))
-            elif week == 0 and day < first_weekday:
-                # Пустые кнопки перед первым днем
-                row.append(InlineKeyboardButton(" ", callback_data="ignore"))
+        shown = False
+        for column in range(7):
+            if day > num_days or (not weeks and column < first_weekday):
+                row.append(blank)
+                continue
+            current = date(year, month, day)
+            if current == today:
+                text = f"📍 {day}"
+            elif current < today:
+                text = f"·{day}·"
             else:
-                # Определяем, является ли эта дата выбранной
-                is_selected = False
-                if selected_date:
-                    try:
-                        selected_day, selected_month, selected_year = map(int, selected_date.split('.'))
-                        if (current_day == selected_day and
-                                month == selected_month and
-                                year == selected_year):
-                            is_selected = True
-                    except:
-                        pass
-
-                # Определяем, является ли дата сегодняшней
-                is_today = (current_day == today.day and
-                            month == today.month and
-                            year == today.year)
-
-                # Формируем текст кнопки с эмодзи для выделения
-                if is_selected:
-                    button_text = f"✅ {current_day}"
-                elif is_today:
-                    button_text = f"📍 {current_day}"
-                elif date(year, month, current_day) < today:
-                    button_text = f"·{current_day}·"
-                else:
-                    button_text = str(current_day)
-
-                # Создаем callback_data
-                day_str = f"{current_day:02d}"
-                month_str = f"{month:02d}"
-                callback_data = f"cal_day_{year}_{month_str}_{day_str}"
-
-                row.append(InlineKeyboardButton(button_text, callback_data=callback_data))
-                current_day += 1
-
-        # Добавляем строку, если в ней есть активные кнопки
-        if any(btn.text.strip() not in [" ", "·1·", "·2·", "·3·", "·4·", "·5·", "·6·", "·7·",
-                                        "·8·", "·9·", "·10·", "·11·", "·12·", "·13·", "·14·",
-                                        "·15·", "·16·", "·17·", "·18·", "·19·", "·20·", "·21·",
-                                        "·22·", "·23·", "·24·", "·25·", "·26·", "·27·", "·28·",
-                                        "·29·", "·30·", "·31·"] for btn in row):
-            keyboard.append(row)
-
-        # Если все дни прошли, выходим из цикла
-        if current_day > num_days:
-            break
+                text = str(day)
+            # Неделя видна, если в ней есть сегодняшний или будущий день
+            shown = shown or current >= today
+            cells[day] = (len(weeks), column)
+            row.append(InlineKeyboardButton(text, callback_data=f"cal_day_{year}_{month:02d}_{day:02d}"))
+            day += 1
+        weeks.append(tuple(row))
+        visible.append(shown)
 
-    # Кнопки быстрого выбора
-    from datetime import timedelta
     next_week = today + timedelta(days=7)
-    keyboard.append([
-        InlineKeyboardButton("📅 Сегодня",
-                             callback_data=f"cal_day_{today.year}_{today.month:02d}_{today.day:02d}"),
-        InlineKeyboardButton("📅 Через неделю",
-                             callback_data=f"cal_day_{next_week.year}_{next_week.month:02d}_{next_week.day:02d}")
-    ])
+    tail = [
+        [
+            InlineKeyboardButton("📅 Сегодня",
+                                 callback_data=f"cal_day_{today.year}_{today.month:02d}_{today.day:02d}"),
+            InlineKeyboardButton("📅 Через неделю",
+                                 callback_data=f"cal_day_{next_week.year}_{next_week.month:02d}_{next_week.day:02d}")
+        ],
+        [InlineKeyboardButton("❌ Отмена", callback_data="cal_cancel")]
+    ]
+    return CalendarSkeleton(head, weeks, visible, cells, tail)
 
-    # Кнопка отмены
-    keyboard.append([
-        InlineKeyboardButton("❌ Отмена", callback_data="cal_cancel")
-    ])
 
-    return InlineKeyboardMarkup(keyboard)
+def get_calendar_keyboard(year=None, month=None, selected_date=None, full_days=()):
+    """Создает инлайн клавиатуру-календарь с подсветкой выбранной даты
+
+    Сетка месяца строится один раз в день (по московскому времени) и берется
+    из кэша. Выбранная дата ('ДД.ММ.ГГГГ') и полностью занятые дни (full_days -
+    объекты date) накладываются поверх готовой сетки; без них возвращается
+    готовая клавиатура. Занятые дни показываются как 🚫 и не нажимаются.
+    """
+    today = moscow_today()
+    if year is None:
+        year = today.year
+    if month is None:
+        month = today.month
+
+    skeleton = _calendar_cache.get(('calendar', year, month),
+                                   lambda: _build_calendar_skeleton(year, month, today),
+                                   version=today)
+
+    overlay = {}
+    for day in full_days:
+        if day.year == year and day.month == month and day >= today:
+            overlay[day.day] = InlineKeyboardButton(f"🚫 {day.day}", callback_data="ignore")
+
+    if selected_date:
+        try:
+            selected = datetime.strptime(selected_date, '%d.%m.%Y').date()
+        except ValueError:
+            selected = None
+        if selected and selected.year == year and selected.month == month:
+            week, column = skeleton.cells[selected.day]
+            overlay[selected.day] = InlineKeyboardButton(
+                f"✅ {selected.day}", callback_data=skeleton.weeks[week][column].callback_data)
+
+    if not overlay:
+        return skeleton.markup
+    return InlineKeyboardMarkup(skeleton.rows(overlay))
 
 
 def get_time_keyboard(selected_date_obj=None, selected_time=None):
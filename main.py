@@ -24,9 +24,17 @@ async def post_init(application):
     logger.info(f"🔗 Бот: {bot_info.first_name} (@{bot_info.username})")
     logger.info(f"🆔 ID бота: {bot_info.id}")
 
+    # Фоновая отправка рассылок; незавершенные продолжаются после перезапуска
+    from broadcast import broadcast_worker
+    broadcast_worker.start(application.bot)
+
 
 async def post_stop(application):
     """Функция, выполняемая при остановке бота"""
+    from broadcast import broadcast_worker
+    from message_manager import message_manager
+    await broadcast_worker.stop()
+    await message_manager.deletions.stop()
     logger.info("🛑 Бот остановлен")
 
 
@@ -91,7 +99,7 @@ def setup_handlers(application):
     )
     from handlers.admin_bookings import (
         show_bookings, show_pending_bookings, show_confirmed_bookings,
-        show_cancelled_bookings, show_all_bookings, handle_booking_action,
+        show_cancelled_bookings, show_all_bookings, show_more_bookings, handle_booking_action,
         get_booking_date_handler, get_booking_cancellation_handler,
         get_admin_booking_handler  # <-- ДОБАВЬТЕ ЭТУ СТРОКУ
     )
@@ -101,7 +109,7 @@ def setup_handlers(application):
     )
     from handlers.admin_messages import (
         get_broadcast_handler, get_user_message_handler,
-        message_user_callback
+        message_user_callback, show_broadcasts
     )
     from handlers.admin_handlers import reset_shift_data
 
@@ -154,16 +162,15 @@ def setup_handlers(application):
     )
 
     # НОВАЯ ФУНКЦИЯ ДЛЯ ОТЛАДКИ
-    from database import Database
-    db = Database()
-    db.add_payment_method_column()  # Добавить эту строку
+    from database import get_db
+    db = get_db()
 
     async def debug_shifts(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда для отладки - показать все смены"""
         if not is_admin(update.effective_user.id):
             return
 
-        all_shifts = db.get_all_shifts_debug()
+        all_shifts = await db.aget_all_shifts_debug()
 
         if not all_shifts:
             await update.message.reply_text("📭 Нет смен в базе данных")
@@ -171,12 +178,12 @@ def setup_handlers(application):
 
         message = "📊 ВСЕ СМЕНЫ В БАЗЕ:\n\n"
         for shift in all_shifts:
-            message += f"Смена #{shift[1]} ({shift[2]})\n"
-            message += f"  Открыта: {shift[3]}\n"
-            message += f"  Закрыта: {shift[4] if shift[4] else 'Открыта'}\n"
-            message += f"  Выручка: {shift[5] or 0}₽\n"
-            message += f"  Заказов: {shift[6] or 0}\n"
-            message += f"  Статус: {shift[7]}\n"
+            message += f"Смена #{shift.shift_number} ({shift.month_year})\n"
+            message += f"  Открыта: {shift.opened_at}\n"
+            message += f"  Закрыта: {shift.closed_at if shift.closed_at else 'Открыта'}\n"
+            message += f"  Выручка: {shift.total_revenue or 0}₽\n"
+            message += f"  Заказов: {shift.total_orders or 0}\n"
+            message += f"  Статус: {shift.status}\n"
             message += "-" * 30 + "\n"
 
         # Разбиваем сообщение если оно слишком длинное
@@ -228,26 +235,8 @@ def setup_handlers(application):
 
         logger.info(f"Админ {user_id} ищет пользователя: {search_query}")
 
-        # Ищем пользователей в базе данных
-        cursor = db.conn.cursor()
-
-        # Поиск по ID
-        if search_query.isdigit():
-            cursor.execute('''
-                SELECT * FROM users 
-                WHERE id = ? AND is_active = TRUE 
-                ORDER BY id DESC
-            ''', (int(search_query),))
-        else:
-            # Поиск по имени или фамилии
-            search_pattern = f"%{search_query}%"
-            cursor.execute('''
-                SELECT * FROM users 
-                WHERE (first_name LIKE ? OR last_name LIKE ?) AND is_active = TRUE 
-                ORDER BY id DESC
-            ''', (search_pattern, search_pattern))
-
-        users = cursor.fetchall()
+        # Поиск по ID, имени, фамилии, телефону или Telegram ID (индекс users_fts)
+        users = await db.asearch_users(search_query)
 
         if not users:
             await update.message.reply_text(
@@ -268,8 +257,8 @@ def setup_handlers(application):
 
         for user in users:
             keyboard.append([InlineKeyboardButton(
-                f"{user[2]} {user[3]} (ID: {user[0]}) | 💰 {user[5]} баллов",
-                callback_data=f"select_user_{user[0]}"
+                f"{user.first_name} {user.last_name} (ID: {user.id}) | 💰 {user.bonus_balance} баллов",
+                callback_data=f"select_user_{user.id}"
             )])
 
         keyboard.append([InlineKeyboardButton("🔄 Новый поиск", callback_data="new_search")])
@@ -440,6 +429,7 @@ def setup_handlers(application):
     application.add_handler(CallbackQueryHandler(user_selected_callback, pattern="^select_user_"))
     application.add_handler(CallbackQueryHandler(user_info_callback, pattern="^info_"))
     application.add_handler(CallbackQueryHandler(handle_booking_action, pattern="^(confirm_booking_|cancel_booking_)"))
+    application.add_handler(CallbackQueryHandler(show_more_bookings, pattern="^bookings_more_"))
     application.add_handler(CallbackQueryHandler(handle_bonus_request_action, pattern="^(approve_|reject_)"))
     application.add_handler(CallbackQueryHandler(message_user_callback, pattern="^message_"))
     application.add_handler(CallbackQueryHandler(show_selected_shift_history, pattern="^history_shift_.*_.*"))
@@ -455,6 +445,7 @@ def setup_handlers(application):
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("reset_shift", reset_shift_data))
     application.add_handler(CommandHandler("debug_shifts", debug_shifts))  # НОВАЯ КОМАНДА
+    application.add_handler(CommandHandler("broadcasts", show_broadcasts))
 
     # Обработчик кнопки "Назад" для обоих типов пользователей
     async def handle_back_button(update: Update, context):
@@ -1,13 +1,48 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from database import Database
+from database import get_db
+from keyboards.cache import KeyboardCache
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class MenuCatalog:
+    """Снимок активных позиций меню в памяти.
+
+    Позиции (MenuItemRow) доступны по id, по названию, по категории и списком
+    в порядке (категория, название). Снимок не меняется после создания: при
+    изменении меню MenuManager строит новый и заменяет ссылку целиком, поэтому
+    обработчики всегда видят согласованное меню.
+    """
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.items = [row for row in rows if row.is_active]
+        self.by_id = {item.id: item for item in self.items}
+        self.by_name = {item.name: item for item in self.items}
+        self.by_category = {}
+        for item in self.items:
+            self.by_category.setdefault(item.category, []).append(item)
+        self.categories = sorted(self.by_category)
+
+
 class MenuManager:
-    def __init__(self):
-        self.db = Database()
+    """Меню для создания заказов.
+
+    Позиции читаются из базы при создании и хранятся в MenuCatalog; нажатия на
+    категории и позиции обслуживаются из памяти, без обращений к базе из event
+    loop. После commit, изменившего menu_items (add_menu_item, update_menu_item,
+    delete_menu_item, restore_menu_item), каталог загружается заново в потоке,
+    выполнившем commit (см. Database.add_menu_listener). Клавиатуры категорий и
+    позиций хранятся в self.keyboards с версией каталога в ключе, поэтому тоже
+    перестраиваются только после изменения меню.
+    """
+
+    def __init__(self, db=None):
+        self.db = db or get_db()
+        self._catalog = None
+        # Свой кэш: версии меню разных баз не должны пересекаться
+        self.keyboards = KeyboardCache()
         # Базовые данные для инициализации (используются только если база пустая)
         self.menu_items = [
             # Кальяны
@@ -49,114 +84,64 @@ class MenuManager:
             ("Клубничный", 500, "Чай"),
             ("Облепиховый", 500, "Чай")
         ]
+        self.db.add_menu_listener(self.reload_catalog)
+        self.reload_catalog()
+
+    def reload_catalog(self):
+        """Загрузить каталог из базы (синхронно, в потоке вызывающего)"""
+        # Версия берется до чтения: изменение во время загрузки вызовет еще одну загрузку
+        catalog = MenuCatalog(self.db.menu_version, self.db.get_all_menu_items())
+        if self._catalog is None or catalog.version >= self._catalog.version:
+            self._catalog = catalog
+        logger.info(f"Загружено {len(catalog.items)} позиций меню")
+
+    def get_catalog(self):
+        """Текущий каталог меню (без обращения к базе)"""
+        return self._catalog
 
     def get_categories(self):
-        """Получить список категорий меню из базы данных"""
-        return self.db.get_all_menu_categories()
+        """Получить список категорий меню"""
+        return self.get_catalog().categories
 
     def get_items_by_category(self, category):
-        """Получить позиции меню по категории из базы данных"""
-        items = self.db.get_menu_items_by_category(category)
-        return [(item[1], item[2], item[3]) for item in items]  # преобразуем в формат (name, price, category)
+        """Получить позиции меню по категории в формате (name, price, category)"""
+        items = self.get_catalog().by_category.get(category, [])
+        return [(item.name, item.price, item.category) for item in items]
 
     def get_all_items_with_categories(self):
-        """Получить все позиции меню с их категориями - УЛУЧШЕННАЯ ВЕРСИЯ"""
+        """Получить все активные позиции меню в формате (name, price, category)"""
         try:
-            items = self.db.get_all_menu_items()
-
-            # Если таблица пустая, используем данные из памяти и заполняем базу
-            if not items:
-                logger.warning("Таблица menu_items пуста, заполняем базовыми данными")
-                for item in self.menu_items:
-                    self.db.add_menu_item(item[0], item[1], item[2])
-
-                # Получаем данные снова после заполнения
-                items = self.db.get_all_menu_items()
-
-            # Логируем для отладки
-            logger.info(f"Загружено {len(items)} позиций из базы данных")
-            for item in items:
-                logger.debug(f"Меню: {item[1]} - {item[2]}₽ - Категория: {item[3]} - Активен: {item[4]}")
-
-            # Преобразуем в формат (name, price, category)
-            return [(item[1], item[2], item[3]) for item in items if item[4]]
+            return [(item.name, item.price, item.category) for item in self.get_catalog().items]
         except Exception as e:
             logger.error(f"Error getting menu items from database: {e}")
             # Возвращаем данные из памяти как fallback
             return self.menu_items
 
     def get_item_by_name(self, name):
-        """Найти позицию меню по названию в базе данных"""
-        item = self.db.get_menu_item_by_name(name)
-        if item and item[4]:  # проверяем is_active
-            return (item[1], item[2], item[3])  # (name, price, category)
+        """Найти активную позицию меню по названию: (name, price, category) или None"""
+        item = self.get_catalog().by_name.get(name)
+        if item:
+            return (item.name, item.price, item.category)
         return None
 
-    def create_order(self, table_number, admin_id):
-        """Создать новый заказ"""
-        cursor = self.db.conn.cursor()
-        cursor.execute('''
-            INSERT INTO orders (table_number, admin_id, status, created_at)
-            VALUES (?, ?, ?, ?)
-        ''', (table_number, admin_id, 'active', self.db.get_moscow_time()))
-        order_id = cursor.lastrowid
-        self.db.conn.commit()
-        return order_id
-
-    def add_item_to_order(self, order_id, item_name, quantity=1):
-        """Добавить позицию в заказ"""
-        item = self.get_item_by_name(item_name)
-        if not item:
-            return False
-
-        cursor = self.db.conn.cursor()
-        cursor.execute('''
-            INSERT INTO order_items (order_id, item_name, price, quantity, added_at)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (order_id, item[0], item[1], quantity, self.db.get_moscow_time()))
-        self.db.conn.commit()
-        return True
-
-    # НОВЫЙ МЕТОД ДЛЯ УДАЛЕНИЯ ПОЗИЦИЙ ИЗ ЗАКАЗА
-    def remove_item_from_order(self, order_id, item_name):
-        """Удалить позицию из заказа"""
-        return self.db.remove_item_from_order(order_id, item_name)
-
-    def get_active_order_by_table(self, table_number):
-        """Получить активный заказ по номеру стола"""
-        cursor = self.db.conn.cursor()
-        cursor.execute('''
-            SELECT * FROM orders 
-            WHERE table_number = ? AND status = 'active'
-            ORDER BY created_at DESC LIMIT 1
-        ''', (table_number,))
-        return cursor.fetchone()
-
-    def get_order_items(self, order_id):
-        """Получить все позиции заказа"""
-        cursor = self.db.conn.cursor()
-        cursor.execute('''
-            SELECT * FROM order_items WHERE order_id = ?
-        ''', (order_id,))
-        return cursor.fetchall()
-
-    def calculate_order_total(self, order_id):
-        """Рассчитать общую сумму заказа"""
-        items = self.get_order_items(order_id)
-        total = sum(item[3] * item[4] for item in items)  # price * quantity
-        return total
-
-    def close_order(self, order_id):
-        """Закрыть заказ"""
-        cursor = self.db.conn.cursor()
-        cursor.execute('''
-            UPDATE orders SET status = 'closed', closed_at = ? WHERE id = ?
-        ''', (self.db.get_moscow_time(), order_id))
-        self.db.conn.commit()
-
     def get_category_keyboard(self):
-        """Клавиатура для выбора категорий меню"""
-        categories = self.get_categories()
+        """Клавиатура для выбора категорий меню (готовая, пока меню не изменилось)"""
+        catalog = self.get_catalog()
+        return self.keyboards.get(('category_keyboard',),
+                                lambda: self._build_category_keyboard(catalog),
+                                version=catalog.version)
+
+    def get_items_keyboard(self, category):
+        """Клавиатура для выбора позиций в категории (готовая, пока меню не изменилось)"""
+        catalog = self.get_catalog()
+        return self.keyboards.get(('items_keyboard', category),
+                                lambda: self._build_items_keyboard(catalog, category),
+                                version=catalog.version)
+
+    @staticmethod
+    def _build_category_keyboard(catalog):
+        """Построить клавиатуру категорий по снимку меню"""
+        categories = catalog.categories
         keyboard = []
         row = []
         for i, category in enumerate(categories):
@@ -167,15 +152,15 @@ class MenuManager:
         keyboard.append([InlineKeyboardButton("❌ Отмена", callback_data="cancel_order")])
         return InlineKeyboardMarkup(keyboard)
 
-    def get_items_keyboard(self, category):
-        """Клавиатура для выбора позиций в категории"""
-        items = self.get_items_by_category(category)
+    @staticmethod
+    def _build_items_keyboard(catalog, category):
+        """Построить клавиатуру позиций категории по снимку меню"""
         keyboard = []
-        for item in items:
+        for item in catalog.by_category.get(category, []):
             keyboard.append([
                 InlineKeyboardButton(
-                    f"{item[0]} - {item[1]}₽",
-                    callback_data=f"item_{item[0]}"
+                    f"{item.name} - {item.price}₽",
+                    callback_data=f"item_{item.name}"
                 )
             ])
         keyboard.append([InlineKeyboardButton("⬅️ Назад к категориям",
@@ -1,18 +1,130 @@
 import asyncio
-from typing import List, Optional
+import heapq
+import itertools
+import time
+from typing import Callable, List, Optional
 from telegram import Message, Update
 from telegram.ext import ContextTypes
-from config import MESSAGE_CLEANUP_DELAY
+from config import MESSAGE_CLEANUP_CONCURRENCY, MESSAGE_CLEANUP_DELAY
+from database import get_db
+from broadcast import SENT, delivery_state
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class DeletionScheduler:
+    """Отложенное удаление временных сообщений одной фоновой задачей.
+
+    Сообщения хранятся в куче по сроку удаления. Задача просыпается к
+    ближайшему сроку, забирает все наступившие удаления, группирует их по
+    чатам и удаляет, обслуживая не больше concurrency чатов одновременно.
+    Сколько бы временных сообщений ни отправлялось, задача одна, а в памяти
+    лежат только еще не удаленные сообщения. Когда удалять нечего, задача
+    завершается и запускается снова при следующем schedule().
+    """
+
+    def __init__(self, delay: float = MESSAGE_CLEANUP_DELAY, concurrency: int = MESSAGE_CLEANUP_CONCURRENCY,
+                 on_deleted: Optional[Callable[[int, List[int]], None]] = None):
+        self.delay = delay
+        self.concurrency = concurrency
+        self.on_deleted = on_deleted
+        self._heap = []  # (срок, порядковый номер, chat_id, message_id, bot)
+        self._pending = {}  # chat_id -> message_id, которые еще предстоит удалить
+        self._counter = itertools.count()
+        self._wakeup = None
+        self._task = None
+
+    def __len__(self):
+        return sum(len(message_ids) for message_ids in self._pending.values())
+
+    def schedule(self, bot, chat_id: int, message_id: int, delay: Optional[float] = None):
+        """Удалить сообщение через delay секунд (по умолчанию MESSAGE_CLEANUP_DELAY)"""
+        entry = (time.monotonic() + (self.delay if delay is None else delay), next(self._counter),
+                 chat_id, message_id, bot)
+        heapq.heappush(self._heap, entry)
+        self._pending.setdefault(chat_id, set()).add(message_id)
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            self._task.add_done_callback(self._task_done)
+        elif self._heap[0] is entry:
+            # Новый срок раньше того, которого ждет задача
+            self._wakeup.set()
+
+    def cancel(self, chat_id: int) -> set:
+        """Отменить запланированные удаления в чате; возвращает их message_id"""
+        return self._pending.pop(chat_id, set())
+
+    async def stop(self):
+        """Остановить задачу и забыть запланированные удаления"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._heap.clear()
+        self._pending.clear()
+
+    @staticmethod
+    def _task_done(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            logger.error(f"Планировщик удаления сообщений остановился: {task.exception()}")
+
+    async def _run(self):
+        while self._heap:
+            now = time.monotonic()
+            due = self._heap[0][0]
+            if due > now:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), due - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._delete_due(now)
+
+    async def _delete_due(self, now: float):
+        """Удалить все сообщения, срок которых наступил, по чатам"""
+        batches = {}
+        while self._heap and self._heap[0][0] <= now:
+            _, _, chat_id, message_id, bot = heapq.heappop(self._heap)
+            pending = self._pending.get(chat_id)
+            if not pending or message_id not in pending:
+                continue  # удаление отменено
+            pending.discard(message_id)
+            if not pending:
+                del self._pending[chat_id]
+            batches.setdefault(chat_id, (bot, []))[1].append(message_id)
+
+        chats = iter(batches.items())
+
+        async def worker():
+            # Все обработчики берут чаты из одного итератора
+            for chat_id, (bot, message_ids) in chats:
+                await self._delete_batch(bot, chat_id, message_ids)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(batches)))))
+
+    async def _delete_batch(self, bot, chat_id: int, message_ids: List[int]):
+        for message_id in message_ids:
+            try:
+                await bot.delete_message(chat_id, message_id)
+            except Exception as e:
+                logger.debug(f"Не удалось удалить временное сообщение {message_id} для {chat_id}: {e}")
+        if self.on_deleted:
+            self.on_deleted(chat_id, message_ids)
+
+
 class MessageManager:
     def __init__(self):
         self.temporary_messages = {}
         self.permanent_messages = {}
         self.notification_messages = {}  # Отдельное хранилище для уведомлений
+        self.reachable_chats = set()  # чаты, доступность которых уже записана в базу за этот запуск
+        self.deletions = DeletionScheduler(on_deleted=self._forget_temporary)
 
     async def send_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
                            text: str, is_temporary: bool = False, is_notification: bool = False, **kwargs) -> Message:
@@ -28,6 +140,7 @@ class MessageManager:
                 message = await context.bot.send_message(chat_id, text, **kwargs)
 
             user_id = update.effective_user.id
+            await self._record_delivery(message.chat_id, SENT)
 
             if is_notification:
                 # Уведомления никогда не очищаются автоматически
@@ -41,7 +154,7 @@ class MessageManager:
                 self.temporary_messages[user_id].append(message.message_id)
 
                 # Запланировать удаление временного сообщения
-                asyncio.create_task(self._delete_temporary_message(context, user_id, message.message_id))
+                self.deletions.schedule(context.bot, user_id, message.message_id)
             else:
                 # Постоянные сообщения (меню)
                 if user_id not in self.permanent_messages:
@@ -58,7 +171,12 @@ class MessageManager:
                                    **kwargs) -> Message:
         """Отправляет сообщение в указанный чат"""
         try:
-            message = await context.bot.send_message(chat_id, text, **kwargs)
+            try:
+                message = await context.bot.send_message(chat_id, text, **kwargs)
+            except Exception as e:
+                await self._record_delivery(chat_id, delivery_state(e))
+                raise
+            await self._record_delivery(chat_id, SENT)
 
             if is_notification:
                 # Уведомления никогда не очищаются автоматически
@@ -71,7 +189,7 @@ class MessageManager:
                     self.temporary_messages[chat_id] = []
                 self.temporary_messages[chat_id].append(message.message_id)
 
-                asyncio.create_task(self._delete_temporary_message(context, chat_id, message.message_id))
+                self.deletions.schedule(context.bot, chat_id, message.message_id)
             else:
                 if chat_id not in self.permanent_messages:
                     self.permanent_messages[chat_id] = []
@@ -82,31 +200,52 @@ class MessageManager:
             logger.error(f"Ошибка при отправке сообщения в чат {chat_id}: {e}")
             raise
 
-    async def _delete_temporary_message(self, context: ContextTypes.DEFAULT_TYPE,
-                                        chat_id: int, message_id: int):
-        """Удаляет временное сообщение после задержки"""
-        await asyncio.sleep(MESSAGE_CLEANUP_DELAY)
-        try:
-            # Проверяем, не является ли сообщение уведомлением или постоянным
-            if (chat_id in self.notification_messages and
-                    message_id in self.notification_messages[chat_id]):
-                return  # Не удаляем уведомления
-
-            if (chat_id in self.permanent_messages and
-                    message_id in self.permanent_messages[chat_id]):
-                return  # Не удаляем постоянные сообщения
+    async def notify_user(self, context: ContextTypes.DEFAULT_TYPE, telegram_id: int,
+                          text: str, **kwargs) -> Optional[Message]:
+        """Отправляет уведомление пользователю, если его чат доступен.
 
-            await context.bot.delete_message(chat_id, message_id)
+        Временные профили гостей (telegram_id <= 0) и пользователи, заблокировавшие
+        бота, пропускаются без обращения к Telegram - тогда возвращается None.
+        Итог отправки записывается в users.reachability.
+        """
+        if not await get_db().aget_user_reachable(telegram_id):
+            logger.info(f"Уведомление пользователю {telegram_id} не отправлено: чат недоступен")
+            return None
+        try:
+            message = await context.bot.send_message(telegram_id, text, **kwargs)
+        except Exception as e:
+            await self._record_delivery(telegram_id, delivery_state(e))
+            raise
+        await self._record_delivery(telegram_id, SENT)
+        return message
 
-            # Удаляем из списка временных сообщений
-            if (chat_id in self.temporary_messages and
-                    message_id in self.temporary_messages[chat_id]):
-                self.temporary_messages[chat_id].remove(message_id)
+    async def _record_delivery(self, chat_id: int, state: str):
+        """Записывает доступность чата; об успешной отправке - один раз за запуск"""
+        if state == SENT:
+            if chat_id in self.reachable_chats:
+                return
+            self.reachable_chats.add(chat_id)
+        else:
+            self.reachable_chats.discard(chat_id)
+        try:
+            await get_db().arecord_delivery(chat_id, state)
         except Exception as e:
-            logger.debug(f"Не удалось удалить временное сообщение {message_id} для {chat_id}: {e}")
+            logger.error(f"Не удалось записать доступность чата {chat_id}: {e}")
+
+    def _forget_temporary(self, chat_id: int, message_ids: List[int]):
+        """Убирает из списка временных сообщения, удаленные планировщиком"""
+        deleted = set(message_ids)
+        remaining = [message_id for message_id in self.temporary_messages.get(chat_id, [])
+                     if message_id not in deleted]
+        if remaining:
+            self.temporary_messages[chat_id] = remaining
+        else:
+            self.temporary_messages.pop(chat_id, None)
 
     async def cleanup_user_messages(self, context: ContextTypes.DEFAULT_TYPE, user_id: int):
         """Очищает все временные сообщения пользователя (но не уведомления)"""
+        # Сообщения удаляются сейчас, отложенное удаление больше не нужно
+        self.deletions.cancel(user_id)
         if user_id in self.temporary_messages:
             for message_id in self.temporary_messages[user_id][:]:
                 try:
@@ -121,6 +260,7 @@ class MessageManager:
             deleted_count = 0
 
             # Очищаем временные сообщения
+            self.deletions.cancel(user_id)
             if user_id in self.temporary_messages:
                 for message_id in self.temporary_messages[user_id][:]:
                     try:
@@ -1,75 +1,41 @@
 import sqlite3
-from datetime import datetime, timedelta
-import pytz
 
+from config import DB_NAME
 
-def migrate_database():
-    db_name = 'loyalty_bot.db'
-
-    conn = sqlite3.connect(db_name)
-    cursor = conn.cursor()
-
-    try:
-        print("🔄 Начинаем миграцию временных данных...")
-
-        # Функция для конвертации UTC в московское время
-        def convert_utc_to_moscow(utc_time_str):
-            try:
-                utc_time = datetime.strptime(utc_time_str, '%Y-%m-%d %H:%M:%S')
-                moscow_time = utc_time + timedelta(hours=3)
-                return moscow_time.strftime('%Y-%m-%d %H:%M:%S')
-            except:
-                return utc_time_str
+# Колонки с датой в UTC, которые нужно перевести в московское время
+TIME_COLUMNS = [
+    ('users', 'registration_date'),
+    ('transactions', 'date'),
+    ('bookings', 'created_at'),
+    ('bonus_requests', 'created_at'),
+    ('referrals', 'created_at'),
+]
 
-        # Мигрируем таблицу users
-        print("📊 Мигрируем таблицу users...")
-        cursor.execute("SELECT id, registration_date FROM users")
-        users = cursor.fetchall()
+# Обновляются только значения ровно в формате 'YYYY-MM-DD HH:MM:SS'
+DATETIME_GLOB = '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9]'
 
-        for user_id, reg_date in users:
-            if reg_date:
-                new_date = convert_utc_to_moscow(reg_date)
-                cursor.execute("UPDATE users SET registration_date = ? WHERE id = ?", (new_date, user_id))
 
-        # Мигрируем таблицу transactions
-        print("📊 Мигрируем таблицу transactions...")
-        cursor.execute("SELECT id, date FROM transactions")
-        transactions = cursor.fetchall()
-
-        for trans_id, trans_date in transactions:
-            if trans_date:
-                new_date = convert_utc_to_moscow(trans_date)
-                cursor.execute("UPDATE transactions SET date = ? WHERE id = ?", (new_date, trans_id))
-
-        # Мигрируем таблицу bookings
-        print("📊 Мигрируем таблицу bookings...")
-        cursor.execute("SELECT id, created_at FROM bookings")
-        bookings = cursor.fetchall()
-
-        for booking_id, created_at in bookings:
-            if created_at:
-                new_date = convert_utc_to_moscow(created_at)
-                cursor.execute("UPDATE bookings SET created_at = ? WHERE id = ?", (new_date, booking_id))
+def migrate_database():
+    """Одноразовый перевод старых дат из UTC в московское время (UTC+3).
 
-        # Мигрируем таблицу bonus_requests
-        print("📊 Мигрируем таблицу bonus_requests...")
-        cursor.execute("SELECT id, created_at FROM bonus_requests")
-        requests = cursor.fetchall()
+    Каждая таблица обновляется одним UPDATE, все таблицы - в одной транзакции.
+    Скрипт не входит в автоматические миграции: повторный запуск сдвинет
+    время еще на 3 часа.
+    """
+    db_name = DB_NAME
 
-        for request_id, created_at in requests:
-            if created_at:
-                new_date = convert_utc_to_moscow(created_at)
-                cursor.execute("UPDATE bonus_requests SET created_at = ? WHERE id = ?", (new_date, request_id))
+    conn = sqlite3.connect(db_name)
 
-        # Мигрируем таблицу referrals
-        print("📊 Мигрируем таблицу referrals...")
-        cursor.execute("SELECT id, created_at FROM referrals")
-        referrals = cursor.fetchall()
+    try:
+        print("🔄 Начинаем миграцию временных данных...")
 
-        for referral_id, created_at in referrals:
-            if created_at:
-                new_date = convert_utc_to_moscow(created_at)
-                cursor.execute("UPDATE referrals SET created_at = ? WHERE id = ?", (new_date, referral_id))
+        for table, column in TIME_COLUMNS:
+            print(f"📊 Мигрируем таблицу {table}...")
+            cursor = conn.execute(
+                f"UPDATE {table} SET {column} = datetime({column}, '+3 hours') WHERE {column} GLOB ?",
+                (DATETIME_GLOB,)
+            )
+            print(f"   обновлено записей: {cursor.rowcount}")
 
         conn.commit()
         print("✅ Миграция завершена успешно!")
@@ -82,4 +48,4 @@ def migrate_database():
 
 
 if __name__ == '__main__':
-    migrate_database()
\ No newline at end of file
+    migrate_database()
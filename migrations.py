@@ -0,0 +1,663 @@
+"""
+Версионированные миграции схемы базы данных.
+
+Номер примененной версии хранится в PRAGMA user_version, поэтому при запуске
+достаточно сравнить одно число с номером последней миграции. Каждая миграция
+применяется ровно один раз и в своей транзакции (вместе с обновлением
+user_version). Миграции больших таблиц объявляются с batched=True: они сами
+фиксируют изменения порциями через update_in_batches и должны быть
+идемпотентными, чтобы прерванную миграцию можно было безопасно перезапустить.
+
+Новая миграция добавляется функцией с декоратором @migration и следующим номером.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_BATCH_SIZE = 1000
+
+# (версия, описание, batched, функция)
+MIGRATIONS = []
+
+
+def migration(version, description, batched=False):
+    """Зарегистрировать функцию как миграцию с указанным номером"""
+
+    def decorator(func):
+        if any(existing[0] == version for existing in MIGRATIONS):
+            raise ValueError(f"Миграция {version} уже зарегистрирована")
+        MIGRATIONS.append((version, description, batched, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+
+    return decorator
+
+
+def latest_version():
+    """Номер последней известной миграции"""
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def get_schema_version(conn):
+    """Текущая версия схемы базы данных"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def apply_migrations(conn):
+    """Применить все недостающие миграции. Возвращает количество примененных"""
+    current = get_schema_version(conn)
+    pending = [m for m in MIGRATIONS if m[0] > current]
+    if not pending:
+        return 0
+
+    for version, description, batched, func in pending:
+        print(f"🔄 Миграция {version}: {description}")
+        if conn.in_transaction:
+            conn.commit()
+
+        if batched:
+            # Порции фиксируются внутри самой миграции, версия записывается в конце
+            func(conn)
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        else:
+            conn.execute('BEGIN')
+            try:
+                func(conn)
+                conn.execute(f'PRAGMA user_version = {int(version)}')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                logger.error(f"Миграция {version} ({description}) не применена")
+                raise
+
+    print(f"✅ Схема базы данных обновлена до версии {latest_version()}")
+    return len(pending)
+
+
+def update_in_batches(conn, table, set_sql, where_sql, params=(), batch_size=MIGRATION_BATCH_SIZE):
+    """Выполнить UPDATE порциями по id, фиксируя каждую порцию отдельно.
+
+    where_sql должен исключать уже обновленные строки - тогда повторный запуск
+    прерванной миграции продолжит с того места, где она остановилась.
+    params подставляются в set_sql и where_sql (в этом порядке).
+    Возвращает количество обновленных строк.
+    """
+    last_id = 0
+    updated = 0
+    while True:
+        row = conn.execute(f'''
+            SELECT MAX(id) FROM (
+                SELECT id FROM {table} WHERE id > ? ORDER BY id LIMIT ?
+            )
+        ''', (last_id, batch_size)).fetchone()
+        if row[0] is None:
+            break
+
+        cursor = conn.execute(
+            f'UPDATE {table} SET {set_sql} WHERE ({where_sql}) AND id > ? AND id <= ?',
+            (*params, last_id, row[0])
+        )
+        conn.commit()
+        updated += cursor.rowcount
+        last_id = row[0]
+    return updated
+
+
+def _table_exists(conn, name):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def _index_exists(conn, name):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='index' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def _columns(conn, table):
+    return [column[1] for column in conn.execute(f'PRAGMA table_info({table})').fetchall()]
+
+
+@migration(1, 'базовая схема')
+def _base_schema(conn):
+    """Создать таблицы и довести до актуального вида базы, созданные старыми версиями бота.
+
+    Это единственное место, где структура таблиц проверяется через PRAGMA table_info:
+    для существующих баз миграция выполняется один раз при переходе на версионирование.
+    """
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            telegram_id INTEGER UNIQUE,
+            first_name TEXT,
+            last_name TEXT,
+            phone TEXT,
+            bonus_balance INTEGER DEFAULT 0,
+            registration_date TEXT,
+            is_active BOOLEAN DEFAULT TRUE,
+            referred_by INTEGER DEFAULT NULL,
+            FOREIGN KEY (referred_by) REFERENCES users (id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            amount INTEGER,
+            type TEXT, -- 'earn' или 'spend'
+            description TEXT,
+            date TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bookings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            booking_date TEXT,
+            booking_time TEXT,
+            guests INTEGER,
+            status TEXT DEFAULT 'pending',
+            created_at TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bonus_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            amount INTEGER,
+            status TEXT DEFAULT 'pending',
+            created_at TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS referrals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            referrer_id INTEGER,
+            referred_id INTEGER UNIQUE,
+            bonus_awarded BOOLEAN DEFAULT FALSE,
+            created_at TEXT,
+            FOREIGN KEY (referrer_id) REFERENCES users (id),
+            FOREIGN KEY (referred_id) REFERENCES users (id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_number INTEGER,
+            admin_id INTEGER,
+            status TEXT DEFAULT 'active', -- 'active' или 'closed'
+            created_at TEXT,
+            closed_at TEXT,
+            payment_method TEXT DEFAULT NULL
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER,
+            item_name TEXT,
+            price INTEGER,
+            quantity INTEGER DEFAULT 1,
+            added_at TEXT,
+            FOREIGN KEY (order_id) REFERENCES orders (id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS menu_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE,
+            price INTEGER,
+            category TEXT,
+            is_active BOOLEAN DEFAULT TRUE
+        )
+    ''')
+
+    # Колонки, добавленные в таблицы после первых версий бота
+    missing_columns = [
+        ('users', 'referred_by', 'INTEGER DEFAULT NULL'),
+        ('orders', 'closed_at', 'TEXT'),
+        ('orders', 'payment_method', 'TEXT DEFAULT NULL'),
+        ('menu_items', 'is_active', 'BOOLEAN DEFAULT TRUE'),
+    ]
+    for table, column, definition in missing_columns:
+        if column not in _columns(conn, table):
+            print(f"🔄 Добавляем колонку {column} в таблицу {table}...")
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+    _create_shift_tables(conn)
+
+
+def _create_shift_tables(conn):
+    """Создать shifts/shift_sales; старую таблицу shifts без уникального
+    индекса (shift_number, month_year) пересоздать с сохранением данных"""
+    cursor = conn.cursor()
+    shifts_exists = _table_exists(conn, 'shifts')
+
+    if shifts_exists and _index_exists(conn, 'idx_shift_month'):
+        if 'month_year' not in _columns(conn, 'shifts'):
+            cursor.execute('ALTER TABLE shifts ADD COLUMN month_year TEXT')
+        cursor.execute('''
+            UPDATE shifts SET month_year = substr(opened_at, 1, 7)
+            WHERE month_year IS NULL AND opened_at IS NOT NULL
+        ''')
+        return
+
+    if shifts_exists:
+        print("🔄 Переименовываем старую таблицу shifts...")
+        cursor.execute('ALTER TABLE shifts RENAME TO shifts_old')
+    if _table_exists(conn, 'shift_sales'):
+        print("🔄 Переименовываем старую таблицу shift_sales...")
+        cursor.execute('ALTER TABLE shift_sales RENAME TO shift_sales_old')
+
+    cursor.execute('''
+        CREATE TABLE shifts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            shift_number INTEGER,
+            month_year TEXT, -- Формат: 'YYYY-MM' для группировки по месяцам
+            admin_id INTEGER,
+            opened_at TEXT,
+            closed_at TEXT,
+            total_revenue INTEGER DEFAULT 0,
+            total_orders INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'open',
+            FOREIGN KEY (admin_id) REFERENCES users (id)
+        )
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX idx_shift_month ON shifts (shift_number, month_year)')
+
+    cursor.execute('''
+        CREATE TABLE shift_sales (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            shift_id INTEGER,
+            item_name TEXT,
+            quantity INTEGER,
+            total_amount INTEGER,
+            FOREIGN KEY (shift_id) REFERENCES shifts (id)
+        )
+    ''')
+
+    if shifts_exists:
+        print("🔄 Восстанавливаем данные из старой таблицы shifts...")
+        old_columns = _columns(conn, 'shifts_old')
+        month_year = ('COALESCE(month_year, substr(opened_at, 1, 7))' if 'month_year' in old_columns
+                      else 'substr(opened_at, 1, 7)')
+        cursor.execute(f'''
+            INSERT INTO shifts (id, shift_number, month_year, admin_id, opened_at, closed_at,
+                                total_revenue, total_orders, status)
+            SELECT id, shift_number, {month_year},
+                   admin_id, opened_at, closed_at, total_revenue, total_orders, status
+            FROM shifts_old
+            ORDER BY id
+        ''')
+        if _table_exists(conn, 'shift_sales_old'):
+            cursor.execute('''
+                INSERT INTO shift_sales (shift_id, item_name, quantity, total_amount)
+                SELECT shift_id, item_name, quantity, total_amount
+                FROM shift_sales_old
+            ''')
+        cursor.execute('DROP TABLE IF EXISTS shifts_old')
+        cursor.execute('DROP TABLE IF EXISTS shift_sales_old')
+        print("✅ Данные успешно восстановлены")
+
+
+# Вторичные индексы: (имя, таблица, колонки) и запросы, которые они обслуживают.
+# Новые индексы добавляются отдельной миграцией, этот список больше не меняется
+SECONDARY_INDEXES = [
+    # get_active_orders, get_all_closed_orders, get_active_order_by_table
+    # (status, created_at обслуживает idx_orders_status_created_payment из миграции 5)
+    ('idx_orders_status_closed', 'orders', 'status, closed_at'),
+    ('idx_orders_table_status', 'orders', 'table_number, status'),
+    # get_orders_by_shift_id, get_orders_by_date
+    ('idx_orders_created', 'orders', 'created_at'),
+    # get_order_items, get_order_total, remove_item_from_order
+    ('idx_order_items_order', 'order_items', 'order_id, item_name'),
+    # get_user_bookings, get_user_bookings_by_date
+    ('idx_bookings_user', 'bookings', 'user_id, created_at'),
+    # get_bookings_by_status, get_bookings_by_date
+    ('idx_bookings_status_date', 'bookings', 'status, booking_date, booking_time'),
+    ('idx_bookings_date', 'bookings', 'booking_date, booking_time'),
+    # get_spent_bonuses_*
+    ('idx_transactions_type_date', 'transactions', 'type, date'),
+    # get_shift_sales
+    ('idx_shift_sales_shift', 'shift_sales', 'shift_id'),
+    # get_active_shift, get_shifts_by_period
+    ('idx_shifts_status_opened', 'shifts', 'status, opened_at'),
+    # find_user_by_phone
+    ('idx_users_phone', 'users', 'phone'),
+    # get_pending_requests
+    ('idx_bonus_requests_status', 'bonus_requests', 'status, created_at'),
+    # get_referrer_stats
+    ('idx_referrals_referrer', 'referrals', 'referrer_id'),
+]
+
+
+@migration(2, 'вторичные индексы для частых запросов')
+def _secondary_indexes(conn):
+    for name, table, columns in SECONDARY_INDEXES:
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})')
+
+
+# Базовое меню для новой базы данных
+DEFAULT_MENU_ITEMS = [
+    # Кальяны
+    ("Пенсионный", 800, "Кальяны"),
+    ("Стандарт", 1000, "Кальяны"),
+    ("Премиум", 1200, "Кальяны"),
+    ("Фруктовая чаша", 1500, "Кальяны"),
+    ("Сигарный", 1500, "Кальяны"),
+    ("Парфюм", 2000, "Кальяны"),
+
+    # Напитки
+    ("Вода", 100, "Напитки"),
+    ("Кола 0,5л", 100, "Напитки"),
+    ("Кола/Фанта/Спрайт 1л", 200, "Напитки"),
+    ("Пиво/Энергетик", 200, "Напитки"),
+
+    # Коктейли
+    ("В/кола", 400, "Коктейли"),
+    ("Санрайз", 400, "Коктейли"),
+    ("Лагуна", 400, "Коктейли"),
+    ("Фиеро", 400, "Коктейли"),
+    ("Пробирки", 600, "Коктейли"),
+
+    # Чай
+    ("Да Хун Пао", 400, "Чай"),
+    ("Те Гуань Инь", 400, "Чай"),
+    ("Шу пуэр", 400, "Чай"),
+    ("Сяо Чжун", 400, "Чай"),
+    ("Юэ Гуан Бай", 400, "Чай"),
+    ("Габа", 400, "Чай"),
+    ("Гречишный", 400, "Чай"),
+    ("Медовая дыня", 400, "Чай"),
+    ("Малина/Мята", 400, "Чай"),
+    ("Наглый фрукт", 400, "Чай"),
+    ("Вишневый пуэр", 500, "Чай"),
+    ("Марроканский", 500, "Чай"),
+    ("Голубика", 500, "Чай"),
+    ("Смородиновый", 500, "Чай"),
+    ("Клубничный", 500, "Чай"),
+    ("Облепиховый", 500, "Чай")
+]
+
+
+@migration(3, 'базовое меню для пустой базы')
+def _seed_menu(conn):
+    if conn.execute('SELECT COUNT(*) FROM menu_items').fetchone()[0]:
+        return
+    conn.executemany(
+        'INSERT OR IGNORE INTO menu_items (name, price, category, is_active) VALUES (?, ?, ?, TRUE)',
+        DEFAULT_MENU_ITEMS
+    )
+    print("✅ Таблица menu_items заполнена данными")
+
+
+@migration(4, 'категория "Кальяны" для кальянов')
+def _fix_hookah_categories(conn):
+    hookah_items = ["Пенсионный", "Стандарт", "Премиум", "Фруктовая чаша", "Сигарный", "Парфюм"]
+    placeholders = ', '.join('?' for _ in hookah_items)
+    conn.execute(f'''
+        UPDATE menu_items SET category = 'Кальяны'
+        WHERE name IN ({placeholders}) AND category IS NOT 'Кальяны'
+    ''', hookah_items)
+
+
+# Сумма и количество единиц заказа, вычисленные по order_items
+ORDER_TOTAL_SQL = '(SELECT COALESCE(SUM(price * quantity), 0) FROM order_items WHERE order_id = orders.id)'
+ORDER_ITEM_COUNT_SQL = '(SELECT COALESCE(SUM(quantity), 0) FROM order_items WHERE order_id = orders.id)'
+
+
+@migration(5, 'сумма и количество позиций в orders', batched=True)
+def _order_totals(conn):
+    columns = _columns(conn, 'orders')
+    if 'total_amount' not in columns:
+        conn.execute('ALTER TABLE orders ADD COLUMN total_amount INTEGER DEFAULT 0')
+    if 'item_count' not in columns:
+        conn.execute('ALTER TABLE orders ADD COLUMN item_count INTEGER DEFAULT 0')
+    # Покрывающий индекс для статистики по оплате: суммы читаются без обращения к order_items.
+    # Он начинается с (status, created_at) и заменяет idx_orders_status_created
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_orders_status_created_payment
+        ON orders (status, created_at, payment_method, total_amount)
+    ''')
+    conn.execute('DROP INDEX IF EXISTS idx_orders_status_created')
+    conn.commit()
+
+    updated = update_in_batches(
+        conn, 'orders',
+        f'total_amount = {ORDER_TOTAL_SQL}, item_count = {ORDER_ITEM_COUNT_SQL}',
+        f'total_amount IS NOT {ORDER_TOTAL_SQL} OR item_count IS NOT {ORDER_ITEM_COUNT_SQL}'
+    )
+    print(f"✅ Суммы пересчитаны для {updated} заказов")
+
+
+@migration(6, 'индекс смен по статусу и месяцу')
+def _shift_month_index(conn):
+    # get_shifts, get_sales_statistics, get_total_revenue, get_shift_months
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_shifts_status_month ON shifts (status, month_year)')
+
+
+@migration(7, 'сводные таблицы по дням и месяцам для истории')
+def _rollup_tables(conn):
+    import rollups
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_totals (
+            grain TEXT NOT NULL, -- 'day' или 'month'
+            period TEXT NOT NULL, -- 'YYYY-MM-DD' или 'YYYY-MM'
+            revenue INTEGER DEFAULT 0,
+            shifts_count INTEGER DEFAULT 0,
+            spent_bonuses INTEGER DEFAULT 0,
+            PRIMARY KEY (grain, period)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_item_sales (
+            grain TEXT NOT NULL,
+            period TEXT NOT NULL,
+            item_name TEXT NOT NULL,
+            quantity INTEGER DEFAULT 0,
+            total_amount INTEGER DEFAULT 0,
+            PRIMARY KEY (grain, period, item_name)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_payments (
+            grain TEXT NOT NULL,
+            period TEXT NOT NULL,
+            payment_method TEXT NOT NULL,
+            orders_count INTEGER DEFAULT 0,
+            total_amount INTEGER DEFAULT 0,
+            PRIMARY KEY (grain, period, payment_method)
+        ) WITHOUT ROWID
+    ''')
+    rollups.rebuild(conn)
+
+
+@migration(8, 'индекс активных пользователей для постраничного списка')
+def _active_users_index(conn):
+    # get_users_page, count_active_users: страница и COUNT читаются только из индекса
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_active ON users (is_active)')
+
+
+def _digits_sql(value):
+    """SQL: только цифры из номера телефона (убираются +, пробелы, дефисы и скобки)"""
+    for char in '+ -()':
+        value = f"replace({value}, '{char}', '')"
+    return value
+
+
+def user_search_values_sql(row):
+    """SQL-выражения колонок users_fts (name, phone, telegram_id) для строки row (new/old/users).
+
+    Имя хранится с заменой ё на е. Телефон - цифрами целиком, без первой цифры
+    (код страны или 8) и последние 4 цифры, чтобы находить номер по любому из
+    этих начал.
+    """
+    name = f"coalesce({row}.first_name, '') || ' ' || coalesce({row}.last_name, '')"
+    name = f"replace(replace({name}, 'ё', 'е'), 'Ё', 'Е')"
+    digits = _digits_sql(f"coalesce({row}.phone, '')")
+    phone = f"{digits} || ' ' || substr({digits}, 2) || ' ' || substr({digits}, -4)"
+    return f"{name}, {phone}, coalesce({row}.telegram_id, '')"
+
+
+@migration(9, 'полнотекстовый поиск пользователей (FTS5)')
+def _user_search_index(conn):
+    # search_users: индекс без копии данных (content=''), строки берутся из users по rowid.
+    # prefix='2 3' - готовые индексы префиксов для поиска по началу слова
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+            name, phone, telegram_id,
+            content='', tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    ''')
+    columns = 'rowid, name, phone, telegram_id'
+    delete = (f"INSERT INTO users_fts (users_fts, {columns}) "
+              f"VALUES ('delete', old.id, {user_search_values_sql('old')});")
+    insert = f"INSERT INTO users_fts ({columns}) VALUES (new.id, {user_search_values_sql('new')});"
+    triggers = {
+        'users_fts_insert': ('AFTER INSERT ON users', insert),
+        'users_fts_delete': ('AFTER DELETE ON users', delete),
+        'users_fts_update': ('AFTER UPDATE OF first_name, last_name, phone, telegram_id ON users',
+                             f'{delete} {insert}'),
+    }
+    for name, (event, body) in triggers.items():
+        conn.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END')
+    conn.execute('DELETE FROM users_fts')
+    conn.execute(f"INSERT INTO users_fts ({columns}) SELECT id, {user_search_values_sql('users')} FROM users")
+
+
+@migration(10, 'телефон в формате E.164 с уникальным индексом')
+def _phone_e164(conn):
+    from utils.helpers import normalize_phone
+
+    if 'phone_e164' not in _columns(conn, 'users'):
+        conn.execute('ALTER TABLE users ADD COLUMN phone_e164 TEXT')
+    # Номер принадлежит одному пользователю: при совпадении - зарегистрированному
+    # (telegram_id > 0) и последнему по id. У остальных (временные профили гостей,
+    # созданные из-за другого формата номера) phone_e164 остается пустым
+    owners = {}
+    for user_id, phone in conn.execute('SELECT id, phone FROM users ORDER BY telegram_id > 0, id'):
+        phone_e164 = normalize_phone(phone)
+        if phone_e164:
+            owners[phone_e164] = user_id
+    conn.execute('UPDATE users SET phone_e164 = NULL WHERE phone_e164 IS NOT NULL')
+    conn.executemany('UPDATE users SET phone_e164 = ? WHERE id = ?', owners.items())
+    # find_user_by_phone; индекс по исходному phone больше не используется
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_users_phone_e164 ON users (phone_e164)')
+    conn.execute('DROP INDEX IF EXISTS idx_users_phone')
+
+
+# Дата и время брони 'YYYY-MM-DD HH:MM:SS' из booking_date 'DD.MM.YYYY' и booking_time 'HH:MM'
+# (NULL для даты в другом формате); сортируется и сравнивается как строка
+BOOKING_AT_SQL = '''
+    CASE WHEN booking_date GLOB '[0-9][0-9].[0-9][0-9].[0-9][0-9][0-9][0-9]' THEN
+        substr(booking_date, 7, 4) || '-' || substr(booking_date, 4, 2) || '-' || substr(booking_date, 1, 2)
+        || ' ' || CASE WHEN booking_time GLOB '[0-9][0-9]:[0-9][0-9]' THEN booking_time || ':00'
+                       ELSE '00:00:00' END
+    END
+'''
+
+
+@migration(11, 'дата брони в формате ISO и индексы по ней')
+def _booking_at(conn):
+    if 'booking_at' not in _columns(conn, 'bookings'):
+        conn.execute('ALTER TABLE bookings ADD COLUMN booking_at TEXT')
+    # Колонка заполняется триггерами при любой записи в bookings (обычная, а не вычисляемая
+    # колонка: индекс по ней покрывающий, запросы по датам не читают таблицу)
+    update = f'UPDATE bookings SET booking_at = {BOOKING_AT_SQL} WHERE id = new.id;'
+    conn.execute(f'CREATE TRIGGER IF NOT EXISTS bookings_at_insert AFTER INSERT ON bookings BEGIN {update} END')
+    conn.execute(f'CREATE TRIGGER IF NOT EXISTS bookings_at_update '
+                 f'AFTER UPDATE OF booking_date, booking_time ON bookings BEGIN {update} END')
+    conn.execute(f'UPDATE bookings SET booking_at = {BOOKING_AT_SQL}')
+    # get_booking_years/months/days, get_bookings_by_date, get_all_bookings_sorted
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_bookings_at ON bookings (booking_at)')
+    # те же запросы по одному пользователю, get_user_bookings_by_date
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_bookings_user_at ON bookings (user_id, booking_at)')
+    # get_bookings_by_status, get_bookings_page, count_bookings
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_bookings_status_at ON bookings (status, booking_at)')
+    # Индексы по тексту 'DD.MM.YYYY' заменены индексами по booking_at
+    conn.execute('DROP INDEX IF EXISTS idx_bookings_status_date')
+    conn.execute('DROP INDEX IF EXISTS idx_bookings_date')
+
+
+@migration(12, 'очередь рассылок с состоянием доставки каждому получателю')
+def _broadcast_queue(conn):
+    # Рассылка хранится как задание: ссылка на сообщение администратора (текст
+    # сохраняется целиком, медиа копируется из from_chat_id/message_id)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS broadcast_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_chat_id INTEGER NOT NULL,
+            from_chat_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            text TEXT,
+            has_caption BOOLEAN DEFAULT FALSE,
+            status TEXT DEFAULT 'running',
+            created_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    # state: pending -> sending -> sent / failed / blocked. Строка переходит в sending
+    # до отправки, поэтому после перезапуска видно, кому сообщение могло уже уйти
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS broadcast_recipients (
+            job_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            telegram_id INTEGER NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (job_id, user_id),
+            FOREIGN KEY (job_id) REFERENCES broadcast_jobs (id)
+        ) WITHOUT ROWID
+    ''')
+    # get_pending_broadcast_recipients, get_broadcast_progress, reset_interrupted_broadcasts
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_broadcast_recipients_state '
+                 'ON broadcast_recipients (job_id, state)')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_status ON broadcast_jobs (status)")
+
+
+@migration(13, 'доступность чата пользователя для рассылок и уведомлений')
+def _user_reachability(conn):
+    # reachability: unknown, reachable или blocked (бот заблокирован, чат удален).
+    # Обновляется при каждой отправке пользователю; blocked пропускаются рассылками
+    # и уведомлениями до повторной проверки (Database.record_delivery)
+    columns = _columns(conn, 'users')
+    if 'reachability' not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN reachability TEXT DEFAULT 'unknown'")
+    if 'reachability_checked_at' not in columns:
+        conn.execute('ALTER TABLE users ADD COLUMN reachability_checked_at TIMESTAMP')
+    # Итоги уже выполненных рассылок
+    conn.execute('''
+        UPDATE users SET
+            reachability = CASE r.state WHEN 'sent' THEN 'reachable' ELSE 'blocked' END,
+            reachability_checked_at = r.updated_at
+        FROM (
+            SELECT telegram_id, state, MAX(updated_at) AS updated_at FROM broadcast_recipients
+            WHERE state IN ('sent', 'blocked') GROUP BY telegram_id
+        ) AS r
+        WHERE users.telegram_id = r.telegram_id
+    ''')
+
+
+@migration(14, 'сообщение о ходе рассылки в задании')
+def _broadcast_status_message(conn):
+    # Сообщение администратору о ходе рассылки создается один раз на задание и
+    # правится дальше, в том числе после повторных попыток и перезапуска бота
+    if 'status_message_id' not in _columns(conn, 'broadcast_jobs'):
+        conn.execute('ALTER TABLE broadcast_jobs ADD COLUMN status_message_id INTEGER')
@@ -0,0 +1,140 @@
+"""
+Периоды для отчетов и статистики.
+
+Период - полуоткрытый интервал [start, end) по строковым меткам времени в формате
+базы данных ('YYYY-MM-DD HH:MM:SS'). Условие строится как ``col >= ? AND col < ?``
+без функций над колонкой, поэтому запросы используют индексы.
+"""
+from datetime import datetime, date, time, timedelta
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _parse(value):
+    """Привести дату/время или строку 'YYYY-MM-DD[ HH:MM:SS]' к datetime"""
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    value = str(value)
+    if len(value) == 10:
+        return datetime.strptime(value, '%Y-%m-%d')
+    return datetime.strptime(value[:19], DATETIME_FORMAT)
+
+
+def _month_start(year, month):
+    return datetime(int(year), int(month), 1)
+
+
+def _next_month(moment):
+    if moment.month == 12:
+        return datetime(moment.year + 1, 1, 1)
+    return datetime(moment.year, moment.month + 1, 1)
+
+
+class Period:
+    """Полуоткрытый интервал [start, end); None на любой границе означает отсутствие ограничения"""
+
+    __slots__ = ('start', 'end')
+
+    def __init__(self, start=None, end=None):
+        self.start = _parse(start)
+        self.end = _parse(end)
+
+    def __repr__(self):
+        return f"Period({self.start!r}, {self.end!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, Period) and (self.start, self.end) == (other.start, other.end)
+
+    @classmethod
+    def all(cls):
+        """Без ограничений"""
+        return cls()
+
+    @classmethod
+    def day(cls, day):
+        """Сутки: day может быть date/datetime или строкой 'YYYY-MM-DD'"""
+        start = _parse(day).replace(hour=0, minute=0, second=0, microsecond=0)
+        return cls(start, start + timedelta(days=1))
+
+    @classmethod
+    def month(cls, year, month):
+        """Календарный месяц (month - число или строка '01'..'12')"""
+        start = _month_start(year, month)
+        return cls(start, _next_month(start))
+
+    @classmethod
+    def year(cls, year):
+        """Календарный год"""
+        return cls(datetime(int(year), 1, 1), datetime(int(year) + 1, 1, 1))
+
+    @classmethod
+    def shift(cls, opened_at, closed_at=None):
+        """Смена от открытия до закрытия включительно; у открытой смены конца нет"""
+        end = _parse(closed_at) + timedelta(seconds=1) if closed_at else None
+        return cls(opened_at, end)
+
+    @classmethod
+    def between(cls, start, end):
+        """Произвольный диапазон [start, end)"""
+        return cls(start, end)
+
+    @classmethod
+    def current(cls, name, now=None):
+        """Текущий месяц ('month') или год ('year'); любое другое значение - весь период"""
+        now = now or datetime.now()
+        if name == 'month':
+            return cls.month(now.year, now.month)
+        if name == 'year':
+            return cls.year(now.year)
+        return cls.all()
+
+    def where(self, column):
+        """Условие и параметры для колонки с меткой времени 'YYYY-MM-DD HH:MM:SS'"""
+        return self._where(column, self.start and self.start.strftime(DATETIME_FORMAT),
+                           self.end and self.end.strftime(DATETIME_FORMAT))
+
+    def where_month(self, column):
+        """Условие и параметры для колонки месяца 'YYYY-MM' (shifts.month_year).
+
+        Месяц попадает в период, если период его задевает: конец округляется вверх
+        до начала следующего месяца.
+        """
+        start = self.start and self.start.strftime('%Y-%m')
+        end = None
+        if self.end:
+            end_month = self.end if self.end == _month_start(self.end.year, self.end.month) \
+                else _next_month(self.end)
+            end = end_month.strftime('%Y-%m')
+        return self._where(column, start, end)
+
+    def rollup(self):
+        """Детализация сводных таблиц (rollups) для периода и условие по их колонке period.
+
+        Возвращает (grain, условие, параметры): 'month', если границы периода - начала
+        месяцев, 'day', если начала суток, иначе None - такой период считается по
+        исходным таблицам.
+        """
+        bounds = [bound for bound in (self.start, self.end) if bound is not None]
+        if all(bound.time() == time() and bound.day == 1 for bound in bounds):
+            grain, key_format = 'month', '%Y-%m'
+        elif all(bound.time() == time() for bound in bounds):
+            grain, key_format = 'day', '%Y-%m-%d'
+        else:
+            return None
+        condition, params = self._where('period', self.start and self.start.strftime(key_format),
+                                        self.end and self.end.strftime(key_format))
+        return grain, condition, params
+
+    @staticmethod
+    def _where(column, start, end):
+        conditions = []
+        params = []
+        if start is not None:
+            conditions.append(f'{column} >= ?')
+            params.append(start)
+        if end is not None:
+            conditions.append(f'{column} < ?')
+            params.append(end)
+        return (' AND '.join(conditions) or '1 = 1'), tuple(params)
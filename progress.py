@@ -0,0 +1,123 @@
+"""
+Ход длительных операций администратора в одном сообщении.
+
+Вместо нового сообщения или правки на каждый обработанный элемент
+ProgressReporter правит одно сообщение о ходе работы не чаще раза в interval
+секунд. Промежуточные обновления только запоминаются, в сообщение попадает
+последнее из них, так что число запросов к Telegram зависит от длительности
+операции, а не от количества элементов.
+"""
+import logging
+import time
+
+from telegram.error import BadRequest, RetryAfter
+
+from config import PROGRESS_UPDATE_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+def format_duration(seconds):
+    """Длительность для людей: '45 с', '3 мин 5 с', '1 ч 20 мин'"""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} с"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes} мин {seconds} с" if seconds else f"{minutes} мин"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} ч {minutes} мин" if minutes else f"{hours} ч"
+
+
+class ProgressReporter:
+    """Сообщение о ходе операции над total элементами.
+
+    edit(text, **kwargs) - корутина, правящая сообщение (например,
+    query.edit_message_text). done - сколько элементов уже обработано до начала
+    (при продолжении прерванной операции); скорость и оставшееся время
+    считаются только по элементам, обработанным в этом запуске.
+    """
+
+    def __init__(self, edit, total, title, done=0, interval=PROGRESS_UPDATE_INTERVAL, clock=time.monotonic):
+        self.edit = edit
+        self.total = total
+        self.title = title
+        self.done = done
+        self.details = None
+        self.interval = interval
+        self.clock = clock
+        self.edits = 0
+        self._initial = done
+        self._started = clock()
+        self._next_edit = self._started + interval
+        self._shown = None
+
+    def rate(self):
+        """Элементов в секунду в этом запуске (None, пока считать не по чему)"""
+        elapsed = self.clock() - self._started
+        processed = self.done - self._initial
+        if processed <= 0 or elapsed <= 0:
+            return None
+        return processed / elapsed
+
+    def render(self):
+        """Текст сообщения о ходе операции"""
+        percent = self.done / self.total * 100 if self.total else 100
+        text = f"🔄 {self.title}: {self.done}/{self.total} ({percent:.0f}%)\n"
+        if self.details:
+            text += f"{self.details}\n"
+        rate = self.rate()
+        if rate:
+            text += f"⚡ {rate:.1f} в секунду, ⏳ осталось ~{format_duration((self.total - self.done) / rate)}\n"
+        return text
+
+    def summary(self):
+        """Итог операции по умолчанию"""
+        text = f"✅ {self.title}: {self.done}/{self.total} за {format_duration(self.clock() - self._started)}\n"
+        if self.details:
+            text += f"{self.details}\n"
+        rate = self.rate()
+        if rate:
+            text += f"⚡ {rate:.1f} в секунду\n"
+        return text
+
+    async def advance(self, count=1, details=None):
+        """Отметить еще count обработанных элементов"""
+        await self.update(self.done + count, details)
+
+    async def update(self, done, details=None):
+        """Запомнить ход операции; сообщение правится, только если прошло interval секунд"""
+        self.done = done
+        if details is not None:
+            self.details = details
+        now = self.clock()
+        if now < self._next_edit:
+            return
+        # Срок следующей правки сдвигается до запроса: параллельные обновления
+        # за время правки только запоминаются
+        self._next_edit = now + self.interval
+        await self._edit(self.render())
+
+    async def finish(self, text=None, **kwargs):
+        """Показать итог (по умолчанию summary()); False, если сообщение изменить не удалось"""
+        return await self._edit(text or self.summary(), **kwargs)
+
+    async def _edit(self, text, **kwargs):
+        if text == self._shown and not kwargs:
+            return True
+        try:
+            await self.edit(text, **kwargs)
+        except RetryAfter as e:
+            self._next_edit = self.clock() + e.retry_after
+            logger.warning(f"Лимит Telegram при обновлении хода операции, пауза {e.retry_after} с")
+            return False
+        except BadRequest as e:
+            if "Message is not modified" not in str(e):
+                logger.error(f"Не удалось обновить ход операции: {e}")
+                return False
+        except Exception as e:
+            logger.error(f"Не удалось обновить ход операции: {e}")
+            return False
+        self._shown = text
+        self.edits += 1
+        return True
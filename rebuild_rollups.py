@@ -0,0 +1,24 @@
+# rebuild_rollups.py
+from database import get_db
+
+
+def rebuild_rollups():
+    """Пересчитать сводные таблицы истории по сменам, заказам и транзакциям"""
+    db = get_db()
+
+    print("🔄 ПЕРЕСЧЕТ СВОДНЫХ ТАБЛИЦ:")
+    print("=" * 50)
+
+    db.rebuild_rollups()
+
+    cursor = db.conn.cursor()
+    for table in ('rollup_totals', 'rollup_item_sales', 'rollup_payments'):
+        cursor.execute(f'SELECT grain, COUNT(*) FROM {table} GROUP BY grain ORDER BY grain')
+        counts = ', '.join(f"{grain}: {count}" for grain, count in cursor.fetchall()) or 'пусто'
+        print(f"  • {table}: {counts}")
+
+    print("✅ Сводные таблицы пересчитаны")
+
+
+if __name__ == '__main__':
+    rebuild_rollups()
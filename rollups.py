@@ -0,0 +1,128 @@
+"""
+Сводные таблицы (rollup) для экранов истории.
+
+Итоги хранятся по дням ('YYYY-MM-DD') и по месяцам ('YYYY-MM') в колонках
+grain/period:
+  rollup_totals     - выручка и число закрытых смен, сумма списанных бонусов;
+  rollup_item_sales - продажи по позициям;
+  rollup_payments   - количество и сумма закрытых заказов по способу оплаты.
+
+Показатели смен (выручка, продажи) относятся к месяцу смены (shifts.month_year)
+и к дню ее открытия, заказы и бонусы - к дате создания записи. Это те же правила,
+что и у запросов по сырым таблицам в Database.
+
+Сводки обновляются в транзакции, которая меняет исходные данные: при закрытии
+смены и заказа, смене способа оплаты и списании бонусов пересчитываются только
+затронутые день и месяц. rebuild() пересчитывает все с нуля.
+"""
+from datetime import datetime, timedelta
+
+# Длина ключа периода для каждой детализации
+GRAINS = {'day': 10, 'month': 7}
+
+
+def _day_range(day):
+    start = datetime.strptime(day, '%Y-%m-%d')
+    return f'{day} 00:00:00', (start + timedelta(days=1)).strftime('%Y-%m-%d 00:00:00')
+
+
+def _month_range(month):
+    start = datetime.strptime(month, '%Y-%m')
+    end = datetime(start.year + 1, 1, 1) if start.month == 12 else datetime(start.year, start.month + 1, 1)
+    return start.strftime('%Y-%m-%d 00:00:00'), end.strftime('%Y-%m-%d 00:00:00')
+
+
+def refresh_shift_totals(conn, opened_at, month_year):
+    """Пересчитать выручку и продажи по позициям за день открытия смены и за ее месяц"""
+    day = opened_at[:10]
+    day_start, day_end = _day_range(day)
+    buckets = [
+        ('day', day, 's.opened_at >= ? AND s.opened_at < ?', (day_start, day_end)),
+        ('month', month_year, 's.month_year = ?', (month_year,)),
+    ]
+    for grain, period, condition, params in buckets:
+        conn.execute(f'''
+            INSERT INTO rollup_totals (grain, period, revenue, shifts_count)
+            SELECT ?, ?, COALESCE(SUM(s.total_revenue), 0), COUNT(*)
+            FROM shifts s
+            WHERE s.status = 'closed' AND {condition}
+            ON CONFLICT (grain, period) DO UPDATE
+            SET revenue = excluded.revenue, shifts_count = excluded.shifts_count
+        ''', (grain, period, *params))
+
+        conn.execute('DELETE FROM rollup_item_sales WHERE grain = ? AND period = ?', (grain, period))
+        conn.execute(f'''
+            INSERT INTO rollup_item_sales (grain, period, item_name, quantity, total_amount)
+            SELECT ?, ?, ss.item_name, SUM(ss.quantity), SUM(ss.total_amount)
+            FROM shifts s
+            JOIN shift_sales ss ON ss.shift_id = s.id
+            WHERE s.status = 'closed' AND {condition}
+            GROUP BY ss.item_name
+        ''', (grain, period, *params))
+
+
+def refresh_payments(conn, created_at):
+    """Пересчитать статистику оплат за день и месяц создания заказа"""
+    day = created_at[:10]
+    for grain, period, (start, end) in (('day', day, _day_range(day)),
+                                        ('month', day[:7], _month_range(day[:7]))):
+        conn.execute('DELETE FROM rollup_payments WHERE grain = ? AND period = ?', (grain, period))
+        conn.execute('''
+            INSERT INTO rollup_payments (grain, period, payment_method, orders_count, total_amount)
+            SELECT ?, ?, payment_method, COUNT(*), COALESCE(SUM(total_amount), 0)
+            FROM orders
+            WHERE status = 'closed' AND created_at >= ? AND created_at < ?
+                AND payment_method IS NOT NULL
+            GROUP BY payment_method
+        ''', (grain, period, start, end))
+
+
+def add_spent_bonuses(conn, date, amount):
+    """Учесть списание бонусов (amount - сумма транзакции 'spend')"""
+    for grain, length in GRAINS.items():
+        conn.execute('''
+            INSERT INTO rollup_totals (grain, period, spent_bonuses)
+            VALUES (?, ?, ?)
+            ON CONFLICT (grain, period) DO UPDATE
+            SET spent_bonuses = spent_bonuses + excluded.spent_bonuses
+        ''', (grain, date[:length], amount))
+
+
+def rebuild(conn):
+    """Пересчитать все сводные таблицы с нуля (без commit)"""
+    for table in ('rollup_totals', 'rollup_item_sales', 'rollup_payments'):
+        conn.execute(f'DELETE FROM {table}')
+
+    for grain, length in GRAINS.items():
+        shift_period = 'substr(s.opened_at, 1, 10)' if grain == 'day' else 's.month_year'
+        conn.execute(f'''
+            INSERT INTO rollup_totals (grain, period, revenue, shifts_count)
+            SELECT ?, {shift_period}, COALESCE(SUM(s.total_revenue), 0), COUNT(*)
+            FROM shifts s
+            WHERE s.status = 'closed' AND {shift_period} IS NOT NULL
+            GROUP BY {shift_period}
+        ''', (grain,))
+        conn.execute(f'''
+            INSERT INTO rollup_item_sales (grain, period, item_name, quantity, total_amount)
+            SELECT ?, {shift_period}, ss.item_name, SUM(ss.quantity), SUM(ss.total_amount)
+            FROM shifts s
+            JOIN shift_sales ss ON ss.shift_id = s.id
+            WHERE s.status = 'closed' AND {shift_period} IS NOT NULL
+            GROUP BY {shift_period}, ss.item_name
+        ''', (grain,))
+        conn.execute(f'''
+            INSERT INTO rollup_totals (grain, period, spent_bonuses)
+            SELECT ?, substr(date, 1, {length}), SUM(amount)
+            FROM transactions
+            WHERE type = 'spend' AND date IS NOT NULL
+            GROUP BY substr(date, 1, {length})
+            ON CONFLICT (grain, period) DO UPDATE
+            SET spent_bonuses = excluded.spent_bonuses
+        ''', (grain,))
+        conn.execute(f'''
+            INSERT INTO rollup_payments (grain, period, payment_method, orders_count, total_amount)
+            SELECT ?, substr(created_at, 1, {length}), payment_method, COUNT(*), COALESCE(SUM(total_amount), 0)
+            FROM orders
+            WHERE status = 'closed' AND payment_method IS NOT NULL AND created_at IS NOT NULL
+            GROUP BY substr(created_at, 1, {length}), payment_method
+        ''', (grain,))
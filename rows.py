@@ -0,0 +1,112 @@
+"""
+Строки результатов запросов.
+
+Каждой таблице соответствует именованный кортеж (UserRow, OrderRow, ShiftRow, ...):
+поля доступны по имени (user.bonus_balance, order.created_at), лишних атрибутов
+у строк нет (__slots__ = ()). Запросы выбирают явный список колонок
+(UserRow.columns()), а не SELECT *: в старых базах в таблицах есть лишние колонки,
+которые сдвигали позиции. Порядок полей совпадает с базовой схемой.
+
+Поля после колонок таблицы заполняются из JOIN (например, имя пользователя у
+бронирования) и равны None, если запрос их не выбирает.
+"""
+from collections import namedtuple
+
+
+class _Row:
+    """Общая часть строк: список колонок для SELECT и row_factory для курсора"""
+
+    __slots__ = ()
+
+    @classmethod
+    def columns(cls, alias=None, fields=None):
+        """Колонки для SELECT через запятую: все колонки таблицы или только fields
+        (с псевдонимом таблицы, если он задан)"""
+        prefix = f'{alias}.' if alias else ''
+        return ', '.join(prefix + field for field in (fields or cls.table_fields))
+
+    @classmethod
+    def factory(cls, fields=None):
+        """row_factory для курсора.
+
+        Без fields запрос выбирает колонки таблицы (и поля из JOIN) в порядке полей
+        строки. С fields запрос выбирает только эти поля, остальные будут None.
+        """
+        if not fields:
+            return lambda cursor, row: cls(*row)
+
+        size = len(cls._fields)
+        positions = [cls._fields.index(field) for field in fields]
+
+        def make_row(cursor, row):
+            values = [None] * size
+            for position, value in zip(positions, row):
+                values[position] = value
+            return tuple.__new__(cls, values)
+
+        return make_row
+
+
+def _row_type(name, table_fields, joined_fields=()):
+    """Именованный кортеж для строки таблицы; поля из JOIN по умолчанию None"""
+    table_fields = tuple(table_fields.split())
+    row_type = namedtuple(name, table_fields + tuple(joined_fields),
+                          defaults=(None,) * len(joined_fields))
+    # Колонки таблицы; остальные поля строки приходят из JOIN
+    row_type.table_fields = table_fields
+    return row_type
+
+
+class UserRow(_Row, _row_type('UserRow', 'id telegram_id first_name last_name phone bonus_balance '
+                                         'registration_date is_active referred_by')):
+    """Пользователь (users)"""
+    __slots__ = ()
+
+
+class MenuItemRow(_Row, _row_type('MenuItemRow', 'id name price category is_active')):
+    """Позиция меню (menu_items)"""
+    __slots__ = ()
+
+
+class OrderRow(_Row, _row_type('OrderRow', 'id table_number admin_id status created_at closed_at '
+                                           'payment_method total_amount item_count',
+                               ('admin_first_name', 'admin_last_name'))):
+    """Заказ (orders); admin_first_name/admin_last_name - из JOIN с users"""
+    __slots__ = ()
+
+
+class OrderItemRow(_Row, _row_type('OrderItemRow', 'id order_id item_name price quantity added_at')):
+    """Позиция заказа (order_items)"""
+    __slots__ = ()
+
+
+class ShiftRow(_Row, _row_type('ShiftRow', 'id shift_number month_year admin_id opened_at closed_at '
+                                           'total_revenue total_orders status')):
+    """Смена (shifts)"""
+    __slots__ = ()
+
+
+class BookingRow(_Row, _row_type('BookingRow', 'id user_id booking_date booking_time guests status created_at',
+                                 ('first_name', 'last_name', 'phone', 'telegram_id'))):
+    """Бронирование (bookings); first_name, last_name, phone, telegram_id - из JOIN с users"""
+    __slots__ = ()
+
+
+class BonusRequestRow(_Row, _row_type('BonusRequestRow', 'id user_id amount status created_at',
+                                      ('first_name', 'last_name'))):
+    """Запрос на списание бонусов (bonus_requests); first_name, last_name - из JOIN с users"""
+    __slots__ = ()
+
+
+class BroadcastJobRow(_Row, _row_type('BroadcastJobRow', 'id admin_chat_id from_chat_id message_id text '
+                                                         'has_caption status created_at finished_at '
+                                                         'status_message_id')):
+    """Задание рассылки (broadcast_jobs)"""
+    __slots__ = ()
+
+
+class BroadcastRecipientRow(_Row, _row_type('BroadcastRecipientRow', 'job_id user_id telegram_id state '
+                                                                     'attempts error updated_at',
+                                            ('first_name', 'last_name'))):
+    """Получатель рассылки (broadcast_recipients); first_name, last_name - из JOIN с users"""
+    __slots__ = ()
@@ -0,0 +1,228 @@
+# test_broadcast.py
+import asyncio
+from collections import namedtuple
+
+from telegram.error import Forbidden, RetryAfter
+
+from broadcast import BLOCKED, SENT, BroadcastMessage, TokenBucket, broadcast
+
+Recipient = namedtuple('Recipient', 'telegram_id')
+SentMessage = namedtuple('SentMessage', 'message_id')
+
+
+class FakeBot:
+    """Бот, который один раз отвечает RetryAfter и не может писать в чат 13"""
+
+    def __init__(self):
+        self.calls = []
+        self.flooded = False
+
+    async def send_message(self, chat_id, text):
+        if not self.flooded:
+            self.flooded = True
+            raise RetryAfter(0)
+        if chat_id == 13:
+            raise Forbidden("Forbidden: bot was blocked by the user")
+        self.calls.append(('send_message', chat_id, text))
+        return SentMessage(len(self.calls))
+
+    async def edit_message_text(self, text, chat_id, message_id):
+        self.calls.append(('edit_message_text', chat_id, message_id))
+
+    async def copy_message(self, chat_id, from_chat_id, message_id, caption=None):
+        self.calls.append(('copy_message', chat_id, caption))
+
+
+def test_broadcast_retries_flood_and_sends_one_request_per_recipient():
+    """RetryAfter повторяется без потерь, заблокировавшие бота отмечаются, медиа копируется одним запросом"""
+    bot = FakeBot()
+    recipients = [Recipient(chat_id) for chat_id in range(1, 31)]
+    results = asyncio.run(broadcast(bot, BroadcastMessage(1, 5, text="Привет"), recipients,
+                                    bucket=TokenBucket(1000)))
+    states = {recipient.telegram_id: delivery.state for recipient, delivery in results}
+    assert len(states) == 30
+    assert states.pop(13) == BLOCKED
+    assert set(states.values()) == {SENT}
+    assert len(bot.calls) == 29
+
+    bot = FakeBot()
+    results = asyncio.run(broadcast(bot, BroadcastMessage(1, 5, has_caption=False), recipients[:3],
+                                    bucket=TokenBucket(1000)))
+    assert [call[0] for call in bot.calls] == ['copy_message'] * 3
+    assert {delivery.attempts for _, delivery in results} == {1}
+
+
+def test_broadcast_job_resumes_without_double_sending(tmp_path):
+    """Задание продолжается после перезапуска: прерванная отправка не повторяется, остальные получают сообщение"""
+    from database import Database
+    from broadcast import BroadcastWorker
+
+    db = Database(str(tmp_path / 'test.db'))
+    try:
+        user_ids = [db.add_user(100 + i, f'Имя{i}', 'Фамилия', f'+7999000000{i}') for i in range(5)]
+        job_id = db.create_broadcast_job(1, 1, 5, text="Привет")
+        assert db.get_broadcast_progress(job_id)['pending'] == 5
+
+        # Бот остановился во время отправки первому получателю и после доставки второму
+        db.mark_broadcast_sending(job_id, user_ids[0])
+        db.mark_broadcast_sending(job_id, user_ids[1])
+        db.record_broadcast_delivery(job_id, user_ids[1], SENT, 1)
+        assert db.reset_interrupted_broadcasts() == 1
+
+        bot = FakeBot()
+        bot.flooded = True
+        worker = BroadcastWorker(db)
+        [job] = db.get_running_broadcast_jobs()
+        asyncio.run(worker.run_job(bot, job))
+
+        sent_to = [call[1] for call in bot.calls if call[1] != 1]
+        assert sorted(sent_to) == [102, 103, 104]
+        progress = db.get_broadcast_progress(job_id)
+        assert (progress['sent'], progress['failed'], progress['pending'], progress['total']) == (4, 1, 0, 5)
+        assert db.get_broadcast_job(job_id).status == 'done'
+        # Итог заменяет сообщение о ходе рассылки, а не приходит отдельно
+        assert bot.calls[0][:2] == ('send_message', 1) and bot.calls[-1] == ('edit_message_text', 1, 1)
+        assert not db.get_running_broadcast_jobs()
+        [failure] = db.get_broadcast_failures(job_id)
+        assert failure.user_id == user_ids[0] and failure.first_name == 'Имя0'
+    finally:
+        db.close()
+
+
+def test_blocked_and_guest_users_skipped_until_reprobe(tmp_path):
+    """Заблокировавшие бота и гости без чата не попадают в рассылку; заблокировавшие проверяются снова через срок"""
+    from database import Database
+
+    db = Database(str(tmp_path / 'test.db'))
+    try:
+        active, blocked, _ = (db.add_user(telegram_id, 'Имя', 'Фамилия', f'+7999000000{i}')
+                              for i, telegram_id in enumerate((101, 102, -5)))
+        db.record_delivery(102, BLOCKED)
+        assert not db.get_user_reachable(102) and not db.get_user_reachable(-5)
+        assert db.get_user_reachable(101) and db.get_user_reachable(999)
+        assert [user.id for user in db.get_deliverable_users()] == [active]
+        job_id = db.create_broadcast_job(1, 1, 5, text="Привет")
+        assert db.get_broadcast_progress(job_id)['total'] == 1
+
+        db.conn.execute("UPDATE users SET reachability_checked_at = '2000-01-01 00:00:00' WHERE telegram_id = 102")
+        assert db.get_user_reachable(102)
+        assert db.count_deliverable_users() == 2
+        db.record_broadcast_delivery(db.create_broadcast_job(1, 1, 6, text="Снова"), blocked, SENT, 1)
+        assert db.conn.execute('SELECT reachability FROM users WHERE id = ?', (blocked,)).fetchone()[0] == 'reachable'
+    finally:
+        db.close()
+
+
+def test_broadcast_stops_all_workers_when_bookkeeping_fails():
+    """Ошибка учета доставки останавливает все обработчики: мимо учета никто не отправляет"""
+    bot = FakeBot()
+    bot.flooded = True
+    recipients = [Recipient(chat_id) for chat_id in range(100, 200)]
+
+    async def on_delivery(recipient, delivery):
+        if recipient.telegram_id == 101:
+            raise RuntimeError('база недоступна')
+        await asyncio.sleep(0)
+
+    async def run():
+        try:
+            await broadcast(bot, BroadcastMessage(1, 5, text="Привет"), recipients, on_delivery,
+                            concurrency=4, bucket=TokenBucket(1000))
+        except RuntimeError:
+            sent = len(bot.calls)
+            await asyncio.sleep(0.05)
+            return sent
+        raise AssertionError('ошибка учета не дошла до вызывающего')
+
+    sent = asyncio.run(run())
+    assert sent < 10 and len(bot.calls) == sent
+
+
+def test_broadcast_status_message_created_once_per_job(tmp_path, monkeypatch):
+    """Повторный запуск задания после ошибки правит то же сообщение о ходе рассылки"""
+    import sqlite3
+
+    import pytest
+
+    from database import Database
+    from broadcast import BroadcastWorker
+
+    db = Database(str(tmp_path / 'test.db'))
+    try:
+        for i in range(3):
+            db.add_user(100 + i, f'Имя{i}', 'Фамилия', f'+7999000000{i}')
+        job_id = db.create_broadcast_job(1, 1, 5, text="Привет")
+        record = db.record_broadcast_delivery
+        failures = [sqlite3.OperationalError('database is locked')]
+
+        def flaky_record(*args, **kwargs):
+            if failures:
+                raise failures.pop()
+            return record(*args, **kwargs)
+
+        monkeypatch.setattr(db, 'record_broadcast_delivery', flaky_record)
+        bot = FakeBot()
+        bot.flooded = True
+        worker = BroadcastWorker(db)
+
+        async def run():
+            with pytest.raises(sqlite3.OperationalError):
+                await worker.run_job(bot, db.get_broadcast_job(job_id))
+            await worker.run_job(bot, db.get_broadcast_job(job_id))
+
+        asyncio.run(run())
+        status_messages = [i + 1 for i, call in enumerate(bot.calls) if call[:2] == ('send_message', 1)]
+        assert len(status_messages) == 1
+        assert db.get_broadcast_job(job_id).status_message_id == status_messages[0]
+        assert bot.calls[-1] == ('edit_message_text', 1, status_messages[0])
+    finally:
+        db.close()
+
+
+def test_worker_survives_errors_and_stops_failing_job(tmp_path, monkeypatch):
+    """Ошибка при запуске не убивает фоновую задачу; задание с постоянными ошибками останавливается"""
+    import sqlite3
+
+    from database import Database
+    from broadcast import BroadcastWorker
+
+    db = Database(str(tmp_path / 'test.db'))
+    try:
+        for i in range(3):
+            db.add_user(100 + i, f'Имя{i}', 'Фамилия', f'+7999000000{i}')
+        job_id = db.create_broadcast_job(1, 1, 5, text="Привет")
+        reset = db.reset_interrupted_broadcasts
+        reset_failures = [sqlite3.OperationalError('database is locked')]
+
+        def flaky_reset():
+            if reset_failures:
+                raise reset_failures.pop()
+            return reset()
+
+        def broken_mark(*args, **kwargs):
+            raise sqlite3.OperationalError('disk I/O error')
+
+        monkeypatch.setattr(db, 'reset_interrupted_broadcasts', flaky_reset)
+        monkeypatch.setattr(db, 'mark_broadcast_sending', broken_mark)
+        bot = FakeBot()
+        bot.flooded = True
+        worker = BroadcastWorker(db, max_job_errors=2, retry_delay=0)
+
+        async def run():
+            worker.start(bot)
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if db.get_broadcast_job(job_id).status != 'running':
+                    break
+            assert not worker._task.done()
+            await worker.stop()
+
+        asyncio.run(run())
+        assert db.get_broadcast_job(job_id).status == 'failed'
+        progress = db.get_broadcast_progress(job_id)
+        assert progress['failed'] == progress['total'] == 3
+        # Без отметки sending никому не отправлено; итог - правка того же сообщения
+        assert not [call for call in bot.calls if call[1] != 1]
+        assert bot.calls[-1][0] == 'edit_message_text'
+    finally:
+        db.close()
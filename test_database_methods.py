@@ -1,12 +1,13 @@
 # test_database_methods.py
-from database import Database
+from database import get_db
+from periods import Period
 
 
 def test_database_methods():
     """Тестирование методов базы данных"""
     print("🔍 Тестирование методов базы данных...")
 
-    db = Database()
+    db = get_db()
 
     # Тестируем get_shift_years
     print("\n1. Тестируем get_shift_years():")
@@ -18,9 +19,9 @@ def test_database_methods():
     months = db.get_shift_months('2024')
     print(f"   Результат: {months}")
 
-    # Тестируем get_shifts_by_year_month
-    print("\n3. Тестируем get_shifts_by_year_month('2024', '11'):")
-    shifts = db.get_shifts_by_year_month('2024', '11')
+    # Тестируем get_shifts
+    print("\n3. Тестируем get_shifts(Period.month('2024', '11')):")
+    shifts = db.get_shifts(Period.month('2024', '11'))
     print(f"   Найдено смен: {len(shifts)}")
 
     # Проверим все смены в базе
@@ -0,0 +1,36 @@
+# test_keyboards.py
+from datetime import date
+
+import keyboards.menus as menus
+
+
+def _texts(markup):
+    return [[button.text for button in row] for row in markup.inline_keyboard]
+
+
+def test_calendar_skeleton_is_reused_within_a_day(monkeypatch):
+    """Сетка месяца строится один раз за день; выбранная дата и занятые дни накладываются поверх"""
+    today = date(2026, 10, 18)
+    monkeypatch.setattr(menus, 'moscow_today', lambda: today)
+    monkeypatch.setattr(menus, '_calendar_cache', menus.KeyboardCache())
+
+    plain = menus.get_calendar_keyboard(2026, 10)
+    assert menus.get_calendar_keyboard(2026, 10) is plain
+    assert any('📍 18' in row for row in _texts(plain))
+    # Недели, целиком ушедшие в прошлое, не показываются
+    assert not any('·5·' in row for row in _texts(plain))
+
+    marked = menus.get_calendar_keyboard(2026, 10, '20.10.2026', [date(2026, 10, 25), date(2026, 10, 1)])
+    rows = _texts(marked)
+    assert any('✅ 20' in row for row in rows)
+    assert any('🚫 25' in row for row in rows)
+    assert not any('🚫 1' in row for row in rows)
+    assert menus.get_calendar_keyboard(2026, 10) is plain
+    assert menus._calendar_cache.stats()['misses'] == 1
+
+    # После полуночи по Москве сетка строится заново, а старые удаляются
+    today = date(2026, 10, 19)
+    next_day = menus.get_calendar_keyboard(2026, 10)
+    assert next_day is not plain
+    assert any('📍 19' in row for row in _texts(next_day))
+    assert menus._calendar_cache.stats()['size'] == 1
@@ -0,0 +1,89 @@
+# test_menu_manager.py
+from database import Database
+from menu_manager import MenuManager
+
+
+def _selects(db, call):
+    """Выполнить call и вернуть количество SELECT-запросов к базе"""
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        db.conn.set_trace_callback(None)
+    return sum(1 for sql in statements if sql.lstrip().upper().startswith('SELECT'))
+
+
+def test_menu_catalog_is_cached_until_menu_changes(tmp_path):
+    """Нажатия в меню не обращаются к базе; изменение меню сразу видно в каталоге"""
+    db = Database(str(tmp_path / 'test.db'))
+    try:
+        manager = MenuManager(db)
+        category = manager.get_categories()[0]
+        name, price, _ = manager.get_items_by_category(category)[0]
+
+        def tap():
+            manager.get_category_keyboard()
+            manager.get_items_keyboard(category)
+            manager.get_item_by_name(name)
+
+        assert _selects(db, tap) == 0
+
+        item = db.get_menu_item_by_name(name)
+        db.update_menu_item(item.id, name, price + 100, category)
+        assert manager.get_item_by_name(name) == (name, price + 100, category)
+
+        db.delete_menu_item(item.id)
+        assert manager.get_item_by_name(name) is None
+        assert name not in [item_name for item_name, _, _ in manager.get_items_by_category(category)]
+
+        db.restore_menu_item(item.id)
+        assert manager.get_item_by_name(name) == (name, price + 100, category)
+        assert _selects(db, tap) == 0
+    finally:
+        db.close()
+
+
+def test_menu_keyboards_are_reused_until_menu_changes(tmp_path):
+    """Клавиатуры меню строятся один раз на версию каталога"""
+    db = Database(str(tmp_path / 'test.db'))
+    try:
+        manager = MenuManager(db)
+        category = manager.get_categories()[0]
+        keyboard = manager.get_category_keyboard()
+        items = manager.get_items_keyboard(category)
+        assert manager.get_category_keyboard() is keyboard
+        assert manager.get_items_keyboard(category) is items
+        assert manager.keyboards.stats() == {'size': 2, 'hits': 2, 'misses': 2}
+
+        name, price, _ = manager.get_items_by_category(category)[0]
+        item = db.get_menu_item_by_name(name)
+        db.update_menu_item(item.id, name, price + 100, category)
+        updated = manager.get_items_keyboard(category)
+        assert updated is not items
+        assert updated.inline_keyboard[0][0].text == f"{name} - {price + 100}₽"
+        # Клавиатуры прошлой версии меню удалены из кэша
+        assert manager.keyboards.stats()['size'] == 1
+    finally:
+        db.close()
+
+
+def test_menu_catalog_reloaded_by_writer_thread(tmp_path):
+    """Изменение меню через асинхронный фасад обновляет каталог до возврата в обработчик"""
+    import asyncio
+
+    db = Database(str(tmp_path / 'test.db'))
+    try:
+        manager = MenuManager(db)
+        category = manager.get_categories()[0]
+        name, price, _ = manager.get_items_by_category(category)[0]
+        item = db.get_menu_item_by_name(name)
+
+        async def edit_menu():
+            await db.aupdate_menu_item(item.id, name, price + 50, category)
+            return manager.get_item_by_name(name)
+
+        assert asyncio.run(edit_menu()) == (name, price + 50, category)
+        assert manager.get_catalog().version == db.menu_version
+    finally:
+        db.close()
@@ -0,0 +1,46 @@
+# test_message_manager.py
+import asyncio
+
+from message_manager import DeletionScheduler
+
+
+class FakeBot:
+    """Бот, который считает одновременные удаления"""
+
+    def __init__(self):
+        self.deleted = []
+        self.active = 0
+        self.max_active = 0
+
+    async def delete_message(self, chat_id, message_id):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0)
+        self.active -= 1
+        self.deleted.append((chat_id, message_id))
+
+
+def test_deletions_share_one_task_and_can_be_cancelled():
+    """Тысяча временных сообщений удаляется одной задачей, не больше concurrency чатов сразу; отмена работает"""
+    forgotten = []
+
+    async def run():
+        bot = FakeBot()
+        scheduler = DeletionScheduler(delay=0.01, concurrency=3,
+                                      on_deleted=lambda chat_id, ids: forgotten.extend(ids))
+        tasks_before = len(asyncio.all_tasks())
+        for message_id in range(1000):
+            scheduler.schedule(bot, message_id % 10, message_id)
+        assert len(asyncio.all_tasks()) == tasks_before + 1
+        assert len(scheduler) == 1000
+        assert len(scheduler.cancel(7)) == 100
+
+        await asyncio.sleep(0.05)
+        assert len(scheduler) == 0 and not scheduler._heap
+        await scheduler.stop()
+        return bot
+
+    bot = asyncio.run(run())
+    assert len(bot.deleted) == len(forgotten) == 900
+    assert not any(chat_id == 7 for chat_id, _ in bot.deleted)
+    assert bot.max_active <= 3
@@ -0,0 +1,94 @@
+# test_migrations.py
+import sqlite3
+
+import migrations
+from database import Database
+
+
+def test_fresh_database_reaches_latest_version(tmp_path):
+    """Новая база проходит все миграции, повторный запуск ничего не делает"""
+    path = str(tmp_path / 'test.db')
+    db = Database(path)
+    try:
+        assert migrations.get_schema_version(db.conn) == migrations.latest_version()
+        assert db.get_all_menu_items()
+        assert migrations.apply_migrations(db.conn) == 0
+    finally:
+        db.close()
+
+
+def test_legacy_database_is_upgraded(tmp_path):
+    """База старой версии без user_version доводится до актуальной схемы с сохранением данных"""
+    path = str(tmp_path / 'legacy.db')
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, telegram_id INTEGER UNIQUE,
+                            first_name TEXT, last_name TEXT, phone TEXT, bonus_balance INTEGER DEFAULT 0,
+                            registration_date TEXT, is_active BOOLEAN DEFAULT TRUE);
+        CREATE TABLE orders (id INTEGER PRIMARY KEY AUTOINCREMENT, table_number INTEGER, admin_id INTEGER,
+                             status TEXT DEFAULT 'active', created_at TEXT);
+        CREATE TABLE menu_items (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE,
+                                 price INTEGER, category TEXT);
+        CREATE TABLE shifts (id INTEGER PRIMARY KEY AUTOINCREMENT, shift_number INTEGER UNIQUE,
+                             admin_id INTEGER, opened_at TEXT, closed_at TEXT,
+                             total_revenue INTEGER DEFAULT 0, total_orders INTEGER DEFAULT 0,
+                             status TEXT DEFAULT 'open');
+        INSERT INTO menu_items (name, price, category) VALUES ('Стандарт', 1000, 'Чай');
+        INSERT INTO users (telegram_id, first_name, last_name, phone) VALUES (1001, 'Фёдор', 'Петров', '+7 999 000-00-00');
+        INSERT INTO users (telegram_id, first_name, last_name, phone) VALUES (-1, 'Федор', '', '89990000000');
+        INSERT INTO shifts (shift_number, admin_id, opened_at, status) VALUES (1, 1, '2025-11-03 18:00:00', 'closed');
+    ''')
+    conn.commit()
+    conn.close()
+
+    db = Database(path)
+    try:
+        assert migrations.get_schema_version(db.conn) == migrations.latest_version()
+        assert 'payment_method' in migrations._columns(db.conn, 'orders')
+        assert 'referred_by' in migrations._columns(db.conn, 'users')
+        assert db.conn.execute('SELECT month_year FROM shifts').fetchone()[0] == '2025-11'
+        assert db.conn.execute(
+            "SELECT category FROM menu_items WHERE name = 'Стандарт'").fetchone()[0] == 'Кальяны'
+        # Существующие пользователи попадают в индекс поиска
+        assert {user.telegram_id for user in db.search_users('федор')} == {1001, -1}
+        assert {user.telegram_id for user in db.search_users('999000')} == {1001, -1}
+        # Номер в E.164 принадлежит зарегистрированному пользователю, а не временному профилю
+        assert db.find_user_by_phone('8 (999) 000-00-00').first_name == 'Фёдор'
+        assert db.create_guest_user('Федор', '9990000000') == (1, 1001)
+    finally:
+        db.close()
+
+
+def test_registration_claims_walk_in_guest(tmp_path):
+    """Гость, записанный администратором, после регистрации остается одной строкой со своими бронями"""
+    db = Database(str(tmp_path / 'test.db'))
+    try:
+        guest_id, guest_telegram_id = db.create_guest_user('Федор', '+7 999 000-00-00')
+        booking_id = db.create_booking(guest_id, '01.12.2025', '19:00', 2)
+
+        user_id = db.add_user(1001, 'Фёдор', 'Петров', '89990000000')
+        assert user_id == guest_id and guest_telegram_id < 0
+        assert db.conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 1
+        assert db.get_user(1001).bonus_balance == 100
+        assert db.find_user_by_phone('9990000000').id == user_id
+        assert [booking.id for booking in db.get_user_bookings(user_id)] == [booking_id]
+
+        # Номер зарегистрированного пользователя переходит к новому, старый не меняется
+        other_id = db.add_user(1002, 'Иван', 'Иванов', '+79990000000')
+        assert other_id != user_id and db.find_user_by_phone('89990000000').id == other_id
+        assert db.get_user(1001).id == user_id
+    finally:
+        db.close()
+
+
+def test_update_in_batches(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'batch.db'))
+    conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, value INTEGER)')
+    conn.executemany('INSERT INTO t (value) VALUES (?)', [(i,) for i in range(25)])
+    conn.commit()
+
+    updated = migrations.update_in_batches(conn, 't', 'value = value + 100', 'value < 100', batch_size=7)
+    assert updated == 25
+    assert migrations.update_in_batches(conn, 't', 'value = value + 100', 'value < 100', batch_size=7) == 0
+    assert conn.execute('SELECT MIN(value) FROM t').fetchone()[0] == 100
+    conn.close()
@@ -0,0 +1,37 @@
+# test_progress.py
+import asyncio
+
+from progress import ProgressReporter, format_duration
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_progress_edits_at_most_once_per_interval():
+    """Тысяча обновлений за 10 секунд дает несколько правок с последним состоянием и итог"""
+    edits = []
+
+    async def edit(text, **kwargs):
+        edits.append(text)
+
+    async def run():
+        clock = FakeClock()
+        reporter = ProgressReporter(edit, 1000, "Расчет", interval=3, clock=clock)
+        for i in range(1000):
+            clock.now += 0.01
+            await reporter.advance()
+        assert await reporter.finish()
+        return reporter
+
+    reporter = asyncio.run(run())
+    assert len(edits) == 4
+    assert edits[0].startswith("🔄 Расчет: 30") and "(30%)" in edits[0]
+    assert "100.0 в секунду" in edits[0] and "осталось ~7 с" in edits[0]
+    assert edits[-1].startswith("✅ Расчет: 1000/1000 за 10 с")
+    assert reporter.edits == 4
+    assert format_duration(3725) == "1 ч 2 мин"
@@ -0,0 +1,280 @@
+# test_query_plans.py
+import re
+
+from database import Database
+from periods import Period
+
+# "SCAN t" без индекса означает полный проход по таблице
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+def _create_test_data(db):
+    """Минимальный набор данных, чтобы методы дошли до всех своих запросов"""
+    user_id = db.add_user(1001, 'Иван', 'Петров', '79990000000')
+    db.add_transaction(user_id, -50, 'spend', 'Списание')
+    db.create_booking(user_id, '01.12.2025', '19:00', 2)
+    db.create_bonus_request(user_id, 50)
+    order_id = db.create_order(5, user_id)
+    db.add_order_item(order_id, 'Вода', 100, 2)
+    db.conn.execute("UPDATE orders SET created_at = '2025-11-01 19:00:00' WHERE id = ?", (order_id,))
+    db.conn.commit()
+    shift_number = db.create_shift(user_id, '2025-11')
+    db.conn.execute("UPDATE shifts SET opened_at = '2025-11-01 18:00:00' WHERE shift_number = ?", (shift_number,))
+    db.conn.commit()
+    db.close_shift(shift_number, '2025-11')
+    return user_id, order_id, shift_number
+
+
+def _traced_statements(db, call):
+    """Выполнить call и вернуть все SELECT-запросы, которые он отправил в базу"""
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        db.conn.set_trace_callback(None)
+    return [sql for sql in statements if sql.lstrip().upper().startswith('SELECT')]
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    """Частые запросы не должны сканировать таблицы целиком"""
+    db = Database(str(tmp_path / 'test.db'))
+    try:
+        user_id, order_id, shift_number = _create_test_data(db)
+        job_id = db.create_broadcast_job(1001, 1001, 1, text='Привет')
+
+        hot_queries = {
+            'get_active_orders': lambda: db.get_active_orders(),
+            'get_all_closed_orders': lambda: db.get_all_closed_orders(),
+            'get_active_order_by_table': lambda: db.get_active_order_by_table(5),
+            'get_order_items': lambda: db.get_order_items(order_id),
+            'get_order_total': lambda: db.get_order_total(order_id),
+            'get_order_items_for_orders': lambda: db.get_order_items_for_orders([order_id]),
+            'get_order_totals': lambda: db.get_order_totals([order_id]),
+            'get_users_by_ids': lambda: db.get_users_by_ids([user_id]),
+            'close_shift': lambda: db.close_shift(shift_number, '2025-11'),
+            'get_user_bookings': lambda: db.get_user_bookings(user_id),
+            'get_bookings_by_status': lambda: db.get_bookings_by_status('pending'),
+            'get_bookings_by_date': lambda: db.get_bookings_by_date('01.12.2025'),
+            'get_user_bookings_by_date': lambda: db.get_user_bookings_by_date(user_id, '01.12.2025'),
+            'get_booking_years': lambda: db.get_booking_years(),
+            'get_booking_months': lambda: db.get_booking_months('2025', user_id),
+            'get_booking_days': lambda: db.get_booking_days('2025', '12'),
+            'get_bookings_page': lambda: db.get_bookings_page('pending', after_id=1),
+            'count_bookings': lambda: db.count_bookings('pending'),
+            'get_users_page': lambda: db.get_users_page(after_id=user_id + 1),
+            'count_active_users': lambda: db.count_active_users(),
+            'get_spent_bonuses(shift)': lambda: db.get_spent_bonuses(
+                Period.shift('2025-11-01 18:00:00', '2025-11-02 06:00:00')),
+            'get_spent_bonuses(month)': lambda: db.get_spent_bonuses(Period.month('2025', 11)),
+            'get_spent_bonuses(year)': lambda: db.get_spent_bonuses(Period.year('2025')),
+            'get_payment_statistics': lambda: db.get_payment_statistics(Period.month(2025, 11)),
+            'get_orders': lambda: db.get_orders(Period.day('2025-11-01'), status='closed'),
+            'get_shifts': lambda: db.get_shifts(Period.month('2025', '11')),
+            'get_sales_statistics': lambda: db.get_sales_statistics(Period.year('2025')),
+            'get_total_revenue': lambda: db.get_total_revenue(Period.year('2025')),
+            'get_shift_months': lambda: db.get_shift_months('2025'),
+            'get_shift_sales': lambda: db.get_shift_sales(shift_number, '2025-11'),
+            'get_orders_by_shift_id': lambda: db.get_orders_by_shift_id(1),
+            'get_active_shift': lambda: db.get_active_shift(),
+            'find_user_by_phone': lambda: db.find_user_by_phone('79990000000'),
+            'search_users': lambda: db.search_users('Ив Пет'),
+            'get_pending_requests': lambda: db.get_pending_requests(),
+            'get_referrer_stats': lambda: db.get_referrer_stats(user_id),
+            'get_running_broadcast_jobs': lambda: db.get_running_broadcast_jobs(),
+            'get_pending_broadcast_recipients': lambda: db.get_pending_broadcast_recipients(job_id, 10),
+            'get_broadcast_progress': lambda: db.get_broadcast_progress(job_id),
+        }
+
+        problems = []
+        for name, call in hot_queries.items():
+            statements = _traced_statements(db, call)
+            assert statements, f"{name}: не выполнено ни одного запроса"
+            for sql in statements:
+                plan = db.conn.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+                for row in plan:
+                    if FULL_SCAN.match(row[3]):
+                        problems.append(f"{name}: {row[3]}\n    {' '.join(sql.split())}")
+
+        assert not problems, "Полное сканирование таблиц:\n" + "\n".join(problems)
+    finally:
+        db.close()
+
+
+def test_no_redundant_indexes(tmp_path):
+    """Индекс, колонки которого - начало другого индекса той же таблицы, только замедляет записи"""
+    db = Database(str(tmp_path / 'test.db'))
+    try:
+        indexes = {}
+        tables = [row[0] for row in db.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        for table in tables:
+            for _, name, unique, origin, _ in db.conn.execute(f"PRAGMA index_list('{table}')"):
+                if not unique:
+                    columns = tuple(row[2] for row in db.conn.execute(f"PRAGMA index_info('{name}')"))
+                    indexes[name] = (table, columns)
+
+        redundant = [
+            f"{name} {columns} -> {other} {other_columns}"
+            for name, (table, columns) in indexes.items()
+            for other, (other_table, other_columns) in indexes.items()
+            if other != name and other_table == table and other_columns[:len(columns)] == columns
+        ]
+        assert not redundant, "Лишние индексы:\n" + "\n".join(redundant)
+        assert 'idx_orders_status_created_payment' in indexes
+    finally:
+        db.close()
+
+
+def test_batched_order_loading(tmp_path):
+    """Позиции, суммы и администраторы множества заказов загружаются постоянным числом запросов"""
+    db = Database(str(tmp_path / 'test.db'))
+    try:
+        user_id, first_order_id, _ = _create_test_data(db)
+        order_ids = [first_order_id]
+        for table_number in range(20):
+            order_id = db.create_order(table_number, user_id)
+            db.add_order_item(order_id, 'Вода', 100, 1)
+            db.add_order_item(order_id, 'Габа', 400, 2)
+            order_ids.append(order_id)
+        empty_order_id = db.create_order(99, user_id)
+        order_ids.append(empty_order_id)
+
+        result = {}
+        statements = _traced_statements(db, lambda: result.update(
+            items=db.get_order_items_for_orders(order_ids),
+            totals=db.get_order_totals(order_ids),
+            admins=db.get_users_by_ids([user_id] * len(order_ids)),
+        ))
+
+        assert len(statements) == 3
+        assert result['items'][order_ids[1]] == db.get_order_items(order_ids[1])
+        assert result['items'][empty_order_id] == []
+        assert result['totals'] == {order_id: db.get_order_total(order_id) for order_id in order_ids}
+        assert result['admins'][user_id] == db.get_user_by_id(user_id)
+    finally:
+        db.close()
+
+
+def test_close_shift_aggregates_sales(tmp_path):
+    """Закрытие смены считает продажи по позициям и сохраняет итоги вместе со статусом"""
+    db = Database(str(tmp_path / 'test.db'))
+    try:
+        user_id, order_id, shift_number = _create_test_data(db)
+        second_order_id = db.create_order(6, user_id)
+        db.add_order_item(second_order_id, 'Вода', 100, 1)
+        db.add_order_item(second_order_id, 'Габа', 400, 1)
+        db.conn.execute("UPDATE orders SET created_at = '2025-11-01 20:00:00' WHERE id = ?", (second_order_id,))
+        db.conn.commit()
+
+        summary = db.close_shift(shift_number, '2025-11')
+
+        assert summary['total_orders'] == 2
+        assert summary['total_revenue'] == 700
+        assert summary['sales'] == [('Габа', 1, 400), ('Вода', 3, 300)]
+        shift = db.get_shift_by_number_and_month(shift_number, '2025-11')
+        assert (shift[6], shift[7], shift[8]) == (700, 2, 'closed')
+        assert db.get_shift_sales(shift_number, '2025-11') == [('Габа', 1, 400), ('Вода', 3, 300)]
+        assert db.close_shift(999, '2025-11') is None
+    finally:
+        db.close()
+
+
+def test_order_totals_are_maintained(tmp_path):
+    """orders.total_amount и item_count обновляются при добавлении, удалении и закрытии"""
+    db = Database(str(tmp_path / 'test.db'))
+    try:
+        user_id, order_id, _ = _create_test_data(db)
+        db.add_order_item(order_id, 'Габа', 400, 1)
+        assert db.get_order_total(order_id) == 600
+
+        db.remove_item_from_order(order_id, 'Вода')
+        db.remove_item_from_order(order_id, 'Габа')
+        assert db.get_order_total(order_id) == 100
+        assert db.verify_order_totals() == []
+
+        # Расхождение (например, после ручной правки базы) находится и исправляется
+        db.conn.execute('UPDATE orders SET total_amount = 0 WHERE id = ?', (order_id,))
+        db.conn.commit()
+        assert db.verify_order_totals(fix=True) == [(order_id, 0, 100, 1, 1)]
+        assert db.verify_order_totals() == []
+
+        db.update_order_payment_method(order_id, 'cash')
+        db.close_order(order_id)
+        stats = db.get_payment_statistics(Period.all())
+        assert stats == {'cash': {'count': 1, 'total_amount': 100}}
+    finally:
+        db.close()
+
+
+def test_rollups_follow_source_tables(tmp_path):
+    """Сводки обновляются при закрытии смены, оплате и списании и совпадают с пересчетом с нуля"""
+    db = Database(str(tmp_path / 'test.db'))
+    try:
+        user_id, order_id, _ = _create_test_data(db)
+        db.update_order_payment_method(order_id, 'card')
+        db.close_order(order_id)
+        db.add_transaction(user_id, -30, 'spend', 'Списание')
+
+        def snapshot():
+            return {
+                'revenue': db.get_total_revenue(Period.year(2025)),
+                'sales': db.get_sales_statistics(Period.month(2025, 11)),
+                'spent': db.get_spent_bonuses(Period.all()),
+                'payments(month)': db.get_payment_statistics(Period.month(2025, 11)),
+                'payments(day)': db.get_payment_statistics(Period.day('2025-11-01')),
+            }
+
+        incremental = snapshot()
+        assert incremental['revenue'] == 200
+        assert incremental['sales'] == [('Вода', 2, 200)]
+        assert incremental['spent'] == -80
+        assert incremental['payments(month)'] == {'card': {'count': 1, 'total_amount': 200}}
+        assert incremental['payments(day)'] == incremental['payments(month)']
+
+        db.rebuild_rollups()
+        assert snapshot() == incremental
+    finally:
+        db.close()
+
+
+def test_period_bounds():
+    """Периоды переводятся в полуоткрытые диапазоны без функций над колонкой"""
+    assert Period.day('2025-11-30').where('created_at') == (
+        'created_at >= ? AND created_at < ?', ('2025-11-30 00:00:00', '2025-12-01 00:00:00'))
+    assert Period.month(2025, 12).where('date')[1] == ('2025-12-01 00:00:00', '2026-01-01 00:00:00')
+    assert Period.year('2025').where_month('month_year') == (
+        'month_year >= ? AND month_year < ?', ('2025-01', '2026-01'))
+    assert Period.shift('2025-11-30 18:00:00', '2025-12-01 02:00:00').where_month('month_year')[1] == (
+        '2025-11', '2026-01')
+    assert Period.shift('2025-11-01 18:00:00').where('created_at') == (
+        'created_at >= ?', ('2025-11-01 18:00:00',))
+    assert Period.all().where('created_at') == ('1 = 1', ())
+    assert Period.year(2025).rollup() == ('month', 'period >= ? AND period < ?', ('2025-01', '2026-01'))
+    assert Period.day('2025-11-30').rollup()[0] == 'day'
+    assert Period.shift('2025-11-30 18:00:00', '2025-12-01 02:00:00').rollup() is None
+
+
+def test_bookings_page_walks_rows_without_date(tmp_path):
+    """Брони с неразобранной датой (booking_at IS NULL) тоже листаются постранично"""
+    db = Database(str(tmp_path / 'test.db'))
+    try:
+        user_id = db.add_user(1001, 'Иван', 'Петров', '79990000000')
+        dated = [db.create_booking(user_id, f'0{day}.12.2025', '19:00', 2) for day in (3, 1, 2)]
+        undated = [db.create_booking(user_id, 'завтра', '19:00', 2) for _ in range(3)]
+
+        seen = []
+        after_id = None
+        while True:
+            page = db.get_bookings_page(after_id=after_id, limit=2)
+            if not page:
+                break
+            seen += [booking.id for booking in page]
+            after_id = page[-1].id
+        assert seen == undated + [dated[1], dated[2], dated[0]]
+
+        statements = _traced_statements(db, lambda: db.get_bookings_page('pending', after_id=undated[0]))
+        for sql in statements:
+            plan = db.conn.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+            assert not [row for row in plan if FULL_SCAN.match(row[3])], sql
+    finally:
+        db.close()
@@ -0,0 +1,118 @@
+# test_transactions.py
+import asyncio
+import sqlite3
+
+import pytest
+
+from database import Database
+
+
+def _balance(db, user_id):
+    return db.get_user_by_id(user_id)[5]
+
+
+def _transactions(db, user_id):
+    return db.conn.execute('SELECT amount, type FROM transactions WHERE user_id = ?', (user_id,)).fetchall()
+
+
+def test_transaction_is_atomic(tmp_path):
+    """Изменения внутри transaction() фиксируются вместе или откатываются вместе"""
+    db = Database(str(tmp_path / 'test.db'))
+    try:
+        user_id = db.add_user(1001, 'Иван', 'Петров', '79990000000')
+
+        with pytest.raises(RuntimeError):
+            with db.transaction():
+                db.update_user_balance(user_id, 50)
+                db.add_transaction(user_id, 50, 'earn', 'Начисление')
+                raise RuntimeError('сбой посреди операции')
+        assert _balance(db, user_id) == 100
+        assert _transactions(db, user_id) == []
+
+        request_id = db.create_bonus_request(user_id, 80)
+        assert db.approve_bonus_request(request_id)
+        assert not db.approve_bonus_request(request_id)  # повторное одобрение ничего не списывает
+        assert _balance(db, user_id) == 20
+        assert _transactions(db, user_id) == [(-80, 'spend')]
+
+        # Баллов недостаточно - ни баланс, ни статус запроса не меняются
+        request_id = db.create_bonus_request(user_id, 500)
+        assert not db.approve_bonus_request(request_id)
+        assert _balance(db, user_id) == 20
+        assert db.get_pending_requests()[0][0] == request_id
+    finally:
+        db.close()
+
+
+def test_concurrent_writes_share_commit(tmp_path):
+    """Одновременные записи из разных обработчиков выполняются группой; ошибка одной не мешает другим"""
+    db = Database(str(tmp_path / 'test.db'))
+    try:
+        user_id = db.add_user(1001, 'Иван', 'Петров', '79990000000')
+
+        def failing_write():
+            db.update_user_balance(user_id, 1000)
+            raise ValueError('ошибка записи')
+
+        async def run():
+            writes = [db.achange_bonus_balance(user_id, 1, 'earn', 'Начисление') for _ in range(20)]
+            return await asyncio.gather(db.run_write(failing_write), *writes, return_exceptions=True)
+
+        statements = []
+        db._writer_conn.set_trace_callback(statements.append)
+        results = asyncio.run(run())
+        db._writer_conn.set_trace_callback(None)
+        assert isinstance(results[0], ValueError)
+        assert results[1:] == [True] * 20
+        # 21 записи из очереди фиксируются несколькими групповыми commit, а не по одному на запись
+        commits = [sql for sql in statements if sql.strip().upper() == 'COMMIT']
+        assert 1 <= len(commits) < 21
+        assert _balance(db, user_id) == 120
+        assert len(_transactions(db, user_id)) == 20
+    finally:
+        db.close()
+
+
+def test_event_loop_never_gets_writer_connection(tmp_path):
+    """Из event loop читается через свое соединение только для чтения, запись напрямую запрещена"""
+    db = Database(str(tmp_path / 'test.db'))
+    try:
+        user_id = db.add_user(1001, 'Иван', 'Петров', '79990000000')
+
+        async def run():
+            assert db.conn is not db._writer_conn
+            assert db.get_user_by_id(user_id).id == user_id
+            with pytest.raises(sqlite3.OperationalError):
+                db.update_user_balance(user_id, 50)
+            await db.aupdate_user_balance(user_id, 50)
+
+        asyncio.run(run())
+        assert db.conn is not db._writer_conn
+        assert _balance(db, user_id) == 150
+    finally:
+        db.close()
+
+
+def test_dashboard_stats_cache_reset_by_commit(tmp_path):
+    """Сводка статистики берется из кэша, пока в базу ничего не записано"""
+    db = Database(str(tmp_path / 'test.db'))
+    try:
+        user_id = db.add_user(1001, 'Иван', 'Петров', '79990000000')
+        db.create_bonus_request(user_id, 50)
+
+        stats = db.get_dashboard_stats()
+        assert stats['users'] == 1
+        assert stats['total_balance'] == 100
+        assert stats['average_balance'] == 100
+        assert stats['bookings'] == {'pending': 0, 'confirmed': 0, 'cancelled': 0, 'total': 0}
+        assert stats['pending_requests'] == 1
+        assert db.get_dashboard_stats() is stats
+
+        db.add_user(1002, 'Анна', 'Сидорова', '79990000001')
+        db.create_booking(user_id, '01.12.2025', '19:00', 2)
+        stats = db.get_dashboard_stats()
+        assert stats['users'] == 2
+        assert stats['total_balance'] == 200
+        assert stats['bookings']['pending'] == 1
+    finally:
+        db.close()
@@ -1,50 +1,26 @@
 import sqlite3
 import os
 
+from config import DB_NAME
+from migrations import apply_migrations, get_schema_version
+
 
 def update_database():
-    db_name = 'loyalty_bot.db'
+    db_name = DB_NAME
 
     if not os.path.exists(db_name):
         print("❌ База данных не найдена!")
         return
 
     conn = sqlite3.connect(db_name)
-    cursor = conn.cursor()
 
     try:
-        # Проверяем наличие колонки referred_by
-        cursor.execute("PRAGMA table_info(users)")
-        columns = [column[1] for column in cursor.fetchall()]
-
-        if 'referred_by' not in columns:
-            print("🔄 Добавляем колонку referred_by в таблицу users...")
-            cursor.execute('ALTER TABLE users ADD COLUMN referred_by INTEGER DEFAULT NULL')
-            print("✅ Колонка referred_by добавлена")
-        else:
-            print("✅ Колонка referred_by уже существует")
-
-        # Проверяем наличие таблицы referrals
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='referrals'")
-        if not cursor.fetchone():
-            print("🔄 Создаем таблицу referrals...")
-            cursor.execute('''
-                CREATE TABLE referrals (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    referrer_id INTEGER,
-                    referred_id INTEGER UNIQUE,
-                    bonus_awarded BOOLEAN DEFAULT FALSE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (referrer_id) REFERENCES users (id),
-                    FOREIGN KEY (referred_id) REFERENCES users (id)
-                )
-            ''')
-            print("✅ Таблица referrals создана")
+        # Все изменения схемы (включая referred_by и таблицу referrals) описаны в migrations.py
+        applied = apply_migrations(conn)
+        if applied:
+            print(f"🎉 База данных успешно обновлена до версии {get_schema_version(conn)}!")
         else:
-            print("✅ Таблица referrals уже существует")
-
-        conn.commit()
-        print("🎉 База данных успешно обновлена!")
+            print(f"✅ База данных уже актуальна (версия {get_schema_version(conn)})")
 
     except Exception as e:
         print(f"❌ Ошибка при обновлении базы данных: {e}")
@@ -53,4 +29,4 @@ def update_database():
 
 
 if __name__ == '__main__':
-    update_database()
\ No newline at end of file
+    update_database()
@@ -29,6 +29,9 @@ def validate_name(name):
 
 
 import re
+from datetime import datetime
+
+import pytz
 
 
 def validate_phone(phone):
@@ -58,6 +61,27 @@ def validate_name(name):
     return True
 
 
+def normalize_phone(phone):
+    """Номер телефона в формате E.164 (+79991234567) или None, если это не номер.
+
+    Российские номера приводятся к +7: 89991234567, 79991234567 и 9991234567
+    дают один и тот же результат. Так номер хранится в users.phone_e164.
+    """
+    if not phone or not validate_phone(phone):
+        return None
+    digits = re.sub(r'\D', '', phone)
+    if len(digits) == 10:
+        digits = '7' + digits
+    elif len(digits) == 11 and digits.startswith('8'):
+        digits = '7' + digits[1:]
+    return '+' + digits
+
+
+def moscow_today():
+    """Текущая дата по московскому времени (по ней календарь бронирований делит дни на прошедшие и будущие)"""
+    return datetime.now(pytz.timezone('Europe/Moscow')).date()
+
+
 def format_user_data(user_data):
     return (
         f"📋 Проверьте ваши данные:\n\n"
@@ -76,9 +100,9 @@ def format_booking_info(booking_data):
     }
 
     return (
-        f"{status_emoji.get(booking_data[4], '📅')} Бронирование #{booking_data[0]}\n"
-        f"📅 Дата: {booking_data[2]}\n"
-        f"⏰ Время: {booking_data[3]}\n"
-        f"👥 Гостей: {booking_data[4]}\n"
-        f"📊 Статус: {booking_data[5]}"
+        f"{status_emoji.get(booking_data.status, '📅')} Бронирование #{booking_data.id}\n"
+        f"📅 Дата: {booking_data.booking_date}\n"
+        f"⏰ Время: {booking_data.booking_time}\n"
+        f"👥 Гостей: {booking_data.guests}\n"
+        f"📊 Статус: {booking_data.status}"
     )
\ No newline at end of file